@@ -0,0 +1,227 @@
+"""
+Train/test contamination detection for synthetic training data.
+
+The imbalance experiments add synthetic tweets and headlines to the training
+split and evaluate on held-out real data. A synthetic item that nearly copies a
+test item leaks the test set into training and inflates `fake_f1_score`. This
+module indexes the test split once and checks whole synthetic batches against
+it with two complementary signals:
+
+- word n-gram fingerprints (an inverted index of hashed n-grams) for verbatim
+  or lightly edited copies;
+- sparse TF-IDF cosine, keeping the top-k test neighbours of every query row
+  from a single sparse matrix product per query block.
+
+This module provides:
+- ContaminationIndex: build over test texts, batched `check` of candidates
+- contamination_report: per-experiment summary dictionary
+- exclude_contaminated: drop flagged items from a synthetic pool
+- check_experiment: one-call check / report / optional exclusion
+"""
+
+import os
+import re
+import json
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\b\w+\b")
+
+MATCH_COLUMNS = [
+    'query_index', 'test_index', 'cosine', 'shared_ngrams', 'ngram_overlap',
+    'contaminated', 'query_text', 'test_text'
+]
+
+
+def word_ngram_hashes(text: str, n: int) -> set:
+    """Hashes of the distinct lowercase word n-grams of a text (whole text if shorter)."""
+    tokens = TOKEN_PATTERN.findall(str(text).lower())
+    if not tokens:
+        return set()
+    if len(tokens) < n:
+        return {hash(' '.join(tokens))}
+    return {hash(' '.join(tokens[i:i + n])) for i in range(len(tokens) - n + 1)}
+
+
+class ContaminationIndex:
+    """
+    Index over a test split for near-copy detection.
+
+    Args:
+        test_texts: Held-out evaluation texts
+        ngram_size: Word n-gram length for fingerprints
+        top_k: TF-IDF neighbours kept per query
+        cosine_threshold: Cosine at or above which a pair is contaminated
+        overlap_threshold: Share of the query's n-grams found in one test item
+            at or above which a pair is contaminated
+        query_block_size: Query rows per sparse product (bounds memory)
+        vectorizer_params: Overrides for the TfidfVectorizer
+    """
+
+    def __init__(
+        self,
+        test_texts: Sequence[str],
+        ngram_size: int = 5,
+        top_k: int = 5,
+        cosine_threshold: float = 0.8,
+        overlap_threshold: float = 0.5,
+        query_block_size: int = 2048,
+        vectorizer_params: Optional[Dict[str, Any]] = None
+    ):
+        self.test_texts = list(test_texts)
+        self.ngram_size = ngram_size
+        self.top_k = top_k
+        self.cosine_threshold = cosine_threshold
+        self.overlap_threshold = overlap_threshold
+        self.query_block_size = query_block_size
+
+        params = {'ngram_range': (1, 2), 'sublinear_tf': True, 'min_df': 1}
+        params.update(vectorizer_params or {})
+        self.vectorizer = TfidfVectorizer(**params)
+        # Rows are L2-normalized, so the transposed product is cosine similarity
+        self.test_matrix_t = self.vectorizer.fit_transform(self.test_texts).T.tocsc()
+
+        self.fingerprints: Dict[int, List[int]] = defaultdict(list)
+        for i, text in enumerate(self.test_texts):
+            for h in word_ngram_hashes(text, ngram_size):
+                self.fingerprints[h].append(i)
+
+        logger.info(f"Contamination index: {len(self.test_texts):,} test items, "
+                    f"{len(self.vectorizer.vocabulary_):,} terms, {len(self.fingerprints):,} fingerprints")
+
+    def _top_k(self, row_indices: np.ndarray, row_values: np.ndarray) -> Dict[int, float]:
+        if len(row_values) > self.top_k:
+            keep = np.argpartition(row_values, -self.top_k)[-self.top_k:]
+            row_indices, row_values = row_indices[keep], row_values[keep]
+        return dict(zip(row_indices.tolist(), row_values.tolist()))
+
+    def check(self, texts: Sequence[str], include_clean: bool = False) -> pd.DataFrame:
+        """
+        Check candidate texts against the test split in one batched pass.
+
+        Args:
+            texts: Synthetic items to check
+            include_clean: Also return candidate pairs below both thresholds
+
+        Returns:
+            DataFrame of candidate pairs (MATCH_COLUMNS), best cosine first
+        """
+        texts = list(texts)
+        rows = []
+        for start in range(0, len(texts), self.query_block_size):
+            block = texts[start:start + self.query_block_size]
+            similarities = (self.vectorizer.transform(block) @ self.test_matrix_t).tocsr()
+
+            for offset, text in enumerate(block):
+                lo, hi = similarities.indptr[offset], similarities.indptr[offset + 1]
+                cosine_row = dict(zip(similarities.indices[lo:hi].tolist(), similarities.data[lo:hi].tolist()))
+                candidates = self._top_k(similarities.indices[lo:hi], similarities.data[lo:hi])
+
+                query_grams = word_ngram_hashes(text, self.ngram_size)
+                shared = Counter(i for h in query_grams for i in self.fingerprints.get(h, ()))
+                for test_index, _ in shared.most_common(self.top_k):
+                    candidates.setdefault(test_index, cosine_row.get(test_index, 0.0))
+
+                for test_index, cosine in candidates.items():
+                    overlap = shared.get(test_index, 0) / len(query_grams) if query_grams else 0.0
+                    contaminated = cosine >= self.cosine_threshold or overlap >= self.overlap_threshold
+                    if contaminated or include_clean:
+                        rows.append((start + offset, test_index, cosine, shared.get(test_index, 0),
+                                     overlap, contaminated, text, self.test_texts[test_index]))
+
+        matches = pd.DataFrame(rows, columns=MATCH_COLUMNS)
+        return matches.sort_values(['query_index', 'cosine'], ascending=[True, False], ignore_index=True)
+
+
+def contamination_report(
+    matches: pd.DataFrame,
+    n_checked: int,
+    experiment_name: str = "",
+    cosine_threshold: float = 0.8,
+    overlap_threshold: float = 0.5,
+    n_examples: int = 10
+) -> Dict[str, Any]:
+    """Summarize contaminated pairs for one experiment."""
+    flagged = matches[matches['contaminated']]
+    worst = flagged.sort_values('cosine', ascending=False).drop_duplicates('query_index').head(n_examples)
+    n_flagged = int(flagged['query_index'].nunique())
+    return {
+        'experiment_name': experiment_name,
+        'timestamp': datetime.now().strftime("%Y%m%d_%H%M%S"),
+        'items_checked': n_checked,
+        'items_contaminated': n_flagged,
+        'contamination_rate': n_flagged / n_checked if n_checked else 0.0,
+        'test_items_hit': int(flagged['test_index'].nunique()),
+        'cosine_threshold': cosine_threshold,
+        'overlap_threshold': overlap_threshold,
+        'flagged_by_cosine': int(flagged.loc[flagged['cosine'] >= cosine_threshold, 'query_index'].nunique()),
+        'flagged_by_ngram_overlap': int(flagged.loc[flagged['ngram_overlap'] >= overlap_threshold, 'query_index'].nunique()),
+        'examples': worst[['query_index', 'test_index', 'cosine', 'ngram_overlap',
+                           'query_text', 'test_text']].to_dict('records')
+    }
+
+
+def exclude_contaminated(texts: Sequence[str], matches: pd.DataFrame) -> Tuple[List[str], List[int]]:
+    """
+    Drop flagged items from a synthetic pool.
+
+    Returns:
+        Tuple of (clean texts, excluded query indices)
+    """
+    excluded = sorted(set(matches.loc[matches['contaminated'], 'query_index'].tolist()))
+    excluded_set = set(excluded)
+    return [t for i, t in enumerate(texts) if i not in excluded_set], excluded
+
+
+def check_experiment(
+    synthetic_texts: Sequence[str],
+    test_texts: Sequence[str],
+    experiment_name: str,
+    exclude: bool = False,
+    output_dir: Optional[str] = None,
+    index: Optional[ContaminationIndex] = None,
+    **index_kwargs
+) -> Tuple[List[str], Dict[str, Any]]:
+    """
+    Check a synthetic pool against an experiment's test split.
+
+    Args:
+        synthetic_texts: Synthetic items destined for the training split
+        test_texts: The experiment's held-out texts
+        experiment_name: Used in the report and file name
+        exclude: Return the pool without contaminated items
+        output_dir: If given, write `{experiment_name}_contamination.json`
+        index: Reuse an index already built over `test_texts`
+        **index_kwargs: ContaminationIndex arguments
+
+    Returns:
+        Tuple of (synthetic texts to use, report)
+    """
+    index = index or ContaminationIndex(test_texts, **index_kwargs)
+    matches = index.check(synthetic_texts)
+    report = contamination_report(matches, len(synthetic_texts), experiment_name,
+                                  index.cosine_threshold, index.overlap_threshold)
+
+    texts = list(synthetic_texts)
+    if exclude:
+        texts, excluded = exclude_contaminated(texts, matches)
+        report['excluded_indices'] = excluded
+    report['excluded'] = exclude
+
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        safe_name = re.sub(r'[^\w.-]+', '_', experiment_name)
+        with open(os.path.join(output_dir, f"{safe_name}_contamination.json"), 'w') as f:
+            json.dump(report, f, indent=2)
+
+    logger.info(f"{experiment_name}: {report['items_contaminated']:,}/{len(synthetic_texts):,} "
+                f"synthetic items contaminated ({report['contamination_rate']:.2%})")
+    return texts, report
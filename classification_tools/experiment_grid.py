@@ -0,0 +1,243 @@
+"""
+Parallel, resumable experiment grid runner with a results store.
+
+The classification notebooks nest loops over datasets x severity levels x
+sampling strategies x models in one kernel, so a crash loses every result that
+was not written yet. Here an experiment spec is expanded into independent
+cells, each keyed by a hash of its parameters. Cells run on a process pool
+(joblib/loky, which memory-maps large read-only arrays such as shared feature
+matrices instead of copying them into every worker), and each finished cell is
+written to the store as soon as it returns. Reruns skip completed cells, and
+the `*_metadata.json` files in `saved_classification_models/` are regenerated
+from the store.
+
+This module provides:
+- expand_grid / spec_hash: cell expansion and stable cell keys
+- ResultsStore: one JSON record per completed cell, written atomically
+- GridRunner: run pending cells in parallel, persist as they finish
+- export_metadata: write `{experiment}_{timestamp}_metadata.json` files
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import itertools
+import traceback
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence, Callable, Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+logger = logging.getLogger(__name__)
+
+
+def _to_jsonable(value: Any) -> Any:
+    """Convert NumPy scalars/arrays (and tuples) so records serialize cleanly."""
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def spec_hash(cell: Dict[str, Any]) -> str:
+    """Stable 16-character key for a cell's parameters."""
+    payload = json.dumps(_to_jsonable(cell), sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def expand_grid(axes: Dict[str, Sequence[Any]], fixed: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Cartesian product of experiment axes.
+
+    Args:
+        axes: e.g. {'severity': [...], 'strategy': [...], 'model': [...]}
+        fixed: Parameters shared by every cell (seed, vectorizer params, ...)
+
+    Returns:
+        One parameter dictionary per cell, in axis order
+    """
+    names = list(axes)
+    return [
+        {**(fixed or {}), **dict(zip(names, values))}
+        for values in itertools.product(*(axes[name] for name in names))
+    ]
+
+
+class ResultsStore:
+    """
+    Directory of `{spec_hash}.json` records, one per completed cell.
+
+    Each record holds the cell spec, its result dictionary, timing and a
+    completion timestamp. Files are written to a temporary name and renamed,
+    so an interrupted write never leaves a half-written record behind.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def __len__(self) -> int:
+        return sum(1 for name in os.listdir(self.root) if name.endswith('.json'))
+
+    def put(self, cell: Dict[str, Any], result: Dict[str, Any], duration: Optional[float] = None) -> str:
+        key = spec_hash(cell)
+        record = {
+            'spec_hash': key,
+            'spec': _to_jsonable(cell),
+            'result': _to_jsonable(result),
+            'duration_seconds': duration,
+            'completed_at': datetime.now().isoformat()
+        }
+        tmp_path = self._path(key) + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, indent=2, default=str)
+        os.replace(tmp_path, self._path(key))
+        return key
+
+    def get(self, key: str) -> Dict[str, Any]:
+        with open(self._path(key)) as f:
+            return json.load(f)
+
+    def records(self) -> Iterator[Dict[str, Any]]:
+        for name in sorted(os.listdir(self.root)):
+            if name.endswith('.json'):
+                yield self.get(name[:-5])
+
+    def to_frame(self) -> pd.DataFrame:
+        """One row per record: spec columns plus scalar result columns."""
+        rows = []
+        for record in self.records():
+            row = {'spec_hash': record['spec_hash'], **record['spec']}
+            row.update({k: v for k, v in record['result'].items() if not isinstance(v, (dict, list))})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+
+def _run_cell(cell_fn: Callable, cell: Dict[str, Any], shared: Optional[Dict[str, Any]]) -> Tuple[Dict, Optional[Dict], float, Optional[str]]:
+    start = time.time()
+    try:
+        result = cell_fn(cell, shared) if shared is not None else cell_fn(cell)
+        return cell, result, time.time() - start, None
+    except Exception:
+        return cell, None, time.time() - start, traceback.format_exc()
+
+
+class GridRunner:
+    """
+    Run experiment cells in parallel and persist each result as it finishes.
+
+    Args:
+        cell_fn: `cell_fn(cell)` or `cell_fn(cell, shared)` returning a
+            JSON-serializable result dictionary; must be picklable
+        store: ResultsStore receiving completed cells
+        shared: Read-only objects passed to every cell (feature matrices,
+            label arrays, text lists); large arrays are memory-mapped by joblib
+        n_jobs: Worker processes (-1 = all cores, 1 = run in this process)
+        max_nbytes: Array size above which joblib memory-maps instead of copying
+    """
+
+    def __init__(
+        self,
+        cell_fn: Callable,
+        store: ResultsStore,
+        shared: Optional[Dict[str, Any]] = None,
+        n_jobs: int = -1,
+        max_nbytes: str = '1M'
+    ):
+        self.cell_fn = cell_fn
+        self.store = store
+        self.shared = shared
+        self.n_jobs = n_jobs
+        self.max_nbytes = max_nbytes
+
+    def pending(self, cells: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Cells without a stored result (duplicates collapsed)."""
+        unique = {spec_hash(cell): cell for cell in cells}
+        return [cell for key, cell in unique.items() if key not in self.store]
+
+    def run(self, cells: Sequence[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Run every pending cell; completed cells from earlier runs are skipped.
+
+        Returns:
+            Summary with counts and the tracebacks of failed cells (failed
+            cells are not stored, so the next run retries them)
+        """
+        todo = self.pending(cells)
+        skipped = len({spec_hash(c) for c in cells}) - len(todo)
+        logger.info(f"Grid: {len(todo):,} cells to run, {skipped:,} already completed")
+
+        failures = {}
+        completed = 0
+        if todo:
+            tasks = (delayed(_run_cell)(self.cell_fn, cell, self.shared) for cell in todo)
+            # 'generator_unordered' (joblib >= 1.4) yields each cell as soon as it finishes
+            parallel = Parallel(n_jobs=self.n_jobs, max_nbytes=self.max_nbytes, return_as='generator_unordered')
+            for cell, result, duration, error in parallel(tasks):
+                if error is not None:
+                    failures[spec_hash(cell)] = {'spec': cell, 'error': error}
+                    logger.warning(f"Cell {spec_hash(cell)} failed after {duration:.1f}s")
+                    continue
+                self.store.put(cell, result, duration)
+                completed += 1
+                logger.info(f"Cell {spec_hash(cell)} done in {duration:.1f}s ({completed}/{len(todo)})")
+
+        return {'completed': completed, 'skipped': skipped, 'failed': len(failures), 'failures': failures}
+
+
+def metadata_filename(name: str, timestamp: str) -> str:
+    """'Severe 25.1%_stylistic' -> 'Severe_25.1pct_stylistic_{timestamp}_metadata.json'."""
+    safe = re.sub(r'[^\w.-]', '_', re.sub(r'\s+', '_', name.replace('%', 'pct')))
+    return f"{safe}_{timestamp}_metadata.json"
+
+
+def export_metadata(
+    store: ResultsStore,
+    output_dir: str = "saved_classification_models",
+    metadata_fn: Optional[Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = None
+) -> List[str]:
+    """
+    Regenerate `*_metadata.json` files from stored cells.
+
+    Args:
+        store: Results store
+        output_dir: Destination directory
+        metadata_fn: Maps a record to a metadata dictionary (None to skip the
+            record). By default the result's 'metadata' entry is used. The
+            dictionary's 'experiment_name' and 'generation_timestamp' name the file.
+
+    Returns:
+        Paths written
+    """
+    metadata_fn = metadata_fn or (lambda record: record['result'].get('metadata'))
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+    for record in store.records():
+        metadata = metadata_fn(record)
+        if not metadata:
+            continue
+        timestamp = metadata.get('generation_timestamp') or \
+            datetime.fromisoformat(record['completed_at']).strftime("%Y%m%d_%H%M%S")
+        name = metadata.get('experiment_name', record['spec_hash'])
+        path = os.path.join(output_dir, metadata_filename(name, timestamp))
+        with open(path, 'w') as f:
+            json.dump(metadata, f, indent=2)
+        written.append(path)
+    logger.info(f"Wrote {len(written):,} metadata files to {output_dir}")
+    return written
@@ -0,0 +1,512 @@
+"""
+Budgeted successive-halving / Hyperband search over classifier x vectorizer settings.
+
+The comparison notebooks fix `tfidf_params` and the `get_model_configs` /
+`get_traditional_models` constructors by hand, because a full grid scored with
+`StratifiedKFold` over every imbalance variant is too slow. Here candidate
+configurations are sampled from per-model and vectorizer search spaces and
+raced: every candidate is scored on a small, stratified prefix of each
+training fold, the best 1/factor advance to a rung with factor x more rows,
+and only the finalists see the full folds. Hyperband runs several such
+brackets that trade the number of candidates against their starting budget.
+
+The corpus is tokenized once into a `VectorizationCache`; fold matrices for
+any (fold, rows, vectorizer settings) are sliced from its counts, so
+narrower `ngram_range`, `min_df` or `max_features` values never re-tokenize,
+and every worker keeps the matrices it built for later rungs. Trials run on
+a `GridRunner` process pool and each one is written to its `ResultsStore`,
+so an interrupted search resumes where it stopped. A CPU-seconds budget is
+checked before every wave of trials (one trial per worker): a wave is only
+dispatched if its cost, extrapolated from the seconds per training row of
+the trials so far, still fits.
+
+This module provides:
+- SEARCH_MODELS / MODEL_SPACES / VECTORIZER_SPACE: default estimators and search spaces
+- sample_candidates: random candidate configurations from the search spaces
+- FoldFeatures: picklable fold-matrix source over a cache's counts
+- HalvingSearch: successive halving and Hyperband with per-trial persistence
+- build_best: fresh vectorizer + estimator for a winning configuration
+"""
+
+import math
+import time
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Sequence, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy.stats import loguniform
+from sklearn.model_selection import StratifiedKFold, ParameterSampler
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.svm import LinearSVC
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.metrics import accuracy_score, f1_score
+
+from vectorization_cache import VectorizationCache, select_columns
+from experiment_grid import GridRunner, ResultsStore, spec_hash
+from joblib import effective_n_jobs
+
+logger = logging.getLogger(__name__)
+
+# Same base constructors as `get_model_configs` in the multilingual analysis
+SEARCH_MODELS = {
+    'logistic_regression': lambda: LogisticRegression(max_iter=1000, random_state=42),
+    'linear_svm': lambda: LinearSVC(max_iter=1000, random_state=42),
+    'multinomial_nb': lambda: MultinomialNB(),
+    'random_forest': lambda: RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=1),
+}
+
+MODEL_SPACES = {
+    'logistic_regression': {'C': loguniform(1e-2, 1e2), 'class_weight': [None, 'balanced']},
+    'linear_svm': {'C': loguniform(1e-3, 1e1), 'class_weight': [None, 'balanced']},
+    'multinomial_nb': {'alpha': loguniform(1e-3, 1e1)},
+    'random_forest': {'n_estimators': [100, 200], 'max_depth': [None, 20, 50],
+                      'min_samples_leaf': [1, 2, 5], 'class_weight': [None, 'balanced']},
+}
+
+# Around the notebooks' `tfidf_params` (10000 features, (1, 2)-grams, min_df=2, max_df=0.95)
+VECTORIZER_SPACE = {
+    'weighting': ['tfidf'],
+    'max_features': [5000, 10000, 20000, None],
+    'ngram_range': [(1, 1), (1, 2)],
+    'min_df': [1, 2, 5],
+    'max_df': [0.9, 0.95, 1.0],
+    'sublinear_tf': [False, True],
+}
+
+_MATRIX_MEMO: 'OrderedDict[Tuple, Tuple[sp.csr_matrix, sp.csr_matrix]]' = OrderedDict()
+_MATRIX_MEMO_SIZE = 64
+
+
+def _plain(value: Any) -> Any:
+    """numpy scalars -> Python scalars, so cell specs stay JSON-able."""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def sample_candidates(
+    n_candidates: int,
+    models: Sequence[str],
+    model_spaces: Optional[Dict[str, Dict[str, Any]]] = None,
+    vectorizer_space: Optional[Dict[str, Any]] = None,
+    random_state: int = 42
+) -> List[Dict[str, Any]]:
+    """
+    Random configurations, spread evenly over the models.
+
+    Spaces map parameter names to lists or scipy distributions (as in
+    `RandomizedSearchCV`). Returns dicts with 'model', 'model_params' and
+    'vectorizer_params'.
+    """
+    model_spaces = MODEL_SPACES if model_spaces is None else model_spaces
+    vectorizer_space = VECTORIZER_SPACE if vectorizer_space is None else vectorizer_space
+    rng = np.random.RandomState(random_state)
+    per_model = [n_candidates // len(models) + (i < n_candidates % len(models)) for i in range(len(models))]
+
+    candidates = []
+    for model, count in zip(models, per_model):
+        if count == 0:
+            continue
+        space = model_spaces.get(model) or {}
+        model_draws = list(ParameterSampler(space, count, random_state=rng)) if space else [{}] * count
+        vectorizer_draws = list(ParameterSampler(vectorizer_space, count, random_state=rng)) if vectorizer_space else [{}] * count
+        for model_params, vectorizer_params in zip(model_draws, vectorizer_draws):
+            candidates.append({
+                'model': model,
+                'model_params': {k: _plain(v) for k, v in sorted(model_params.items())},
+                'vectorizer_params': {k: _plain(v) for k, v in sorted(vectorizer_params.items())},
+            })
+    return candidates
+
+
+def stratified_order(labels: np.ndarray, random_state: int = 42) -> np.ndarray:
+    """
+    Permutation whose every prefix keeps the class proportions.
+
+    Rows of each class are shuffled and spread evenly over [0, 1); sorting
+    by that position interleaves the classes, so the nested subsets used by
+    successive rungs are all (close to) stratified.
+    """
+    rng = np.random.RandomState(random_state)
+    position = np.empty(len(labels))
+    for label in np.unique(labels):
+        members = np.flatnonzero(labels == label)
+        position[rng.permutation(members)] = (np.arange(len(members)) + rng.uniform(size=len(members))) / len(members)
+    return np.argsort(position, kind='stable')
+
+
+class FoldFeatures:
+    """
+    Fold feature matrices sliced from cached counts.
+
+    Holds only arrays (counts, alphabetical ranks, n-gram orders, labels and
+    fold indices), so joblib memory-maps it into workers instead of copying.
+
+    Args:
+        cache: VectorizationCache holding the texts
+        rows: Cache row of every sample
+        labels: Label of every sample
+        n_splits: Stratified folds
+        random_state: Seed for the folds and the rung subsets
+    """
+
+    def __init__(self, cache: VectorizationCache, rows: np.ndarray, labels: Sequence[Any],
+                 n_splits: int = 5, random_state: int = 42):
+        self.counts = cache.counts[rows]
+        self.rank = cache._alphabetical_rank().copy()
+        self.orders = cache.ngram_orders()
+        self.cache_ngram_range = cache.analyzer_params['ngram_range']
+        self.labels = np.asarray(labels)
+        self.key = spec_hash({'rows': rows.tolist(), 'n_terms': len(cache.terms),
+                              'splits': n_splits, 'seed': random_state})
+
+        folds = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+        self.folds = []
+        for fold, (train, test) in enumerate(folds.split(np.zeros(len(self.labels)), self.labels)):
+            train = train[stratified_order(self.labels[train], random_state + fold)]
+            self.folds.append((train, test))
+
+    @property
+    def max_resource(self) -> int:
+        """Rows in the smallest training fold."""
+        return min(len(train) for train, _ in self.folds)
+
+    def matrices(self, fold: int, n_rows: int, params: Dict[str, Any]) -> Tuple[sp.csr_matrix, np.ndarray, sp.csr_matrix, np.ndarray]:
+        """(X_train, y_train, X_test, y_test) for the first `n_rows` training rows of a fold."""
+        train, test = self.folds[fold]
+        train = train[:n_rows]
+        memo_key = (self.key, fold, n_rows, spec_hash(params))
+        if memo_key in _MATRIX_MEMO:
+            _MATRIX_MEMO.move_to_end(memo_key)
+            X_train, X_test = _MATRIX_MEMO[memo_key]
+            return X_train, self.labels[train], X_test, self.labels[test]
+
+        params = dict(params)
+        weighting = params.pop('weighting', 'tfidf')
+        ngram_range = tuple(params.pop('ngram_range', self.cache_ngram_range))
+        allowed = None
+        if ngram_range != tuple(self.cache_ngram_range):
+            allowed = (self.orders >= ngram_range[0]) & (self.orders <= ngram_range[1])
+        columns = select_columns(self.counts, self.rank, train, params.pop('max_features', None),
+                                 params.pop('min_df', 1), params.pop('max_df', 1.0), allowed,
+                                 params.get('binary', False))
+
+        if weighting == 'count':
+            vectorizer = CountVectorizer(binary=params.get('binary', False))
+        else:
+            vectorizer = TfidfVectorizer(**params)
+            if vectorizer.use_idf:
+                dfs = np.bincount(self.counts[train][:, columns].indices, minlength=len(columns)) + int(vectorizer.smooth_idf)
+                vectorizer.idf_ = np.log((len(train) + int(vectorizer.smooth_idf)) / dfs) + 1.0
+        X_train = VectorizationCache._weigh(self.counts[train][:, columns], vectorizer)
+        X_test = VectorizationCache._weigh(self.counts[test][:, columns], vectorizer)
+
+        _MATRIX_MEMO[memo_key] = (X_train, X_test)
+        if len(_MATRIX_MEMO) > _MATRIX_MEMO_SIZE:
+            _MATRIX_MEMO.popitem(last=False)
+        return X_train, self.labels[train], X_test, self.labels[test]
+
+
+def _score_trial(cell: Dict[str, Any], shared: Dict[str, Any]) -> Dict[str, Any]:
+    """Cross-validated scores of one candidate at one resource level."""
+    features: FoldFeatures = shared['features']
+    factory = shared['models'][cell['model']]
+    pos_label = shared['pos_label']
+
+    scores = {'f1': [], 'f1_macro': [], 'f1_weighted': [], 'accuracy': []}
+    n_features = []
+    for fold in range(len(features.folds)):
+        X_train, y_train, X_test, y_test = features.matrices(fold, cell['resource'], cell['vectorizer_params'])
+        model = factory()
+        model.set_params(**cell['model_params'])
+        model.fit(X_train, y_train)
+        y_pred = model.predict(X_test)
+        scores['f1'].append(f1_score(y_test, y_pred, pos_label=pos_label, zero_division=0))
+        scores['f1_macro'].append(f1_score(y_test, y_pred, average='macro', zero_division=0))
+        scores['f1_weighted'].append(f1_score(y_test, y_pred, average='weighted', zero_division=0))
+        scores['accuracy'].append(accuracy_score(y_test, y_pred))
+        n_features.append(X_train.shape[1])
+
+    result = {'n_features': int(np.mean(n_features))}
+    for name, values in scores.items():
+        result[name] = float(np.mean(values))
+        result[f'std_{name}'] = float(np.std(values))
+    return result
+
+
+class HalvingSearch:
+    """
+    Successive halving / Hyperband over model and vectorizer configurations.
+
+    Args:
+        texts: Dataset texts
+        labels: Dataset labels
+        store: ResultsStore (or directory) receiving every trial
+        dataset_name: Recorded in every trial; trials are keyed per dataset
+        models: Model names (keys of `model_factories`)
+        model_factories: {name: zero-argument constructor}, e.g. the dict
+            returned by `get_model_configs()`; defaults to SEARCH_MODELS
+        model_spaces: {name: parameter space}; defaults to MODEL_SPACES
+        vectorizer_space: Vectorizer parameter space; defaults to VECTORIZER_SPACE
+        scoring: Result key to rank by ('f1', 'f1_macro', 'f1_weighted', 'accuracy')
+        pos_label: Positive class for 'f1'
+        n_splits: Cross-validation folds
+        factor: Fraction 1/factor of candidates kept per rung; rows grow by factor
+        min_resource: Training rows per fold on the first rung
+        budget_seconds: CPU-seconds (summed trial durations) the search may
+            spend; no wave of trials is started that would not fit. None for no limit
+        n_jobs: Worker processes
+        random_state: Seed for folds, subsets and candidate sampling
+        cache: Optional prebuilt VectorizationCache (its analyzer must cover the
+            widest `ngram_range` searched)
+    """
+
+    def __init__(
+        self,
+        texts: Sequence[str],
+        labels: Sequence[Any],
+        store: Any,
+        dataset_name: str = 'dataset',
+        models: Optional[Sequence[str]] = None,
+        model_factories: Optional[Dict[str, Callable[[], Any]]] = None,
+        model_spaces: Optional[Dict[str, Dict[str, Any]]] = None,
+        vectorizer_space: Optional[Dict[str, Any]] = None,
+        scoring: str = 'f1_macro',
+        pos_label: Any = 1,
+        n_splits: int = 5,
+        factor: int = 3,
+        min_resource: int = 500,
+        budget_seconds: Optional[float] = None,
+        n_jobs: int = -1,
+        random_state: int = 42,
+        cache: Optional[VectorizationCache] = None,
+        **analyzer_params
+    ):
+        if scoring not in ('f1', 'f1_macro', 'f1_weighted', 'accuracy'):
+            raise ValueError(f"Unknown scoring: {scoring}. Use 'f1', 'f1_macro', 'f1_weighted' or 'accuracy'")
+        if factor < 2:
+            raise ValueError("factor must be at least 2")
+        self.model_factories = model_factories or SEARCH_MODELS
+        self.models = list(models or self.model_factories)
+        missing = [m for m in self.models if m not in self.model_factories]
+        if missing:
+            raise ValueError(f"No factory for models: {missing}")
+        self.model_spaces = MODEL_SPACES if model_spaces is None else model_spaces
+        self.vectorizer_space = VECTORIZER_SPACE if vectorizer_space is None else vectorizer_space
+
+        self.store = store if isinstance(store, ResultsStore) else ResultsStore(store)
+        self.dataset_name = dataset_name
+        self.scoring = scoring
+        self.factor = factor
+        self.budget_seconds = budget_seconds
+        self.n_jobs = n_jobs
+        self.random_state = random_state
+        self.spent_seconds = 0.0
+        self._timed_seconds = 0.0
+        self._timed_rows = 0
+
+        analyzer = {'ngram_range': (1, 2), 'stop_words': 'english'}
+        analyzer.update(analyzer_params)
+        start = time.time()
+        cache = cache or VectorizationCache(**analyzer)
+        rows = cache.add_texts(list(texts))
+        self.features = FoldFeatures(cache, rows, labels, n_splits, random_state)
+        self.max_resource = self.features.max_resource
+        self.min_resource = min(min_resource, self.max_resource)
+        logger.info(f"{dataset_name}: {len(rows):,} texts tokenized in {time.time() - start:.1f}s, "
+                    f"{n_splits} folds of up to {self.max_resource:,} training rows")
+
+        self.runner = GridRunner(_score_trial, self.store, n_jobs=n_jobs, shared={
+            'features': self.features,
+            'models': {name: self.model_factories[name] for name in self.models},
+            'pos_label': pos_label,
+        })
+
+    def _cell(self, candidate: Dict[str, Any], resource: int, bracket: int, rung: int) -> Dict[str, Any]:
+        return {
+            'dataset': self.dataset_name,
+            'fold_key': self.features.key,
+            'model': candidate['model'],
+            'model_params': candidate['model_params'],
+            'vectorizer_params': candidate['vectorizer_params'],
+            'resource': int(resource),
+            'bracket': bracket,
+            'rung': rung,
+        }
+
+    def _over_budget(self) -> bool:
+        return self.budget_seconds is not None and self.spent_seconds >= self.budget_seconds
+
+    def _fits_budget(self, n_trials: int, resource: int) -> bool:
+        """Whether `n_trials` new trials on `resource` rows are expected to fit the remaining budget."""
+        if self.budget_seconds is None:
+            return True
+        if self._over_budget():
+            return False
+        if not self._timed_rows:
+            return True  # nothing to extrapolate from yet
+        estimate = n_trials * resource * self._timed_seconds / self._timed_rows
+        return self.spent_seconds + estimate <= self.budget_seconds
+
+    def run_rung(self, cells: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Score cells (resuming stored ones) and return their records.
+
+        Cells are dispatched in waves of one per worker; a wave that would not
+        fit the remaining budget is not started, so the rung ends early. Under
+        a budget the first trial runs alone to calibrate the estimate.
+        """
+        workers = max(1, effective_n_jobs(self.n_jobs))
+        records, start = [], 0
+        while start < len(cells):
+            calibrating = self.budget_seconds is not None and not self._timed_rows
+            batch = cells[start:start + (1 if calibrating else workers)]
+            pending = self.runner.pending(batch)
+            if pending and not self._fits_budget(len(pending), batch[0]['resource']):
+                logger.info(f"Budget of {self.budget_seconds:.1f} CPU-s would be exceeded; "
+                            f"{len(cells) - start} trials on {batch[0]['resource']:,} rows not started")
+                break
+            summary = self.runner.run(batch)
+            if summary['failed']:
+                logger.warning(f"{summary['failed']} trials failed; they are dropped from this rung")
+            for cell in batch:
+                key = spec_hash(cell)
+                if key in self.store:
+                    record = self.store.get(key)
+                    # Resumed trials count too, so a rerun makes the same budget decisions
+                    duration = record['duration_seconds'] or 0.0
+                    self.spent_seconds += duration
+                    self._timed_seconds += duration
+                    self._timed_rows += record['spec']['resource']
+                    records.append(record)
+            start += len(batch)
+        return records
+
+    def resource_schedule(self, min_resource: int) -> List[int]:
+        """Rows per rung: factor-spaced from `min_resource`, ending on the full folds."""
+        n_rungs = int(math.floor(math.log(self.max_resource / min_resource, self.factor) + 1e-2)) + 1
+        return [max(min_resource, int(round(self.max_resource / self.factor ** (n_rungs - 1 - i))))
+                for i in range(n_rungs)]
+
+    def successive_halving(
+        self,
+        candidates: List[Dict[str, Any]],
+        min_resource: Optional[int] = None,
+        bracket: int = 0
+    ) -> pd.DataFrame:
+        """
+        Race candidates from `min_resource` rows up to the full folds.
+
+        Returns:
+            One row per trial (candidate x rung) with scores and timing
+        """
+        schedule = self.resource_schedule(min(min_resource or self.min_resource, self.max_resource))
+        survivors, rung, trials = list(candidates), 0, []
+        while survivors and rung < len(schedule):
+            if self._over_budget():
+                logger.info(f"Budget of {self.budget_seconds:.1f} CPU-s spent; stopping before rung {rung}")
+                break
+            resource = schedule[rung]
+            cells = [self._cell(c, resource, bracket, rung) for c in survivors]
+            spent_before = self.spent_seconds
+            records = self.run_rung(cells)
+            if not records:
+                break
+            logger.info(f"Bracket {bracket}, rung {rung}: {len(cells)} candidates on {resource:,} rows "
+                        f"({self.spent_seconds - spent_before:.1f} CPU-s)")
+            trials.extend(records)
+
+            ranked = sorted(records, key=lambda r: r['result'][self.scoring], reverse=True)
+            keep = max(1, len(ranked) // self.factor)
+            survivors = [{k: r['spec'][k] for k in ('model', 'model_params', 'vectorizer_params')} for r in ranked[:keep]]
+            # A lone survivor gains nothing from intermediate rungs
+            rung = len(schedule) - 1 if keep == 1 and rung < len(schedule) - 1 else rung + 1
+        return self._frame(trials)
+
+    def hyperband(self, max_candidates: Optional[int] = None) -> pd.DataFrame:
+        """
+        Hyperband brackets from many candidates on few rows to few on all rows.
+
+        Args:
+            max_candidates: Candidates in the most exploratory bracket
+                (default: factor ** s_max, the Hyperband choice)
+        """
+        s_max = len(self.resource_schedule(self.min_resource)) - 1
+        frames = []
+        for s in range(s_max, -1, -1):
+            if self._over_budget():
+                logger.info(f"Budget of {self.budget_seconds:.1f} CPU-s spent; skipping remaining brackets")
+                break
+            n = int(math.ceil((s_max + 1) / (s + 1) * self.factor ** s))
+            if max_candidates:
+                n = max(1, int(math.ceil(n * max_candidates / self.factor ** s_max)))
+            resource = self.resource_schedule(self.min_resource)[s_max - s]
+            candidates = sample_candidates(n, self.models, self.model_spaces, self.vectorizer_space,
+                                           random_state=self.random_state + s)
+            frames.append(self.successive_halving(candidates, resource, bracket=s))
+        return pd.concat(frames, ignore_index=True) if frames else self._frame([])
+
+    def search(self, n_candidates: int = 27) -> pd.DataFrame:
+        """One successive-halving bracket over `n_candidates` sampled configurations."""
+        candidates = sample_candidates(n_candidates, self.models, self.model_spaces, self.vectorizer_space,
+                                       random_state=self.random_state)
+        return self.successive_halving(candidates)
+
+    def _frame(self, records: List[Dict[str, Any]]) -> pd.DataFrame:
+        rows = []
+        for record in records:
+            spec = record['spec']
+            rows.append({
+                'dataset': spec['dataset'],
+                'model': spec['model'],
+                'bracket': spec['bracket'],
+                'rung': spec['rung'],
+                'resource': spec['resource'],
+                **{f'model__{k}': v for k, v in spec['model_params'].items()},
+                **{f'vectorizer__{k}': v for k, v in spec['vectorizer_params'].items()},
+                **{k: v for k, v in record['result'].items()},
+                'duration_seconds': record['duration_seconds'],
+                'spec_hash': record['spec_hash'],
+            })
+        return pd.DataFrame(rows)
+
+    def best(self, trials: pd.DataFrame) -> Dict[str, Any]:
+        """Best configuration among trials run on the full folds (or the largest rung reached)."""
+        if trials.empty:
+            raise ValueError("No trials to choose from")
+        top = trials[trials['resource'] == trials['resource'].max()]
+        winner = top.loc[top[self.scoring].idxmax()]
+        spec = self.store.get(winner['spec_hash'])['spec']
+        return {
+            'model': spec['model'],
+            'model_params': spec['model_params'],
+            'vectorizer_params': spec['vectorizer_params'],
+            'resource': spec['resource'],
+            self.scoring: float(winner[self.scoring]),
+            f'std_{self.scoring}': float(winner[f'std_{self.scoring}']),
+        }
+
+
+def build_best(
+    best: Dict[str, Any],
+    model_factories: Optional[Dict[str, Callable[[], Any]]] = None,
+    stop_words: Optional[str] = 'english'
+) -> Tuple[Any, Any]:
+    """
+    Fresh (vectorizer, estimator) for a configuration from `HalvingSearch.best`.
+
+    The vectorizer takes the same keyword arguments as the notebooks'
+    `tfidf_params`, so it can be dropped into `evaluate_model_on_dataset`.
+    """
+    params = dict(best['vectorizer_params'])
+    weighting = params.pop('weighting', 'tfidf')
+    if 'ngram_range' in params:
+        params['ngram_range'] = tuple(params['ngram_range'])
+    vectorizer_cls = TfidfVectorizer if weighting == 'tfidf' else CountVectorizer
+    vectorizer = vectorizer_cls(stop_words=stop_words, **params)
+    model = (model_factories or SEARCH_MODELS)[best['model']]()
+    model.set_params(**best['model_params'])
+    return vectorizer, model
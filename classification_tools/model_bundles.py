@@ -0,0 +1,438 @@
+"""
+Compact, memory-mappable bundles for saved text classifiers.
+
+`save_model_with_metadata` pickles the model and the vectorizer separately;
+loading them back unpickles every tree node and rebuilds the full vocabulary
+dictionary in each process. A bundle is instead a directory of plain NumPy
+arrays plus a `manifest.json`:
+
+- vectorizer: analyzer settings in the manifest, terms in column order as a
+  fixed-width string array, IDF weights (TF-IDF) - or only the settings for a
+  stateless HashingVectorizer;
+- linear models (logistic regression, linear SVM, SGD, perceptron, naive
+  Bayes): coefficient matrix and intercepts, optionally pruned of near-zero
+  coefficients and stored sparse;
+- tree ensembles (random forest, extra trees, decision tree): all trees'
+  node arrays concatenated, restricted to the features the trees actually use.
+
+Arrays are opened with `mmap_mode='r'`, so loading costs milliseconds and
+worker processes that load the same bundle share its pages.
+
+This module provides:
+- save_bundle / load_bundle: write and open a bundle
+- ModelBundle: transform / decision_function / predict_proba / predict on raw texts
+- convert_saved_model: turn an existing joblib model + vectorizer pair into a bundle
+"""
+
+import os
+import json
+import time
+import shutil
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier, Perceptron, RidgeClassifier
+from sklearn.svm import LinearSVC
+from sklearn.naive_bayes import MultinomialNB, ComplementNB, BernoulliNB
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.ensemble import RandomForestClassifier, ExtraTreesClassifier
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+# CountVectorizer settings that determine how a text is turned into terms
+ANALYZER_PARAMS = ('input', 'encoding', 'decode_error', 'strip_accents', 'lowercase', 'stop_words',
+                   'token_pattern', 'ngram_range', 'analyzer', 'max_df', 'min_df', 'max_features', 'binary')
+TFIDF_PARAMS = ('norm', 'use_idf', 'smooth_idf', 'sublinear_tf')
+HASHING_PARAMS = ('input', 'encoding', 'decode_error', 'strip_accents', 'lowercase', 'stop_words',
+                  'token_pattern', 'ngram_range', 'analyzer', 'n_features', 'binary', 'norm', 'alternate_sign')
+
+LINEAR_MODELS = (LogisticRegression, SGDClassifier, Perceptron, RidgeClassifier, LinearSVC)
+NAIVE_BAYES_MODELS = (MultinomialNB, ComplementNB, BernoulliNB)
+TREE_MODELS = (RandomForestClassifier, ExtraTreesClassifier, DecisionTreeClassifier)
+
+
+def _jsonable_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for key, value in params.items():
+        if isinstance(value, (frozenset, set)):
+            value = sorted(value)
+        elif isinstance(value, tuple):
+            value = list(value)
+        out[key] = value
+    return out
+
+
+def _vectorizer_arrays(vectorizer: Any) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Manifest entry and arrays for a fitted text vectorizer."""
+    params = vectorizer.get_params()
+    for hook in ('preprocessor', 'tokenizer'):
+        if params.get(hook) is not None:
+            raise ValueError(f"Vectorizers with a custom {hook} cannot be bundled")
+    if callable(params.get('analyzer')):
+        raise ValueError("Vectorizers with a callable analyzer cannot be bundled")
+
+    if isinstance(vectorizer, HashingVectorizer):
+        return {'kind': 'hashing', 'params': _jsonable_params({k: params[k] for k in HASHING_PARAMS})}, {}
+
+    if not isinstance(vectorizer, CountVectorizer) or not hasattr(vectorizer, 'vocabulary_'):
+        raise ValueError(f"Unsupported or unfitted vectorizer: {type(vectorizer).__name__}")
+
+    terms = np.empty(len(vectorizer.vocabulary_), dtype=object)
+    for term, column in vectorizer.vocabulary_.items():
+        terms[column] = term
+    arrays = {'terms': terms.astype(str)}
+    entry = {'kind': 'count', 'params': _jsonable_params({k: params[k] for k in ANALYZER_PARAMS})}
+    if isinstance(vectorizer, TfidfVectorizer):
+        entry['kind'] = 'tfidf'
+        entry['tfidf'] = {k: params[k] for k in TFIDF_PARAMS}
+        if vectorizer.use_idf:
+            arrays['idf'] = np.asarray(vectorizer.idf_, dtype=np.float64)
+    return entry, arrays
+
+
+def _linear_arrays(
+    model: Any,
+    prune_below: Optional[float],
+    coef_dtype: Any
+) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Manifest entry and arrays for linear and naive Bayes classifiers."""
+    if isinstance(model, NAIVE_BAYES_MODELS):
+        if not isinstance(model, MultinomialNB):
+            raise ValueError(f"Only MultinomialNB is supported among naive Bayes models, not {type(model).__name__}")
+        # Joint log-likelihood is linear in the counts: X @ feature_log_prob_.T + class_log_prior_
+        coef, intercept, proba = model.feature_log_prob_, model.class_log_prior_, 'softmax'
+        if prune_below:
+            logger.warning("Pruning is not applied to naive Bayes log-probabilities")
+            prune_below = None
+    else:
+        coef, intercept = model.coef_, np.atleast_1d(model.intercept_)
+        proba = None
+        if isinstance(model, LogisticRegression) or (isinstance(model, SGDClassifier) and model.loss == 'log_loss'):
+            proba = 'sigmoid' if coef.shape[0] == 1 else ('softmax' if isinstance(model, LogisticRegression) else 'ovr')
+
+    coef = np.asarray(coef, dtype=coef_dtype)
+    entry = {
+        'kind': 'linear',
+        'proba': proba,
+        'decision': 'binary' if coef.shape[0] == 1 else 'argmax',
+        'n_features': int(coef.shape[1]),
+        'pruned': False,
+    }
+    arrays = {'intercept': np.asarray(intercept, dtype=np.float64)}
+
+    if prune_below:
+        kept = np.abs(coef) >= prune_below
+        pruned = sp.csr_matrix(np.where(kept, coef, 0))
+        entry.update({'pruned': True, 'prune_below': prune_below,
+                      'kept_coefficients': int(pruned.nnz), 'total_coefficients': int(coef.size)})
+        arrays.update({'coef_data': pruned.data, 'coef_indices': pruned.indices.astype(np.int32),
+                       'coef_indptr': pruned.indptr.astype(np.int64)})
+        logger.info(f"Pruned coefficients: kept {pruned.nnz:,} of {coef.size:,} (|w| >= {prune_below})")
+    else:
+        arrays['coef'] = coef
+    return entry, arrays
+
+
+def _tree_arrays(model: Any) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    """Manifest entry and concatenated node arrays for tree classifiers."""
+    trees = [model] if isinstance(model, DecisionTreeClassifier) else list(model.estimators_)
+    used = np.unique(np.concatenate([t.tree_.feature[t.tree_.feature >= 0] for t in trees]))
+    if len(used) == 0:
+        used = np.zeros(1, dtype=np.int64)
+    compact = np.full(model.n_features_in_, -1, dtype=np.int32)
+    compact[used] = np.arange(len(used), dtype=np.int32)
+
+    left, right, feature, threshold, value, roots = [], [], [], [], [], []
+    offset = 0
+    for tree in trees:
+        t = tree.tree_
+        nodes = np.arange(t.node_count)
+        is_leaf = t.children_left == -1
+        # Leaves point to themselves so traversal can run a fixed number of steps
+        left.append(np.where(is_leaf, nodes, t.children_left) + offset)
+        right.append(np.where(is_leaf, nodes, t.children_right) + offset)
+        feature.append(np.where(is_leaf, 0, compact[np.maximum(t.feature, 0)]))
+        threshold.append(np.where(is_leaf, np.inf, t.threshold))
+        counts = t.value[:, 0, :]
+        totals = counts.sum(axis=1, keepdims=True)
+        value.append(counts / np.where(totals == 0, 1, totals))
+        roots.append(offset)
+        offset += t.node_count
+
+    arrays = {
+        'left': np.concatenate(left).astype(np.int32),
+        'right': np.concatenate(right).astype(np.int32),
+        'feature': np.concatenate(feature).astype(np.int32),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'value': np.concatenate(value).astype(np.float64),
+        'roots': np.asarray(roots, dtype=np.int32),
+        'used_features': used.astype(np.int32),
+    }
+    entry = {
+        'kind': 'trees',
+        'n_trees': len(trees),
+        'n_nodes': int(offset),
+        'max_depth': int(max(t.tree_.max_depth for t in trees)),
+        'n_features': int(model.n_features_in_),
+        'n_used_features': int(len(used)),
+    }
+    return entry, arrays
+
+
+def save_bundle(
+    model: Any,
+    vectorizer: Any,
+    path: str,
+    metadata: Optional[Dict[str, Any]] = None,
+    prune_below: Optional[float] = None,
+    coef_dtype: Any = np.float64,
+    overwrite: bool = True
+) -> str:
+    """
+    Write a model bundle directory.
+
+    Args:
+        model: Fitted classifier (see module docstring for supported types)
+        vectorizer: Fitted CountVectorizer / TfidfVectorizer, or a HashingVectorizer
+        path: Bundle directory
+        metadata: Experiment metadata stored in the manifest
+        prune_below: Drop linear coefficients with |w| below this value and
+            store the rest sparse
+        coef_dtype: Storage dtype of linear coefficients (float32 halves the size)
+        overwrite: Replace an existing bundle at `path`
+
+    Returns:
+        The bundle path
+    """
+    if isinstance(model, TREE_MODELS):
+        model_entry, model_arrays = _tree_arrays(model)
+    elif isinstance(model, LINEAR_MODELS + NAIVE_BAYES_MODELS):
+        model_entry, model_arrays = _linear_arrays(model, prune_below, coef_dtype)
+    else:
+        raise ValueError(f"Unsupported model type: {type(model).__name__}")
+    vectorizer_entry, vectorizer_arrays = _vectorizer_arrays(vectorizer)
+
+    if os.path.exists(path):
+        if not overwrite:
+            raise FileExistsError(f"Bundle already exists: {path}")
+        shutil.rmtree(path)
+    os.makedirs(path)
+
+    arrays = {**{f"vectorizer_{k}": v for k, v in vectorizer_arrays.items()},
+              **{f"model_{k}": v for k, v in model_arrays.items()}}
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+
+    model_entry.update({'type': type(model).__name__, 'classes': np.asarray(model.classes_).tolist()})
+    manifest = {
+        'bundle_version': BUNDLE_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'model': model_entry,
+        'vectorizer': {**vectorizer_entry, 'type': type(vectorizer).__name__},
+        'arrays': {name: {'dtype': str(a.dtype), 'shape': list(a.shape)} for name, a in arrays.items()},
+        'metadata': metadata or {}
+    }
+    with open(os.path.join(path, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+    size = sum(a.nbytes for a in arrays.values())
+    logger.info(f"Saved {model_entry['type']} bundle to {path} ({size / 1024 ** 2:.1f} MB of arrays)")
+    return path
+
+
+class ModelBundle:
+    """
+    A loaded bundle: raw texts in, predictions out.
+
+    Use `load_bundle` to open one. Arrays stay memory-mapped; the vocabulary
+    lookup table is built on the first `transform` call.
+    """
+
+    def __init__(self, path: str, manifest: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.path = path
+        self.manifest = manifest
+        self.metadata = manifest.get('metadata', {})
+        self.arrays = arrays
+        self.classes_ = np.asarray(manifest['model']['classes'])
+        self._vocabulary: Optional[Dict[str, int]] = None
+
+        vec = manifest['vectorizer']
+        params = dict(vec['params'])
+        if params.get('ngram_range') is not None:
+            params['ngram_range'] = tuple(params['ngram_range'])
+        if vec['kind'] == 'hashing':
+            self._hasher = HashingVectorizer(**params)
+        else:
+            self._analyzer = CountVectorizer(**params).build_analyzer()
+            self._binary = params.get('binary', False)
+
+        self._coef = None
+        if manifest['model']['kind'] == 'linear':
+            if manifest['model']['pruned']:
+                n_rows = len(arrays['model_coef_indptr']) - 1
+                self._coef = sp.csr_matrix(
+                    (arrays['model_coef_data'], arrays['model_coef_indices'], arrays['model_coef_indptr']),
+                    shape=(n_rows, manifest['model']['n_features'])
+                )
+            else:
+                self._coef = arrays['model_coef']
+
+    @property
+    def vocabulary(self) -> Dict[str, int]:
+        if self._vocabulary is None:
+            terms = self.arrays['vectorizer_terms']
+            self._vocabulary = dict(zip(terms.tolist(), range(len(terms))))
+        return self._vocabulary
+
+    def transform(self, texts: Sequence[str]) -> sp.csr_matrix:
+        """Same matrix as the original vectorizer's `transform`."""
+        vec = self.manifest['vectorizer']
+        if vec['kind'] == 'hashing':
+            return self._hasher.transform(texts)
+
+        vocabulary = self.vocabulary
+        indices, indptr = [], [0]
+        for text in texts:
+            indices.extend(j for j in map(vocabulary.get, self._analyzer(text)) if j is not None)
+            indptr.append(len(indices))
+        X = sp.csr_matrix(
+            (np.ones(len(indices), dtype=np.int64), np.asarray(indices, dtype=np.int64), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(indptr) - 1, len(vocabulary))
+        )
+        X.sum_duplicates()
+        if self._binary:
+            X.data.fill(1)
+        if vec['kind'] == 'count':
+            return X
+
+        options = vec['tfidf']
+        X = X.astype(np.float64)
+        if options['sublinear_tf']:
+            np.log(X.data, X.data)
+            X.data += 1
+        if options['use_idf']:
+            X.data *= self.arrays['vectorizer_idf'][X.indices]
+        if options['norm']:
+            X = normalize(X, norm=options['norm'], copy=False)
+        return X
+
+    def _features(self, texts_or_X: Union[Sequence[str], sp.spmatrix]) -> sp.csr_matrix:
+        return texts_or_X.tocsr() if sp.issparse(texts_or_X) else self.transform(texts_or_X)
+
+    def decision_function(self, texts_or_X: Union[Sequence[str], sp.spmatrix]) -> np.ndarray:
+        """Linear scores (joint log-likelihood for naive Bayes)."""
+        if self.manifest['model']['kind'] != 'linear':
+            raise ValueError("decision_function is only available for linear bundles")
+        X = self._features(texts_or_X)
+        scores = np.asarray((X @ self._coef.T).todense() if sp.issparse(self._coef) else X @ self._coef.T)
+        scores = scores + self.arrays['model_intercept']
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    def _tree_proba(self, X: sp.csr_matrix, batch_size: int = 1024) -> np.ndarray:
+        a = self.arrays
+        used, roots = a['model_used_features'], a['model_roots']
+        left, right, feature, threshold = a['model_left'], a['model_right'], a['model_feature'], a['model_threshold']
+        out = np.empty((X.shape[0], a['model_value'].shape[1]))
+        for start in range(0, X.shape[0], batch_size):
+            # Trees compare float32 feature values, as scikit-learn does
+            dense = X[start:start + batch_size][:, used].toarray().astype(np.float32)
+            n_rows, flat = dense.shape[0], dense.ravel()
+            # One position per (row, tree); positions drop out once they reach a leaf
+            nodes = np.tile(roots, n_rows)
+            active = np.arange(len(nodes))
+            current = nodes.copy()
+            row_offset = np.repeat(np.arange(n_rows) * dense.shape[1], len(roots))
+            while len(active):
+                go_left = flat.take(row_offset + feature.take(current)) <= threshold.take(current)
+                following = np.where(go_left, left.take(current), right.take(current))
+                moving = following != current
+                nodes[active[~moving]] = current[~moving]
+                active, current, row_offset = active[moving], following[moving], row_offset[moving]
+            out[start:start + n_rows] = a['model_value'][nodes].reshape(n_rows, len(roots), -1).mean(axis=1)
+        return out
+
+    def predict_proba(self, texts_or_X: Union[Sequence[str], sp.spmatrix]) -> np.ndarray:
+        model = self.manifest['model']
+        X = self._features(texts_or_X)
+        if model['kind'] == 'trees':
+            return self._tree_proba(X)
+
+        link = model['proba']
+        if link is None:
+            raise ValueError(f"{model['type']} does not provide probabilities")
+        scores = self.decision_function(X)
+        if link == 'sigmoid':
+            positive = 1.0 / (1.0 + np.exp(-scores))
+            return np.column_stack([1 - positive, positive])
+        if link == 'ovr':
+            proba = 1.0 / (1.0 + np.exp(-scores))
+            return proba / proba.sum(axis=1, keepdims=True)
+        shifted = np.exp(scores - scores.max(axis=1, keepdims=True))
+        return shifted / shifted.sum(axis=1, keepdims=True)
+
+    def predict(self, texts_or_X: Union[Sequence[str], sp.spmatrix]) -> np.ndarray:
+        model = self.manifest['model']
+        X = self._features(texts_or_X)
+        if model['kind'] == 'trees':
+            return self.classes_[np.argmax(self._tree_proba(X), axis=1)]
+        scores = self.decision_function(X)
+        if model['decision'] == 'binary':
+            return self.classes_[(scores > 0).astype(int)]
+        return self.classes_[np.argmax(scores, axis=1)]
+
+
+def load_bundle(path: str, mmap: bool = True) -> ModelBundle:
+    """
+    Open a bundle directory.
+
+    Args:
+        path: Bundle directory written by `save_bundle`
+        mmap: Memory-map the arrays (read-only, shared between processes)
+    """
+    start = time.perf_counter()
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('bundle_version') != BUNDLE_VERSION:
+        raise ValueError(f"Unsupported bundle version: {manifest.get('bundle_version')}")
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+        for name in manifest['arrays']
+    }
+    bundle = ModelBundle(path, manifest, arrays)
+    logger.debug(f"Loaded bundle {path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+    return bundle
+
+
+def convert_saved_model(
+    model_path: str,
+    vectorizer_path: str,
+    bundle_path: Optional[str] = None,
+    metadata_path: Optional[str] = None,
+    **save_kwargs
+) -> str:
+    """
+    Convert a joblib model + vectorizer pair (as written by
+    `save_model_with_metadata`) into a bundle next to the model file.
+    """
+    import joblib
+
+    metadata = None
+    if metadata_path and os.path.exists(metadata_path):
+        with open(metadata_path) as f:
+            metadata = json.load(f)
+    if bundle_path is None:
+        bundle_path = model_path.rsplit('_model.joblib', 1)[0] + '_bundle'
+    return save_bundle(joblib.load(model_path), joblib.load(vectorizer_path), bundle_path, metadata, **save_kwargs)
+
+
+def bundle_size(path: str) -> int:
+    """Bytes on disk of a bundle directory."""
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
@@ -0,0 +1,301 @@
+"""
+Warm-started synthetic-ratio sweeps for scalability curves.
+
+The scalability experiments chart how F1 moves as synthetic headlines are
+added, refitting the vectorizer and every model from scratch on each
+`X_train_orig + synthetic[:n]` mix and scoring a single split. Here each
+split is tokenized once through a `VectorizationCache`, its feature space is
+fixed up front, and the steps are nested (step k+1 adds new synthetic rows on
+top of step k), so learners only see the increment:
+
+- naive_bayes: `partial_fit` on the new rows. Multinomial NB is a sum of
+  per-class counts, so this is exactly the model a full refit would give.
+- logistic_regression: lbfgs with `warm_start=True`, restarted from the
+  previous step's coefficients (same optimum, far fewer iterations).
+- sgd_logistic: `partial_fit` on the new rows mixed with an equal-sized
+  replay of rows already seen.
+
+Repeating the sweep over several stratified splits gives a mean curve with
+t-based confidence bands per step.
+
+This module provides:
+- sweep_steps / balance_steps: synthetic-count grids (linear, geometric, balance targets)
+- SyntheticRatioSweep: repeated, nested, warm-started sweeps over one corpus
+- learning_curve: per-step mean / std / confidence band of a metric
+- plot_learning_curve: matplotlib band plot of one or more curves
+"""
+
+import time
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from scipy import stats
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.model_selection import StratifiedShuffleSplit
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+
+from vectorization_cache import VectorizationCache
+
+logger = logging.getLogger(__name__)
+
+SWEEP_MODELS = {
+    'naive_bayes': lambda seed: MultinomialNB(alpha=1.0),
+    'logistic_regression': lambda seed: LogisticRegression(max_iter=1000, warm_start=True, random_state=seed),
+    'sgd_logistic': lambda seed: SGDClassifier(loss='log_loss', alpha=1e-5, random_state=seed),
+}
+
+# How each model absorbs a step: only the new rows, or a warm refit on all rows
+INCREMENTAL_MODELS = {'naive_bayes', 'sgd_logistic'}
+
+
+def sweep_steps(max_synthetic: int, n_steps: int = 10, spacing: str = 'linear', start: int = 0) -> List[int]:
+    """
+    Synthetic counts from `start` (default 0, the unaugmented baseline) to `max_synthetic`.
+
+    Args:
+        max_synthetic: Largest synthetic count
+        n_steps: Number of points on the curve
+        spacing: 'linear' or 'geometric' (denser at small counts)
+        start: Smallest count
+    """
+    if spacing == 'linear':
+        points = np.linspace(start, max_synthetic, n_steps)
+    elif spacing == 'geometric':
+        points = np.geomspace(max(start, 1), max_synthetic, n_steps - int(start == 0))
+        if start == 0:
+            points = np.concatenate([[0], points])
+    else:
+        raise ValueError(f"Unknown spacing: {spacing}. Use 'linear' or 'geometric'")
+    return sorted(set(int(round(p)) for p in points))
+
+
+def balance_steps(real_count: int, fake_count: int, target_ratios: Sequence[float]) -> List[int]:
+    """
+    Synthetic counts reaching each real:fake target ratio.
+
+    Same rule as `calculate_needed_headlines` in the scalability notebook,
+    plus the unaugmented baseline (0).
+    """
+    counts = {0}
+    for ratio in target_ratios:
+        counts.add(int(max(0, real_count / ratio - fake_count)))
+    return sorted(counts)
+
+
+def _metrics(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    """The metric set of the notebook's imbalance-correction comparison."""
+    fake = y_true == 1
+    return {
+        'accuracy': accuracy_score(y_true, y_pred),
+        'f1_macro': f1_score(y_true, y_pred, average='macro', zero_division=0),
+        'f1_weighted': f1_score(y_true, y_pred, average='weighted', zero_division=0),
+        'precision_fake': precision_score(y_true, y_pred, pos_label=1, zero_division=0),
+        'recall_fake': recall_score(y_true, y_pred, pos_label=1, zero_division=0),
+        'f1_fake': f1_score(y_true, y_pred, pos_label=1, zero_division=0),
+        'f1_real': f1_score(y_true, y_pred, pos_label=0, zero_division=0),
+        'fake_detection_accuracy': float((y_pred[fake] == 1).mean()) if fake.any() else 0.0,
+    }
+
+
+class SyntheticRatioSweep:
+    """
+    Nested synthetic-count sweep over repeated stratified splits.
+
+    Args:
+        texts: Original (real + fake) texts
+        labels: Their labels (0 = real, 1 = fake)
+        synthetic_texts: Synthetic pool; every step draws from a per-repeat shuffle of it
+        steps: Synthetic counts to evaluate (see `sweep_steps` / `balance_steps`)
+        models: Keys of SWEEP_MODELS, or {name: estimator} (estimators are
+            refit from scratch at every step unless they expose `partial_fit`)
+        n_repeats: Number of stratified train/test splits
+        test_size: Test fraction of every split
+        vocabulary: 'final' (features selected on the largest training mix and
+            kept for every step), 'base' (original training rows only), or
+            'per_step' (refit at every step, as the notebook does; no warm start)
+        weighting: 'count' or 'tfidf'
+        max_features, min_df, max_df: Vectorizer settings (notebook defaults)
+        synthetic_label: Label given to synthetic rows
+        random_state: Seed for the splits, pool shuffles and models
+        n_jobs: Repeats run in parallel threads
+        cache: Optional prebuilt VectorizationCache holding all texts
+    """
+
+    def __init__(
+        self,
+        texts: Sequence[str],
+        labels: Sequence[int],
+        synthetic_texts: Sequence[str],
+        steps: Sequence[int],
+        models: Any = ('naive_bayes', 'logistic_regression'),
+        n_repeats: int = 5,
+        test_size: float = 0.2,
+        vocabulary: str = 'final',
+        weighting: str = 'count',
+        max_features: Optional[int] = 5000,
+        min_df: Any = 2,
+        max_df: Any = 0.95,
+        synthetic_label: int = 1,
+        random_state: int = 42,
+        n_jobs: int = 1,
+        cache: Optional[VectorizationCache] = None,
+        **analyzer_params
+    ):
+        if vocabulary not in ('final', 'base', 'per_step'):
+            raise ValueError(f"Unknown vocabulary: {vocabulary}. Use 'final', 'base' or 'per_step'")
+        steps = sorted(set(int(s) for s in steps))
+        if steps and steps[-1] > len(synthetic_texts):
+            raise ValueError(f"Largest step ({steps[-1]:,}) exceeds the synthetic pool ({len(synthetic_texts):,})")
+
+        if isinstance(models, dict):
+            self.models = dict(models)
+        else:
+            unknown = [name for name in models if name not in SWEEP_MODELS]
+            if unknown:
+                raise ValueError(f"Unknown models: {unknown}. Available: {list(SWEEP_MODELS)}")
+            self.models = {name: SWEEP_MODELS[name](random_state) for name in models}
+
+        self.steps = steps
+        self.n_repeats = n_repeats
+        self.test_size = test_size
+        self.vocabulary = vocabulary
+        self.vectorizer_params = {'weighting': weighting, 'max_features': max_features,
+                                  'min_df': min_df, 'max_df': max_df}
+        self.synthetic_label = synthetic_label
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+
+        start = time.time()
+        self.cache = cache or VectorizationCache(**analyzer_params)
+        self.base_rows = self.cache.add_texts(list(texts), name='sweep_base')
+        self.synthetic_rows = self.cache.add_texts(list(synthetic_texts), name='sweep_synthetic')
+        self.labels = np.asarray(labels)
+        logger.info(f"Tokenized {self.cache.n_rows:,} texts once ({time.time() - start:.1f}s)")
+
+    def splits(self) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(train, test) positions into the original texts, one pair per repeat."""
+        splitter = StratifiedShuffleSplit(n_splits=self.n_repeats, test_size=self.test_size,
+                                          random_state=self.random_state)
+        return list(splitter.split(np.zeros(len(self.labels)), self.labels))
+
+    def _fit_step(self, name: str, model: Any, X: sp.csr_matrix, y: np.ndarray, new: slice,
+                  warm: bool, rng: np.random.Generator) -> Any:
+        """Bring `model` from the previous step to the current one."""
+        if not warm:
+            return clone(model).fit(X, y)
+        if name in INCREMENTAL_MODELS or (name not in SWEEP_MODELS and hasattr(model, 'partial_fit')):
+            rows = np.arange(new.start, new.stop)
+            if name == 'sgd_logistic' and new.start > 0:
+                # Replay earlier rows so the update is not driven by synthetic rows alone
+                replay = rng.choice(new.start, size=min(new.start, len(rows)), replace=False)
+                rows = rng.permutation(np.concatenate([rows, replay]))
+            if len(rows):
+                model.partial_fit(X[rows], y[rows], classes=np.array([0, 1]))
+            return model
+        return model.fit(X, y)
+
+    def _run_repeat(self, repeat: int, train: np.ndarray, test: np.ndarray) -> List[Dict[str, Any]]:
+        rng = np.random.default_rng(self.random_state + repeat)
+        synthetic = self.synthetic_rows[rng.permutation(len(self.synthetic_rows))[:self.steps[-1]]]
+        train_rows = self.base_rows[train]
+        all_rows = np.concatenate([train_rows, synthetic])
+        y_all = np.concatenate([self.labels[train], np.full(len(synthetic), self.synthetic_label)])
+        y_test = self.labels[test]
+        n_base = len(train_rows)
+
+        warm = self.vocabulary != 'per_step'
+        if warm:
+            fit_rows = all_rows if self.vocabulary == 'final' else train_rows
+            _, _, vectorizer = self.cache.vectorize(fit_rows, **self.vectorizer_params)
+            X_all = self.cache.transform(all_rows, vectorizer)
+            X_test = self.cache.transform(self.base_rows[test], vectorizer)
+        models = {name: clone(model) for name, model in self.models.items()}
+
+        records, previous = [], None
+        for n_synthetic in self.steps:
+            end = n_base + n_synthetic
+            if not warm:
+                X_train, X_test, _ = self.cache.vectorize(all_rows[:end], self.base_rows[test],
+                                                          **self.vectorizer_params)
+            else:
+                X_train = X_all[:end]
+            y_train = y_all[:end]
+            new = slice(0, end) if previous is None else slice(n_base + previous, end)
+
+            for name in models:
+                start = time.perf_counter()
+                models[name] = self._fit_step(name, models[name], X_train, y_train, new, warm, rng)
+                fit_seconds = time.perf_counter() - start
+                y_pred = models[name].predict(X_test)
+                fake = int((y_train == 1).sum())
+                records.append({
+                    'repeat': repeat,
+                    'model': name,
+                    'n_synthetic': n_synthetic,
+                    'training_size': end,
+                    'training_balance': (end - fake) / fake if fake else 0.0,
+                    'synthetic_fraction': n_synthetic / end,
+                    **_metrics(y_test, y_pred),
+                    'fit_seconds': fit_seconds,
+                })
+            previous = n_synthetic
+        return records
+
+    def run(self) -> pd.DataFrame:
+        """Run every repeat; one row per (repeat, model, step)."""
+        start = time.time()
+        jobs = (delayed(self._run_repeat)(r, train, test) for r, (train, test) in enumerate(self.splits()))
+        batches = Parallel(n_jobs=self.n_jobs, prefer='threads')(jobs)
+        results = pd.DataFrame([record for batch in batches for record in batch])
+        logger.info(f"Swept {len(self.steps)} steps x {self.n_repeats} repeats x {len(self.models)} models "
+                    f"in {time.time() - start:.1f}s")
+        return results
+
+
+def learning_curve(
+    results: pd.DataFrame,
+    metric: str = 'f1_fake',
+    confidence: float = 0.95,
+    by: Sequence[str] = ('model',)
+) -> pd.DataFrame:
+    """
+    Mean, standard deviation and t-based confidence band of `metric` per step.
+
+    Args:
+        results: Output of `SyntheticRatioSweep.run`
+        metric: Column to summarize
+        confidence: Two-sided confidence level of the band
+        by: Grouping columns besides `n_synthetic`
+    """
+    grouped = results.groupby(list(by) + ['n_synthetic'])[metric]
+    curve = grouped.agg(['mean', 'std', 'count']).reset_index()
+    curve['std'] = curve['std'].fillna(0.0)
+    t = stats.t.ppf(0.5 + confidence / 2, np.maximum(curve['count'] - 1, 1))
+    half_width = t * curve['std'] / np.sqrt(curve['count'])
+    curve['ci_low'] = curve['mean'] - half_width
+    curve['ci_high'] = curve['mean'] + half_width
+    curve['metric'] = metric
+    return curve
+
+
+def plot_learning_curve(curve: pd.DataFrame, ax: Any = None, by: str = 'model', title: Optional[str] = None) -> Any:
+    """Plot each group's mean line with its confidence band."""
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        _, ax = plt.subplots(figsize=(10, 6))
+    for name, group in curve.groupby(by):
+        ax.plot(group['n_synthetic'], group['mean'], marker='o', label=name)
+        ax.fill_between(group['n_synthetic'], group['ci_low'], group['ci_high'], alpha=0.2)
+    ax.set_xlabel('Synthetic headlines added')
+    ax.set_ylabel(curve['metric'].iloc[0] if len(curve) else '')
+    ax.set_title(title or 'Performance vs. synthetic data volume')
+    ax.grid(True, alpha=0.3)
+    ax.legend()
+    return ax
@@ -0,0 +1,338 @@
+"""
+Index-based sampling strategies over one shared feature matrix.
+
+`manual_oversample`, `manual_undersample` and the severity notebook's former
+list-based `apply_sampling_strategy` each build a new copy of the training
+set (text lists, DataFrames, then a freshly vectorized sparse matrix) for
+every strategy. Here a strategy is only an array of row indices into a row space
+that is vectorized once (e.g. the rows of a VectorizationCache holding the
+real, fake and synthetic pools). Repeated indices express oversampling, and a
+plan collapses into a per-row sample-weight vector, so ten strategies cost ten
+integer arrays rather than ten training sets.
+
+Draws reproduce the notebooks exactly: `resample_indices` applies
+`sklearn.utils.resample` to the index array, and the over/undersamplers use
+the same seeded `np.random.choice` calls as the manual implementations.
+
+This module provides:
+- SamplingPlan: row indices of one strategy, with weights/compaction helpers
+- resample_indices / oversample_indices / undersample_indices / inject_synthetic
+- take_rows: turn row indices back into lists for list-based notebook code
+- imbalance_rows / strategy_plans: the severity-analysis datasets and strategies
+- fit_plan: fit an estimator on a plan via sample weights or a transient row slice
+- plan_memory_report: index bytes versus materialized training matrices
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.base import clone
+from sklearn.utils import resample
+from sklearn.utils.validation import has_fit_parameter
+from sklearn.linear_model import LogisticRegression
+from sklearn.naive_bayes import MultinomialNB, ComplementNB, BernoulliNB
+from sklearn.svm import LinearSVC
+
+logger = logging.getLogger(__name__)
+
+# Estimators whose weighted fit equals a fit on duplicated rows, so a plan can be
+# passed as a sample-weight vector over the shared matrix. Bootstrapped or
+# order-dependent learners (random forests, SGD) are fed row slices instead.
+WEIGHT_EQUIVALENT_ESTIMATORS = (LogisticRegression, LinearSVC, MultinomialNB, ComplementNB, BernoulliNB)
+
+STRATEGY_DESCRIPTIONS = {
+    'unbalanced': 'Original imbalanced data',
+    'undersampling': 'Majority class downsampled to the minority count',
+    'random_oversampling': 'Minority class duplicated up to the majority count',
+    'stylistic_10': 'Minority plus 10% of the synthetic pool',
+    'stylistic_50': 'Minority plus 50% of the synthetic pool',
+    'stylistic_100': 'Minority plus the full synthetic pool',
+}
+
+
+@dataclass
+class SamplingPlan:
+    """
+    One sampling strategy as row indices into a shared row space.
+
+    Attributes:
+        name: Strategy name
+        rows: Row indices in training order; repeats mean duplication
+        description: Human-readable summary
+    """
+    name: str
+    rows: np.ndarray
+    description: str = ""
+
+    def __post_init__(self):
+        self.rows = np.asarray(self.rows, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self.rows.nbytes
+
+    def sample_weight(self, n_rows: int) -> np.ndarray:
+        """Per-row weights over the whole row space (0 for unused rows)."""
+        return np.bincount(self.rows, minlength=n_rows).astype(np.float64)
+
+    def compact(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Distinct rows (sorted) and how often each one is used."""
+        return np.unique(self.rows, return_counts=True)
+
+    def take(self, items: Sequence[Any]) -> List[Any]:
+        """Materialize the plan over a list (texts, labels) for list-based code."""
+        return take_rows(items, self.rows)
+
+    def class_counts(self, y: np.ndarray) -> Dict[Any, int]:
+        labels, counts = np.unique(np.asarray(y)[self.rows], return_counts=True)
+        return {label.item() if hasattr(label, 'item') else label: int(count) for label, count in zip(labels, counts)}
+
+
+def take_rows(items: Sequence[Any], rows: np.ndarray) -> List[Any]:
+    """List of `items` at the given rows (references, not copies, of the items)."""
+    return [items[i] for i in rows]
+
+
+def resample_indices(
+    rows: Sequence[int],
+    n_samples: Optional[int] = None,
+    replace: bool = True,
+    random_state: Optional[int] = 42
+) -> np.ndarray:
+    """
+    `sklearn.utils.resample` applied to row indices.
+
+    Selects exactly the same positions as resampling a list of the same length
+    with the same arguments, so `resample(texts, ...)` can be replaced by
+    `rows[resample_indices(...)]`-style plans without changing results.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) == 0:
+        return rows
+    return np.asarray(resample(rows, n_samples=n_samples, replace=replace, random_state=random_state), dtype=np.int64)
+
+
+def _majority_minority(y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    labels, counts = np.unique(y, return_counts=True)
+    majority = np.where(y == labels[np.argmax(counts)])[0]
+    minority = np.where(y == labels[np.argmin(counts)])[0]
+    return majority, minority
+
+
+def oversample_indices(y: Sequence[Any], rows: Optional[Sequence[int]] = None, random_state: int = 42) -> np.ndarray:
+    """
+    Random oversampling of the minority class, as `manual_oversample` does.
+
+    Args:
+        y: Labels of the candidate rows
+        rows: Shared-space row of each label (default: positions in `y`)
+        random_state: Seed (drawn with `np.random.RandomState`, identical to
+            `np.random.seed(random_state)` followed by `np.random.choice`)
+
+    Returns:
+        Majority rows, minority rows, then the duplicated minority rows
+    """
+    y = np.asarray(y)
+    rows = np.arange(len(y)) if rows is None else np.asarray(rows, dtype=np.int64)
+    majority, minority = _majority_minority(y)
+    extra = np.random.RandomState(random_state).choice(minority, size=len(majority) - len(minority), replace=True)
+    return rows[np.concatenate([majority, minority, extra])]
+
+
+def undersample_indices(y: Sequence[Any], rows: Optional[Sequence[int]] = None, random_state: int = 42) -> np.ndarray:
+    """
+    Random undersampling of the majority class, as `manual_undersample` does.
+
+    Returns:
+        Sampled majority rows followed by all minority rows
+    """
+    y = np.asarray(y)
+    rows = np.arange(len(y)) if rows is None else np.asarray(rows, dtype=np.int64)
+    majority, minority = _majority_minority(y)
+    kept = np.random.RandomState(random_state).choice(majority, size=len(minority), replace=False)
+    return rows[np.concatenate([kept, minority])]
+
+
+def inject_synthetic(
+    base_rows: Sequence[int],
+    synthetic_rows: Sequence[int],
+    n_samples: Optional[int] = None,
+    random_state: Optional[int] = 42
+) -> np.ndarray:
+    """
+    Append synthetic rows to a base set.
+
+    Args:
+        base_rows: Rows already in the training set
+        synthetic_rows: Rows of the synthetic pool
+        n_samples: Draw this many synthetic rows with `resample_indices`
+            (None = append the whole pool in order)
+        random_state: Seed for the draw
+    """
+    synthetic_rows = np.asarray(synthetic_rows, dtype=np.int64)
+    if n_samples is not None:
+        synthetic_rows = resample_indices(synthetic_rows, n_samples=n_samples, random_state=random_state)
+    return np.concatenate([np.asarray(base_rows, dtype=np.int64), synthetic_rows])
+
+
+def imbalance_rows(
+    real_rows: Sequence[int],
+    fake_rows: Sequence[int],
+    imbalance_config: Dict[str, Any],
+    random_state: int = 42
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Index version of `create_imbalanced_datasets`.
+
+    Returns:
+        Tuple of (sampled real rows, sampled fake rows)
+    """
+    real_rows = np.asarray(real_rows, dtype=np.int64)
+    fake_rows = np.asarray(fake_rows, dtype=np.int64)
+    return (
+        resample_indices(real_rows, n_samples=min(imbalance_config['real'], len(real_rows)), random_state=random_state),
+        resample_indices(fake_rows, n_samples=min(imbalance_config['fake'], len(fake_rows)), random_state=random_state)
+    )
+
+
+def strategy_rows(
+    strategy: str,
+    real_rows: np.ndarray,
+    fake_rows: np.ndarray,
+    synthetic_rows: np.ndarray,
+    random_state: int = 42
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Real and fake rows of one severity-analysis sampling strategy.
+
+    The stylistic strategies draw 10% / 50% of the synthetic pool (377 and
+    1,886 of the 3,772 stylistic tweets) and the 100% strategy appends it all.
+
+    Returns:
+        Tuple of (real rows, fake rows) for the strategy
+    """
+    real_rows = np.asarray(real_rows, dtype=np.int64)
+    fake_rows = np.asarray(fake_rows, dtype=np.int64)
+    synthetic_rows = np.asarray(synthetic_rows, dtype=np.int64)
+
+    if strategy == "unbalanced":
+        return real_rows, fake_rows
+    if strategy == "undersampling":
+        return resample_indices(real_rows, n_samples=len(fake_rows), random_state=random_state), fake_rows
+    if strategy == "random_oversampling":
+        imbalance = len(real_rows) - len(fake_rows)
+        if imbalance > 0:
+            duplicates = resample_indices(fake_rows, n_samples=imbalance, random_state=random_state)
+            return real_rows, np.concatenate([fake_rows, duplicates])
+        return real_rows, fake_rows
+    if strategy.startswith("stylistic_"):
+        share = int(strategy.split('_', 1)[1])
+        if share == 100:
+            return real_rows, inject_synthetic(fake_rows, synthetic_rows)
+        n_samples = int(len(synthetic_rows) * share / 100)
+        return real_rows, inject_synthetic(fake_rows, synthetic_rows, n_samples, random_state)
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+def strategy_plans(
+    real_rows: Sequence[int],
+    fake_rows: Sequence[int],
+    synthetic_rows: Sequence[int] = (),
+    strategies: Optional[Sequence[str]] = None,
+    random_state: int = 42
+) -> Dict[str, SamplingPlan]:
+    """
+    Build every sampling strategy as a plan over the same row space.
+
+    Each plan lists the strategy's real rows followed by its fake rows, the
+    order in which the notebooks concatenate `real_data + fake_data`.
+    """
+    plans = {}
+    for strategy in strategies or STRATEGY_DESCRIPTIONS:
+        real, fake = strategy_rows(strategy, real_rows, fake_rows, synthetic_rows, random_state)
+        plans[strategy] = SamplingPlan(
+            name=strategy,
+            rows=np.concatenate([real, fake]),
+            description=STRATEGY_DESCRIPTIONS.get(strategy, strategy)
+        )
+    return plans
+
+
+def fit_plan(
+    estimator: Any,
+    X: Any,
+    y: Sequence[Any],
+    plan: SamplingPlan,
+    mode: str = 'auto',
+    copy_estimator: bool = True
+) -> Any:
+    """
+    Fit an estimator on a plan without materializing a training set per strategy.
+
+    Args:
+        estimator: scikit-learn estimator
+        X: Shared feature matrix (all rows of the row space)
+        y: Labels of every row of the row space
+        plan: Sampling plan to train on
+        mode: 'weights' fits on the distinct rows with their use counts as
+            sample weights; 'rows' fits on `X[plan.rows]`, a slice that lives
+            only for the duration of the fit; 'auto' uses weights for
+            WEIGHT_EQUIVALENT_ESTIMATORS and rows otherwise
+        copy_estimator: Fit a clone rather than the estimator passed in
+
+    Returns:
+        The fitted estimator
+    """
+    if mode not in ('auto', 'weights', 'rows'):
+        raise ValueError(f"Unknown mode: {mode}. Use 'auto', 'weights' or 'rows'")
+    if mode == 'auto':
+        mode = 'weights' if isinstance(estimator, WEIGHT_EQUIVALENT_ESTIMATORS) else 'rows'
+    if mode == 'weights' and not has_fit_parameter(estimator, 'sample_weight'):
+        raise ValueError(f"{type(estimator).__name__} does not accept sample_weight; use mode='rows'")
+
+    model = clone(estimator) if copy_estimator else estimator
+    y = np.asarray(y)
+    if mode == 'weights':
+        rows, counts = plan.compact()
+        if len(rows) == X.shape[0]:
+            # Plan touches every row: weight the shared matrix itself, no slice at all
+            return model.fit(X, y, sample_weight=counts.astype(np.float64))
+        return model.fit(X[rows], y[rows], sample_weight=counts.astype(np.float64))
+    return model.fit(X[plan.rows], y[plan.rows])
+
+
+def plan_memory_report(plans: Dict[str, SamplingPlan], X: Any) -> pd.DataFrame:
+    """
+    Bytes held by each plan versus a materialized copy of its training matrix.
+
+    For sparse X the copy size is estimated from the stored entries of the
+    selected rows (data + indices + indptr).
+    """
+    if sp.issparse(X):
+        X = X.tocsr()
+        row_nnz = np.diff(X.indptr)
+        bytes_per_entry = X.data.itemsize + X.indices.itemsize
+    rows = []
+    for name, plan in plans.items():
+        if sp.issparse(X):
+            copy_bytes = int(row_nnz[plan.rows].sum()) * bytes_per_entry + (len(plan) + 1) * X.indptr.itemsize
+        else:
+            copy_bytes = len(plan) * int(np.prod(X.shape[1:])) * X.itemsize
+        rows.append({
+            'strategy': name,
+            'rows': len(plan),
+            'distinct_rows': len(np.unique(plan.rows)),
+            'plan_bytes': plan.nbytes,
+            'materialized_bytes': copy_bytes,
+        })
+    report = pd.DataFrame(rows)
+    logger.info(f"{len(plans)} plans hold {report['plan_bytes'].sum():,} bytes of indices "
+                f"versus {report['materialized_bytes'].sum():,} bytes of materialized matrices")
+    return report
@@ -0,0 +1,465 @@
+"""
+Local micro-batching scoring service for saved classifier bundles.
+
+Requests to score tweets or headlines arrive one or a few texts at a time.
+Scoring each request on its own pays the per-call overhead (vectorizer setup,
+sparse matrix construction, tree traversal) for every handful of texts. The
+service instead queues incoming texts per model and flushes a micro-batch
+when it reaches `max_batch_size` or when its oldest text has waited
+`max_wait_ms`. Each batch is vectorized in one sparse operation and scored in
+one `predict_proba` call. Model bundles (model_bundles.py) are memory-mapped,
+so several service processes can share the model pages.
+
+The HTTP layer is a minimal HTTP/1.1 server on asyncio streams (CPU only, no
+web framework needed):
+- POST /score    {"texts": [...], "model": optional bundle name}
+- GET  /metrics  throughput, batch sizes, latency percentiles per model
+- GET  /models   loaded bundles and their metadata
+- GET  /health
+
+This module provides:
+- MicroBatcher: async queue that scores texts in deadline-bounded batches
+- ServiceMetrics: rolling latency / batch-size statistics
+- ScoringService: HTTP server over one or more bundles
+- start_in_thread: run the service in a background thread (e.g. from a notebook)
+- run_load: local load generator reporting client-side latency and throughput
+"""
+
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from model_bundles import ModelBundle, load_bundle
+
+logger = logging.getLogger(__name__)
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+class ServiceMetrics:
+    """
+    Counters and rolling-window statistics for one model.
+
+    Args:
+        window: Number of recent requests / batches kept for percentiles
+    """
+
+    def __init__(self, window: int = 10000):
+        self.started = time.time()
+        self.requests = 0
+        self.items = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies_ms: deque = deque(maxlen=window)
+        self.batch_sizes: deque = deque(maxlen=window)
+        self.batch_times_ms: deque = deque(maxlen=window)
+
+    def record_batch(self, size: int, seconds: float):
+        self.batches += 1
+        self.items += size
+        self.batch_sizes.append(size)
+        self.batch_times_ms.append(seconds * 1000)
+
+    def record_request(self, seconds: float):
+        self.requests += 1
+        self.latencies_ms.append(seconds * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = time.time() - self.started
+        latencies = np.asarray(self.latencies_ms) if self.latencies_ms else np.zeros(1)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        return {
+            'uptime_seconds': elapsed,
+            'requests': self.requests,
+            'items_scored': self.items,
+            'batches': self.batches,
+            'errors': self.errors,
+            'items_per_second': self.items / elapsed if elapsed else 0.0,
+            'mean_batch_size': float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+            'mean_batch_ms': float(np.mean(self.batch_times_ms)) if self.batch_times_ms else 0.0,
+            'latency_ms_p50': float(p50),
+            'latency_ms_p95': float(p95),
+            'latency_ms_p99': float(p99),
+        }
+
+
+class MicroBatcher:
+    """
+    Collect concurrent score requests for one bundle into micro-batches.
+
+    Args:
+        bundle: Loaded model bundle
+        max_batch_size: Texts per batch at most
+        max_wait_ms: Longest time the first queued text waits for company
+        metrics: Metrics sink (a new one by default)
+    """
+
+    def __init__(
+        self,
+        bundle: ModelBundle,
+        max_batch_size: int = 256,
+        max_wait_ms: float = 5.0,
+        metrics: Optional[ServiceMetrics] = None
+    ):
+        self.bundle = bundle
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = metrics or ServiceMetrics()
+        self.queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the batching loop on the running event loop."""
+        self.queue = asyncio.Queue()
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+
+    async def score(self, texts: Sequence[str]) -> Tuple[List[Any], List[Optional[List[float]]]]:
+        """Queue texts and wait for their (predictions, probabilities); probabilities are None without proba."""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for text in texts:
+            future = loop.create_future()
+            self.queue.put_nowait((str(text), future))
+            futures.append(future)
+        results = await asyncio.gather(*futures)
+        return [r[0] for r in results], [r[1] for r in results]
+
+    def _score_batch(self, texts: List[str]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        X = self.bundle.transform(texts)
+        model = self.bundle.manifest['model']
+        if model['kind'] != 'trees' and model.get('proba') is None:
+            # LinearSVC, hinge SGD, Perceptron, Ridge: labels only, null probabilities
+            return self.bundle.predict(X), None
+        proba = self.bundle.predict_proba(X)
+        return self.bundle.classes_[np.argmax(proba, axis=1)], proba
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                # Drain what is already queued, then wait for more until the deadline
+                try:
+                    batch.append(self.queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            start = time.perf_counter()
+            try:
+                # Scoring runs off the event loop so new requests keep queueing meanwhile
+                predictions, proba = await loop.run_in_executor(None, self._score_batch, texts)
+            except Exception as e:
+                self.metrics.errors += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.metrics.record_batch(len(batch), time.perf_counter() - start)
+            rows = proba.tolist() if proba is not None else [None] * len(batch)
+            for (_, future), label, row in zip(batch, predictions.tolist(), rows):
+                if not future.done():
+                    future.set_result((label, row))
+
+
+def discover_bundles(models_dir: str) -> Dict[str, str]:
+    """Bundle directories (`*_bundle` with a manifest) found in a models directory."""
+    found = {}
+    for name in sorted(os.listdir(models_dir)):
+        path = os.path.join(models_dir, name)
+        if os.path.isfile(os.path.join(path, 'manifest.json')):
+            found[name[:-len('_bundle')] if name.endswith('_bundle') else name] = path
+    return found
+
+
+class ScoringService:
+    """
+    HTTP scoring service over one or more model bundles.
+
+    Args:
+        bundles: {name: bundle path}; see `discover_bundles`
+        default_model: Bundle used when a request names none (first by default)
+        host / port: Listen address (port 0 picks a free port)
+        max_batch_size / max_wait_ms: Micro-batching limits
+        max_body_bytes: Largest accepted request body
+    """
+
+    def __init__(
+        self,
+        bundles: Dict[str, str],
+        default_model: Optional[str] = None,
+        host: str = '127.0.0.1',
+        port: int = 8765,
+        max_batch_size: int = 256,
+        max_wait_ms: float = 5.0,
+        max_body_bytes: int = 10 * 1024 ** 2
+    ):
+        if not bundles:
+            raise ValueError("No model bundles given")
+        self.bundle_paths = dict(bundles)
+        self.default_model = default_model or next(iter(self.bundle_paths))
+        self.host, self.port = host, port
+        self.max_batch_size, self.max_wait_ms = max_batch_size, max_wait_ms
+        self.max_body_bytes = max_body_bytes
+        self.batchers: Dict[str, MicroBatcher] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        for name, path in self.bundle_paths.items():
+            batcher = MicroBatcher(load_bundle(path), self.max_batch_size, self.max_wait_ms)
+            batcher.start()
+            self.batchers[name] = batcher
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Scoring service on http://{self.host}:{self.port} with {len(self.batchers)} models")
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for batcher in self.batchers.values():
+            await batcher.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {name: batcher.metrics.snapshot() for name, batcher in self.batchers.items()}
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if path == '/health':
+            return 200, {'status': 'ok', 'models': len(self.batchers)}
+        if path == '/metrics':
+            return 200, self.metrics()
+        if path == '/models':
+            return 200, {name: {'path': b.bundle.path, 'model_type': b.bundle.manifest['model']['type'],
+                                'metadata': b.bundle.metadata} for name, b in self.batchers.items()}
+        if path != '/score':
+            return 404, {'error': f"Unknown path: {path}"}
+        if method != 'POST':
+            return 405, {'error': "Use POST for /score"}
+
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError as e:  # JSONDecodeError, or UnicodeDecodeError for non-UTF-8 bodies
+            return 400, {'error': f"Invalid JSON: {e}"}
+        if not isinstance(payload, dict):
+            return 400, {'error': f"Body must be a JSON object, not {type(payload).__name__}"}
+        texts = payload.get('texts', [payload['text']] if 'text' in payload else None)
+        if not isinstance(texts, list) or not texts:
+            return 400, {'error': "Body needs a non-empty 'texts' list (or a 'text' string)"}
+        name = payload.get('model', self.default_model)
+        if not isinstance(name, str) or name not in self.batchers:
+            return 404, {'error': f"Unknown model: {name}", 'models': list(self.batchers)}
+
+        start = time.perf_counter()
+        predictions, probabilities = await self.batchers[name].score(texts)
+        self.batchers[name].metrics.record_request(time.perf_counter() - start)
+        return 200, {'model': name, 'predictions': predictions, 'probabilities': probabilities}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    key, _, value = line.decode('latin-1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length', 0))
+                if length > self.max_body_bytes:
+                    status, response = 400, {'error': f"Body larger than {self.max_body_bytes} bytes"}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    try:
+                        status, response = await self._route(method, path.split('?', 1)[0], body)
+                    except Exception as e:
+                        logger.exception("Scoring request failed")
+                        status, response = 500, {'error': str(e)}
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+
+                data = json.dumps(response).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+class ServiceThread:
+    """Handle for a service running on a background event loop."""
+
+    def __init__(self, service: ScoringService, loop: asyncio.AbstractEventLoop, thread: threading.Thread):
+        self.service, self.loop, self.thread = service, loop, thread
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.service.host}:{self.service.port}"
+
+    def metrics(self) -> Dict[str, Any]:
+        return asyncio.run_coroutine_threadsafe(self._metrics(), self.loop).result()
+
+    async def _metrics(self) -> Dict[str, Any]:
+        return self.service.metrics()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.service.stop(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+def start_in_thread(service: ScoringService) -> ServiceThread:
+    """
+    Run a service on its own event loop in a daemon thread.
+
+    Jupyter already runs an event loop, so this is how the service is started
+    from a notebook; `handle.stop()` shuts it down.
+    """
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    startup_error: List[BaseException] = []
+
+    def run():
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(service.start())
+        except BaseException as e:
+            # Hand the real failure (missing bundle, port in use, ...) to the caller
+            startup_error.append(e)
+            started.set()
+            loop.close()
+            return
+        started.set()
+        loop.run_forever()
+
+    thread = threading.Thread(target=run, daemon=True, name='scoring-service')
+    thread.start()
+    if not started.wait(timeout=60):
+        raise RuntimeError("Scoring service did not start within 60 s")
+    if startup_error:
+        thread.join()
+        raise startup_error[0]
+    return ServiceThread(service, loop, thread)
+
+
+async def _post_json(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, host: str, path: str,
+                     payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    body = json.dumps(payload).encode('utf-8')
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':', 1)[1])
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def _load_async(host: str, port: int, texts: Sequence[str], n_requests: int, concurrency: int,
+                      texts_per_request: int, model: Optional[str]) -> Dict[str, Any]:
+    latencies, errors = [], 0
+    counter = iter(range(n_requests))
+
+    async def client():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for i in counter:
+                start = i * texts_per_request % len(texts)
+                batch = [texts[(start + k) % len(texts)] for k in range(texts_per_request)]
+                payload = {'texts': batch, **({'model': model} if model else {})}
+                t0 = time.perf_counter()
+                status, _ = await _post_json(reader, writer, host, '/score', payload)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                errors += status != 200
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'concurrency': concurrency,
+        'texts_per_request': texts_per_request,
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'texts_per_second': len(latencies) * texts_per_request / elapsed,
+        'latency_ms_p50': float(p50),
+        'latency_ms_p95': float(p95),
+        'latency_ms_p99': float(p99),
+    }
+
+
+def run_load(
+    url: str,
+    texts: Sequence[str],
+    n_requests: int = 1000,
+    concurrency: int = 32,
+    texts_per_request: int = 1,
+    model: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Fire `n_requests` POST /score calls from `concurrency` keep-alive clients.
+
+    Runs on its own event loop in a helper thread, so it can be called from a
+    notebook while the service runs in another thread.
+    """
+    host, port = url.split('://', 1)[-1].rstrip('/').rsplit(':', 1)
+    result = {}
+
+    def run():
+        result.update(asyncio.run(_load_async(host, int(port), list(texts), n_requests, concurrency,
+                                              texts_per_request, model)))
+
+    thread = threading.Thread(target=run, name='load-generator')
+    thread.start()
+    thread.join()
+    logger.info(f"Load test: {result['texts_per_second']:.0f} texts/s, p95 {result['latency_ms_p95']:.1f} ms")
+    return result
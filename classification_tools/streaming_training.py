@@ -0,0 +1,318 @@
+"""
+Out-of-core classifier training with hashed features.
+
+The `CountVectorizer` + `RandomForestClassifier` baseline needs the whole
+corpus, its vocabulary and the document-term matrix in memory at once. Here
+texts are hashed into a fixed-width feature space (`HashingVectorizer`, which
+keeps no vocabulary) and an incremental linear learner is updated with
+`partial_fit` one chunk at a time. Chunks come from CSV/JSONL files read with
+pandas' chunked readers or from in-memory lists, so memory is bounded by the
+chunk size and the model's `n_features` coefficients, however many synthetic
+rows are streamed. A fixed holdout is hashed once and scored periodically.
+
+This module provides:
+- iter_file_chunks / iter_list_chunks / interleave_chunks: (texts, labels) chunk sources
+- StreamingTrainer: partial_fit over chunks with periodic holdout evaluation
+- run_streaming_experiment: same result keys as `run_imbalance_experiment`
+"""
+
+import json
+import time
+import logging
+from contextlib import nullcontext
+from itertools import zip_longest
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier, Perceptron
+from sklearn.naive_bayes import MultinomialNB, ComplementNB
+from sklearn.metrics import f1_score, accuracy_score
+
+logger = logging.getLogger(__name__)
+
+Chunk = Tuple[List[str], np.ndarray]
+
+STREAMING_MODELS = {
+    'sgd_logistic': lambda seed: SGDClassifier(loss='log_loss', alpha=1e-6, random_state=seed),
+    'sgd_hinge': lambda seed: SGDClassifier(loss='hinge', alpha=1e-6, random_state=seed),
+    'sgd_modified_huber': lambda seed: SGDClassifier(loss='modified_huber', alpha=1e-6, random_state=seed),
+    'perceptron': lambda seed: Perceptron(random_state=seed),
+    'multinomial_nb': lambda seed: MultinomialNB(alpha=0.1),
+    'complement_nb': lambda seed: ComplementNB(alpha=0.1),
+}
+
+
+def _sniff_json_format(path: str) -> str:
+    """'json' for a single JSON document (e.g. an array of records), 'jsonl' for JSON Lines."""
+    with open(path, encoding='utf-8') as f:
+        first_line = ''
+        for line in f:
+            if line.strip():
+                first_line = line.strip()
+                break
+    if first_line.startswith('['):
+        return 'json'
+    try:
+        return 'jsonl' if isinstance(json.loads(first_line), dict) else 'json'
+    except ValueError:
+        return 'json'  # a document spread over several lines
+
+
+def _chunk_labels(raw: pd.Series, label_map: Optional[Dict[Any, int]], path: str) -> np.ndarray:
+    """Integer labels of one chunk, naming the values that cannot be mapped or cast."""
+    if label_map:
+        mapped = raw.map(label_map)
+        unmapped = raw[mapped.isna() & raw.notna()].unique()
+        if len(unmapped):
+            raise ValueError(f"Labels in {path} missing from label_map: {sorted(map(repr, unmapped))[:10]} "
+                             f"(label_map keys: {list(label_map)})")
+        raw = mapped
+    if raw.isna().any():
+        raise ValueError(f"{int(raw.isna().sum())} rows of {path} have no label")
+    try:
+        return raw.to_numpy(dtype=np.int64)
+    except (TypeError, ValueError):
+        raise ValueError(f"Non-integer labels in {path}: {sorted(map(repr, raw.unique()))[:10]}; "
+                         f"pass a label_map") from None
+
+
+def iter_file_chunks(
+    path: str,
+    text_column: str,
+    label_column: Optional[str] = None,
+    label: Optional[int] = None,
+    chunksize: int = 10000,
+    label_map: Optional[Dict[Any, int]] = None,
+    file_format: Optional[str] = None
+) -> Iterator[Chunk]:
+    """
+    Stream (texts, labels) chunks from a CSV, JSONL or JSON file.
+
+    Args:
+        path: File path; the format is taken from the extension (and, for
+            `.json`, from the content: JSON Lines or one JSON document) unless given
+        text_column: Column holding the text
+        label_column: Column holding the label (mutually exclusive with `label`)
+        label: Constant label for every row (e.g. 1 for a synthetic-fake pool)
+        chunksize: Rows per chunk
+        label_map: Optional mapping from raw label values to integers; labels
+            it does not cover raise a ValueError naming them
+        file_format: 'csv', 'jsonl' or 'json' (read whole, then chunked)
+    """
+    if (label_column is None) == (label is None):
+        raise ValueError("Give exactly one of label_column or label")
+    if file_format is None:
+        if path.endswith(('.jsonl', '.ndjson')):
+            file_format = 'jsonl'
+        elif path.endswith('.json'):
+            file_format = _sniff_json_format(path)
+        else:
+            file_format = 'csv'
+    columns = [text_column] + ([label_column] if label_column else [])
+
+    if file_format == 'csv':
+        reader = pd.read_csv(path, usecols=columns, chunksize=chunksize)
+    elif file_format == 'jsonl':
+        reader = pd.read_json(path, lines=True, chunksize=chunksize)
+    elif file_format == 'json':
+        # A single JSON document cannot be parsed incrementally; only the chunks fed to the model are bounded
+        document = pd.read_json(path)
+        reader = nullcontext(document.iloc[start:start + chunksize] for start in range(0, len(document), chunksize))
+    else:
+        raise ValueError(f"Unknown file format: {file_format}. Use 'csv', 'jsonl' or 'json'")
+
+    with reader as frames:
+        for frame in frames:
+            frame = frame.dropna(subset=[text_column])
+            if frame.empty:
+                continue
+            if label_column:
+                labels = _chunk_labels(frame[label_column], label_map, path)
+            else:
+                labels = np.full(len(frame), label, dtype=np.int64)
+            yield frame[text_column].astype(str).tolist(), labels
+
+
+def iter_list_chunks(texts: Sequence[str], labels: Sequence[int], chunksize: int = 10000) -> Iterator[Chunk]:
+    """Stream chunks from in-memory lists (drop-in for the notebook experiments)."""
+    labels = np.asarray(labels, dtype=np.int64)
+    for start in range(0, len(texts), chunksize):
+        yield list(texts[start:start + chunksize]), labels[start:start + chunksize]
+
+
+def interleave_chunks(*sources: Iterable[Chunk]) -> Iterator[Chunk]:
+    """
+    Round-robin over several chunk sources.
+
+    Real, fake and synthetic pools usually sit in separate files; feeding them
+    one after another would show the learner a single class for thousands of
+    updates, so their chunks are merged into mixed chunks instead.
+    """
+    for group in zip_longest(*sources):
+        parts = [chunk for chunk in group if chunk is not None]
+        yield [t for texts, _ in parts for t in texts], np.concatenate([labels for _, labels in parts])
+
+
+class StreamingTrainer:
+    """
+    Incremental text classifier over hashed features.
+
+    Args:
+        model: Key of STREAMING_MODELS or an estimator with `partial_fit`
+        classes: All class labels (required by `partial_fit` on the first call)
+        holdout: Optional (texts, labels) scored every `eval_every` chunks
+        eval_every: Evaluation period in chunks (0 = only at the end)
+        n_features: Width of the hashed feature space
+        shuffle_chunks: Shuffle rows within each chunk before updating
+        class_weight: Optional {label: weight} applied as sample weights
+        random_state: Seed for the model and the within-chunk shuffles
+        **vectorizer_params: HashingVectorizer overrides (ngram_range, stop_words, ...)
+    """
+
+    def __init__(
+        self,
+        model: Any = 'sgd_logistic',
+        classes: Sequence[int] = (0, 1),
+        holdout: Optional[Tuple[Sequence[str], Sequence[int]]] = None,
+        eval_every: int = 10,
+        n_features: int = 2 ** 20,
+        shuffle_chunks: bool = True,
+        class_weight: Optional[Dict[int, float]] = None,
+        random_state: int = 42,
+        **vectorizer_params
+    ):
+        if isinstance(model, str):
+            if model not in STREAMING_MODELS:
+                raise ValueError(f"Unknown model: {model}. Available: {list(STREAMING_MODELS)}")
+            self.model_name, self.model = model, STREAMING_MODELS[model](random_state)
+        else:
+            if not hasattr(model, 'partial_fit'):
+                raise ValueError(f"{type(model).__name__} has no partial_fit")
+            self.model_name, self.model = type(model).__name__, model
+
+        params = {'ngram_range': (1, 2), 'stop_words': 'english'}
+        params.update(vectorizer_params)
+        # Naive Bayes needs non-negative features, so signs are never alternated
+        self.vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, **params)
+
+        self.classes = np.asarray(classes)
+        self.eval_every = eval_every
+        self.shuffle_chunks = shuffle_chunks
+        self.class_weight = class_weight
+        self.rng = np.random.default_rng(random_state)
+
+        self.holdout_X, self.holdout_y = None, None
+        if holdout is not None:
+            self.holdout_X = self.vectorizer.transform(list(holdout[0]))
+            self.holdout_y = np.asarray(holdout[1])
+
+        self.rows_seen = 0
+        self.chunks_seen = 0
+        self.class_counts: Dict[int, int] = {}
+        self.history: List[Dict[str, Any]] = []
+
+    def partial_fit(self, texts: Sequence[str], labels: Sequence[int]) -> 'StreamingTrainer':
+        """Update the model with one chunk."""
+        labels = np.asarray(labels)
+        if len(labels) == 0:
+            return self
+        X = self.vectorizer.transform(texts)
+        if self.shuffle_chunks:
+            order = self.rng.permutation(len(labels))
+            X, labels = X[order], labels[order]
+
+        fit_params = {}
+        if self.class_weight:
+            fit_params['sample_weight'] = np.array([self.class_weight.get(int(l), 1.0) for l in labels])
+        self.model.partial_fit(X, labels, classes=self.classes, **fit_params)
+
+        self.rows_seen += len(labels)
+        self.chunks_seen += 1
+        for label, count in zip(*np.unique(labels, return_counts=True)):
+            self.class_counts[int(label)] = self.class_counts.get(int(label), 0) + int(count)
+        return self
+
+    def evaluate(self) -> Dict[str, Any]:
+        """Score the holdout and append the result to `history`."""
+        if self.holdout_X is None:
+            raise ValueError("No holdout set was given")
+        y_pred = self.model.predict(self.holdout_X)
+        scores = {
+            'chunks_seen': self.chunks_seen,
+            'rows_seen': self.rows_seen,
+            'fake_f1': f1_score(self.holdout_y, y_pred, pos_label=1, zero_division=0),
+            'overall_f1': f1_score(self.holdout_y, y_pred, average='weighted', zero_division=0),
+            'accuracy': accuracy_score(self.holdout_y, y_pred),
+        }
+        self.history.append(scores)
+        return scores
+
+    def fit_stream(self, chunks: Iterable[Chunk], n_epochs: int = 1) -> 'StreamingTrainer':
+        """
+        Consume chunk sources, evaluating every `eval_every` chunks.
+
+        Args:
+            chunks: Iterable of (texts, labels); for n_epochs > 1 it must be
+                re-iterable (a list, or a callable returning a fresh iterator)
+            n_epochs: Passes over the stream
+        """
+        start = time.time()
+        for epoch in range(n_epochs):
+            source = chunks() if callable(chunks) else chunks
+            for texts, labels in source:
+                self.partial_fit(texts, labels)
+                if self.holdout_X is not None and self.eval_every and self.chunks_seen % self.eval_every == 0:
+                    scores = self.evaluate()
+                    logger.info(f"Epoch {epoch + 1}, {self.rows_seen:,} rows: fake F1 {scores['fake_f1']:.4f}")
+        if self.holdout_X is not None and (not self.history or self.history[-1]['chunks_seen'] != self.chunks_seen):
+            self.evaluate()
+        logger.info(f"Streamed {self.rows_seen:,} rows in {self.chunks_seen:,} chunks ({time.time() - start:.1f}s)")
+        return self
+
+    def predict(self, texts: Sequence[str]) -> np.ndarray:
+        return self.model.predict(self.vectorizer.transform(texts))
+
+    def history_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.history)
+
+
+def run_streaming_experiment(
+    train_chunks: Iterable[Chunk],
+    holdout_texts: Sequence[str],
+    holdout_labels: Sequence[int],
+    experiment_name: str,
+    model: Any = 'sgd_logistic',
+    n_epochs: int = 1,
+    eval_every: int = 10,
+    **trainer_kwargs
+) -> Dict[str, Any]:
+    """
+    Streaming counterpart of `run_imbalance_experiment`.
+
+    Returns the same keys (fake_f1, overall_f1, class counts, split sizes)
+    plus the learning curve recorded on the holdout.
+    """
+    trainer = StreamingTrainer(model=model, holdout=(holdout_texts, holdout_labels),
+                               eval_every=eval_every, **trainer_kwargs)
+    trainer.fit_stream(train_chunks, n_epochs=n_epochs)
+    final = trainer.history[-1]
+
+    real_count = trainer.class_counts.get(0, 0) // n_epochs
+    fake_count = trainer.class_counts.get(1, 0) // n_epochs
+    total = real_count + fake_count
+    return {
+        'experiment_name': experiment_name,
+        'fake_f1': final['fake_f1'],
+        'overall_f1': final['overall_f1'],
+        'real_count': real_count,
+        'fake_count': fake_count,
+        'total_count': total,
+        'minority_percentage': fake_count / total * 100 if total else 0.0,
+        'imbalance_ratio': real_count / fake_count if fake_count else float('inf'),
+        'train_size': total,
+        'test_size': len(holdout_labels),
+        'model': trainer.model_name,
+        'learning_curve': trainer.history
+    }
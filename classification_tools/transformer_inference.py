@@ -0,0 +1,253 @@
+"""
+CPU inference path for transformer text classifiers.
+
+The notebooks tokenize every text to one `max_length` (cut from 128 to 64 "to
+save memory") and score through `Trainer.predict` with static padding, so a
+ten-token headline costs as much as the longest one. Here texts are tokenized
+once without padding, sorted into length buckets, and each batch is padded
+only to its own longest member. The model can be dynamically quantized to
+int8 (`torch.ao.quantization.quantize_dynamic` on the Linear layers) or
+exported to ONNX and run with onnxruntime. Weights are always loaded from a
+local path; `save_tiny_model` writes a small random BERT for smoke tests on
+machines without downloaded checkpoints.
+
+This module provides:
+- length_buckets: length-sorted batches under a batch-size / token budget
+- CPUTextClassifier: bucketed, dynamically padded logits / predict_proba / evaluate
+- save_tiny_model: a tiny local BERT classifier + tokenizer for testing
+"""
+
+import os
+import time
+import logging
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+
+logger = logging.getLogger(__name__)
+
+try:
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    TRANSFORMERS_AVAILABLE = False
+
+try:
+    import onnxruntime
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+
+def length_buckets(lengths: Sequence[int], batch_size: int = 64, max_tokens: Optional[int] = None) -> List[np.ndarray]:
+    """
+    Group item indices into batches of similar length.
+
+    Args:
+        lengths: Token count of every item
+        batch_size: Items per batch at most
+        max_tokens: Optional cap on batch_size x longest length (padded tokens)
+
+    Returns:
+        Index arrays, shortest items first
+    """
+    order = np.argsort(np.asarray(lengths), kind='stable')
+    batches, current = [], []
+    for index in order:
+        longest = lengths[index]  # sorted ascending, so the newest item is the longest
+        if current and (len(current) >= batch_size or (max_tokens and (len(current) + 1) * longest > max_tokens)):
+            batches.append(np.asarray(current))
+            current = []
+        current.append(index)
+    if current:
+        batches.append(np.asarray(current))
+    return batches
+
+
+class CPUTextClassifier:
+    """
+    Sequence classifier tuned for CPU scoring.
+
+    Args:
+        model_path: Local directory of a HuggingFace sequence-classification model
+        max_length: Truncation length
+        batch_size: Texts per batch at most
+        max_tokens: Padded-token budget per batch (bounds memory for long texts)
+        backend: 'torch' or 'onnx'
+        quantize: Apply dynamic int8 quantization (torch backend)
+        onnx_path: ONNX file to load, or to export to if missing (default:
+            `model.onnx` inside model_path)
+        num_threads: Intra-op threads (default: library default)
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        max_length: int = 128,
+        batch_size: int = 64,
+        max_tokens: Optional[int] = 8192,
+        backend: str = 'torch',
+        quantize: bool = False,
+        onnx_path: Optional[str] = None,
+        num_threads: Optional[int] = None,
+        model: Any = None,
+        tokenizer: Any = None
+    ):
+        if not TRANSFORMERS_AVAILABLE:
+            raise ImportError("CPUTextClassifier needs torch and transformers")
+        if backend not in ('torch', 'onnx'):
+            raise ValueError(f"Unknown backend: {backend}. Use 'torch' or 'onnx'")
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.model_path = model_path
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.backend = backend
+        self.quantized = quantize and backend == 'torch'
+
+        self.tokenizer = tokenizer or AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+        self.model = model or AutoModelForSequenceClassification.from_pretrained(model_path, local_files_only=True)
+        self.model.to('cpu').eval()
+        self.input_names = list(self.tokenizer.model_input_names)
+
+        if self.quantized:
+            self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.session = None
+        if backend == 'onnx':
+            self.session = self._onnx_session(onnx_path or os.path.join(model_path, 'model.onnx'))
+
+    @classmethod
+    def from_objects(cls, model: Any, tokenizer: Any, **kwargs) -> 'CPUTextClassifier':
+        """Wrap an already loaded model / tokenizer (e.g. right after fine-tuning)."""
+        return cls(model_path=getattr(model, 'name_or_path', ''), model=model, tokenizer=tokenizer, **kwargs)
+
+    def _onnx_session(self, onnx_path: str) -> Any:
+        if not ONNXRUNTIME_AVAILABLE:
+            raise ImportError("The onnx backend needs onnxruntime")
+        if not os.path.exists(onnx_path):
+            self.export_onnx(onnx_path)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = torch.get_num_threads()
+        return onnxruntime.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+
+    def export_onnx(self, onnx_path: str, opset_version: int = 17) -> str:
+        """Export the (unquantized) model with dynamic batch and sequence axes."""
+        model, names = self.model, self.input_names
+
+        class LogitsOnly(torch.nn.Module):
+            def __init__(self):
+                super().__init__()
+                self.model = model
+
+            def forward(self, *inputs):
+                return self.model(**dict(zip(names, inputs))).logits
+
+        sample = self.tokenizer(['export sample'], return_tensors='pt')
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in names}
+        dynamic_axes['logits'] = {0: 'batch'}
+        with torch.inference_mode():
+            torch.onnx.export(LogitsOnly(), tuple(sample[name] for name in names), onnx_path,
+                              input_names=names, output_names=['logits'],
+                              dynamic_axes=dynamic_axes, opset_version=opset_version)
+        logger.info(f"Exported ONNX graph to {onnx_path}")
+        return onnx_path
+
+    def _forward(self, batch: Dict[str, Any]) -> np.ndarray:
+        if self.session is not None:
+            feeds = {name: batch[name].numpy().astype(np.int64) for name in self.input_names}
+            return self.session.run(['logits'], feeds)[0]
+        with torch.inference_mode():
+            return self.model(**{name: batch[name] for name in self.input_names}).logits.float().numpy()
+
+    def predict_logits(self, texts: Sequence[str]) -> np.ndarray:
+        """Logits for every text, in input order."""
+        texts = [str(t) for t in texts]
+        encodings = self.tokenizer(texts, truncation=True, max_length=self.max_length, padding=False)
+        lengths = [len(ids) for ids in encodings['input_ids']]
+
+        logits, real_tokens, padded_tokens = None, 0, 0
+        start = time.perf_counter()
+        for indices in length_buckets(lengths, self.batch_size, self.max_tokens):
+            features = {name: [encodings[name][i] for i in indices] for name in self.input_names}
+            batch = self.tokenizer.pad(features, padding='longest', return_tensors='pt')
+            batch_logits = self._forward(batch)
+            if logits is None:
+                logits = np.empty((len(texts), batch_logits.shape[1]), dtype=np.float32)
+            logits[indices] = batch_logits
+            real_tokens += sum(lengths[i] for i in indices)
+            padded_tokens += batch['input_ids'].numel()
+
+        self.last_run = {
+            'texts': len(texts),
+            'seconds': time.perf_counter() - start,
+            'real_tokens': real_tokens,
+            'padded_tokens': padded_tokens,
+            'static_padded_tokens': len(texts) * self.max_length,
+            'padding_efficiency': real_tokens / padded_tokens if padded_tokens else 1.0,
+        }
+        return logits if logits is not None else np.empty((0, self.model.config.num_labels), dtype=np.float32)
+
+    def predict_proba(self, texts: Sequence[str]) -> np.ndarray:
+        logits = self.predict_logits(texts)
+        shifted = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return shifted / shifted.sum(axis=1, keepdims=True)
+
+    def predict(self, texts: Sequence[str]) -> np.ndarray:
+        return np.argmax(self.predict_logits(texts), axis=1)
+
+    def evaluate(self, texts: Sequence[str], labels: Sequence[int], pos_label: int = 1) -> Dict[str, Any]:
+        """Accuracy / F1 on a labelled set plus throughput and padding statistics."""
+        y_pred = self.predict(texts)
+        labels = np.asarray(labels)
+        return {
+            'accuracy': accuracy_score(labels, y_pred),
+            'f1': f1_score(labels, y_pred, pos_label=pos_label, zero_division=0),
+            'f1_weighted': f1_score(labels, y_pred, average='weighted', zero_division=0),
+            'backend': self.backend,
+            'quantized': self.quantized,
+            'texts_per_second': self.last_run['texts'] / self.last_run['seconds'] if self.last_run['seconds'] else 0.0,
+            **self.last_run,
+            'predictions': y_pred,
+        }
+
+
+def save_tiny_model(
+    path: str,
+    texts: Sequence[str],
+    num_labels: int = 2,
+    max_vocab: int = 5000,
+    max_position_embeddings: int = 128,
+    seed: int = 42
+) -> str:
+    """
+    Write a tiny random BERT classifier and a word-level tokenizer built from `texts`.
+
+    The weights are untrained; the model only exercises the tokenize / bucket /
+    pad / forward / quantize / export path end to end without any download.
+    """
+    if not TRANSFORMERS_AVAILABLE:
+        raise ImportError("save_tiny_model needs torch and transformers")
+    from collections import Counter
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    os.makedirs(path, exist_ok=True)
+    counts = Counter(word for text in texts for word in str(text).lower().split())
+    vocab = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + [w for w, _ in counts.most_common(max_vocab)]
+    vocab_file = os.path.join(path, 'vocab.txt')
+    with open(vocab_file, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(vocab) + '\n')
+
+    tokenizer = BertTokenizerFast(vocab_file=vocab_file, do_lower_case=True, model_max_length=max_position_embeddings)
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(seed)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=32, num_hidden_layers=2, num_attention_heads=2,
+                        intermediate_size=64, max_position_embeddings=max_position_embeddings, num_labels=num_labels)
+    BertForSequenceClassification(config).save_pretrained(path)
+    logger.info(f"Saved tiny test model ({len(vocab):,} tokens) to {path}")
+    return path
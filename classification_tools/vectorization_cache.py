@@ -0,0 +1,368 @@
+"""
+Tokenize-once vectorization cache for imbalance-severity experiments.
+
+Every severity level and sampling strategy refits `CountVectorizer` /
+`TfidfVectorizer(max_features=5000, ngram_range=(1, 2))` on a slightly
+different mix of the same tweets, re-tokenizing the full corpus each time.
+This cache tokenizes the corpus plus the synthetic pool once into a sparse
+count matrix over the full n-gram vocabulary. A scenario's feature matrices
+are then derived by row-slicing: document frequencies, the top-k vocabulary
+and IDF weights are recomputed from the cached counts with the same rules as
+scikit-learn, so the results match a fresh fit on the scenario's training texts.
+
+This module provides:
+- VectorizationCache: add/look up texts, slice scenario matrices, save/load
+- select_columns: scikit-learn vocabulary selection over a count matrix
+- build_cache: build or load a cache keyed by a corpus fingerprint
+"""
+
+import os
+import json
+import hashlib
+import logging
+from collections import Counter
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import CountVectorizer, TfidfTransformer, TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+logger = logging.getLogger(__name__)
+
+Rows = Union[Sequence[str], np.ndarray]
+
+
+class VectorizationCache:
+    """
+    Sparse n-gram counts for every text seen, tokenized exactly once.
+
+    Args:
+        ngram_range: N-gram range of the analyzer
+        stop_words: Stop word list passed to the analyzer
+        lowercase: Lowercase before tokenizing
+        token_pattern: Token regex (scikit-learn default)
+        strip_accents: Accent stripping passed to the analyzer
+    """
+
+    def __init__(
+        self,
+        ngram_range: Tuple[int, int] = (1, 2),
+        stop_words: Optional[str] = 'english',
+        lowercase: bool = True,
+        token_pattern: str = r"(?u)\b\w\w+\b",
+        strip_accents: Optional[str] = None
+    ):
+        self.analyzer_params = {
+            'ngram_range': tuple(ngram_range),
+            'stop_words': stop_words,
+            'lowercase': lowercase,
+            'token_pattern': token_pattern,
+            'strip_accents': strip_accents,
+        }
+        self._analyzer = CountVectorizer(**self.analyzer_params).build_analyzer()
+
+        self.counts = sp.csr_matrix((0, 0), dtype=np.int64)
+        self.terms: List[str] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.row_of: Dict[str, int] = {}
+        self.segments: Dict[str, np.ndarray] = {}
+        self._rank: Optional[np.ndarray] = None  # Alphabetical rank of each column
+
+    @property
+    def n_rows(self) -> int:
+        return self.counts.shape[0]
+
+    def _tokenize_new(self, texts: List[str]) -> sp.csr_matrix:
+        if not self.terms:
+            vectorizer = CountVectorizer(**self.analyzer_params, dtype=np.int64)
+            block = vectorizer.fit_transform(texts).tocsr()
+            self.terms = vectorizer.get_feature_names_out().tolist()
+            self.vocabulary = {term: i for i, term in enumerate(self.terms)}
+            return block
+
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            for term, count in Counter(self._analyzer(text)).items():
+                col = self.vocabulary.get(term)
+                if col is None:
+                    col = self.vocabulary[term] = len(self.terms)
+                    self.terms.append(term)
+                indices.append(col)
+                data.append(count)
+            indptr.append(len(indices))
+        return sp.csr_matrix((data, indices, indptr), shape=(len(texts), len(self.terms)), dtype=np.int64)
+
+    def add_texts(self, texts: Sequence[str], name: Optional[str] = None) -> np.ndarray:
+        """
+        Tokenize texts not seen before and return the row of every text.
+
+        Args:
+            texts: Texts in any order, duplicates allowed
+            name: Optionally remember the rows as a named segment
+
+        Returns:
+            Row indices aligned with `texts`
+        """
+        texts = [str(t) for t in texts]
+        new_texts = list(dict.fromkeys(t for t in texts if t not in self.row_of))
+        if new_texts:
+            first_row = self.n_rows
+            block = self._tokenize_new(new_texts)
+            n_terms = len(self.terms)
+            if self.n_rows:
+                self.counts.resize((self.n_rows, n_terms))
+                self.counts = sp.vstack([self.counts, block], format='csr')
+            else:
+                self.counts = block
+            for offset, text in enumerate(new_texts):
+                self.row_of[text] = first_row + offset
+            self._rank = None
+            logger.info(f"Tokenized {len(new_texts):,} new texts ({self.n_rows:,} rows, {n_terms:,} terms cached)")
+
+        rows = np.fromiter((self.row_of[t] for t in texts), dtype=np.int64, count=len(texts))
+        if name is not None:
+            self.segments[name] = rows
+        return rows
+
+    def rows_for(self, texts_or_rows: Rows) -> np.ndarray:
+        """Rows for a list of texts (tokenizing unseen ones) or pass row indices through."""
+        if isinstance(texts_or_rows, np.ndarray) and texts_or_rows.dtype.kind in 'iu':
+            return texts_or_rows
+        return self.add_texts(texts_or_rows)
+
+    def _alphabetical_rank(self) -> np.ndarray:
+        if self._rank is None or len(self._rank) != len(self.terms):
+            order = sorted(range(len(self.terms)), key=self.terms.__getitem__)
+            self._rank = np.empty(len(self.terms), dtype=np.int64)
+            self._rank[order] = np.arange(len(order))
+        return self._rank
+
+    def document_frequencies(self, rows: np.ndarray) -> np.ndarray:
+        """Document frequency of every cached term over the given rows."""
+        return np.bincount(self.counts[rows].indices, minlength=len(self.terms))
+
+    def ngram_orders(self) -> np.ndarray:
+        """N-gram order of every cached term (1 = unigram, 2 = bigram, ...)."""
+        return np.fromiter((term.count(' ') + 1 for term in self.terms), dtype=np.int64, count=len(self.terms))
+
+    def select_features(
+        self,
+        train_rows: np.ndarray,
+        max_features: Optional[int] = 5000,
+        min_df: Union[int, float] = 1,
+        max_df: Union[int, float] = 1.0,
+        ngram_range: Optional[Tuple[int, int]] = None,
+        binary: bool = False
+    ) -> np.ndarray:
+        """
+        Columns a vectorizer fit on `train_rows` would keep, in its column order.
+
+        Mirrors scikit-learn: terms absent from the training rows are dropped,
+        then min_df/max_df filtering, then the `max_features` most frequent
+        terms (by document frequency when `binary`), with columns sorted
+        alphabetically. A `ngram_range` narrower than the cache's own
+        restricts the candidates to those n-gram orders.
+        """
+        allowed = None
+        if ngram_range is not None and tuple(ngram_range) != self.analyzer_params['ngram_range']:
+            orders = self.ngram_orders()
+            allowed = (orders >= ngram_range[0]) & (orders <= ngram_range[1])
+        return select_columns(self.counts, self._alphabetical_rank(), train_rows,
+                              max_features, min_df, max_df, allowed, binary)
+
+    def vectorize(
+        self,
+        train: Rows,
+        test: Optional[Rows] = None,
+        max_features: Optional[int] = 5000,
+        weighting: str = 'count',
+        min_df: Union[int, float] = 1,
+        max_df: Union[int, float] = 1.0,
+        binary: bool = False,
+        use_idf: bool = True,
+        smooth_idf: bool = True,
+        sublinear_tf: bool = False,
+        norm: Optional[str] = 'l2',
+        ngram_range: Optional[Tuple[int, int]] = None
+    ) -> Tuple[sp.csr_matrix, Optional[sp.csr_matrix], Union[CountVectorizer, TfidfVectorizer]]:
+        """
+        Scenario feature matrices from cached counts, without re-tokenizing.
+
+        Args:
+            train: Training texts or cached row indices
+            test: Test texts or cached row indices (optional)
+            max_features: Vocabulary size limit (most frequent training terms)
+            weighting: 'count' (CountVectorizer) or 'tfidf' (TfidfVectorizer)
+            min_df, max_df, binary, use_idf, smooth_idf, sublinear_tf, norm:
+                Same meaning as in scikit-learn
+            ngram_range: N-gram range of the vectorizer, within the cache's own
+
+        Returns:
+            Tuple of (X_train, X_test or None, fitted scikit-learn vectorizer
+            equivalent to fitting on the training texts)
+        """
+        if weighting not in ('count', 'tfidf'):
+            raise ValueError(f"Unknown weighting: {weighting}. Use 'count' or 'tfidf'")
+        train_rows = self.rows_for(train)
+        columns = self.select_features(train_rows, max_features, min_df, max_df, ngram_range, binary)
+        vocabulary = {self.terms[col]: i for i, col in enumerate(columns)}
+        shared = dict(self.analyzer_params, max_features=max_features, min_df=min_df, max_df=max_df, binary=binary)
+        if ngram_range is not None:
+            shared['ngram_range'] = tuple(ngram_range)
+
+        if weighting == 'count':
+            vectorizer = CountVectorizer(**shared, dtype=np.int64)
+        else:
+            vectorizer = TfidfVectorizer(**shared, use_idf=use_idf, smooth_idf=smooth_idf,
+                                         sublinear_tf=sublinear_tf, norm=norm)
+        vectorizer.vocabulary_ = vocabulary
+        train_counts = self.counts[train_rows][:, columns]
+        if weighting == 'tfidf':
+            # Fitted even without idf: TfidfVectorizer.transform always goes through it
+            vectorizer._tfidf = TfidfTransformer(norm=norm, use_idf=use_idf, smooth_idf=smooth_idf,
+                                                 sublinear_tf=sublinear_tf).fit(train_counts)
+
+        X_train = self._weigh(train_counts, vectorizer)
+        X_test = self.transform(test, vectorizer) if test is not None else None
+        return X_train, X_test, vectorizer
+
+    def transform(self, texts_or_rows: Rows, vectorizer: Union[CountVectorizer, TfidfVectorizer]) -> sp.csr_matrix:
+        """
+        Equivalent of `vectorizer.transform(texts)` using cached counts.
+
+        Works for any fitted vectorizer built with the same analyzer settings;
+        vocabulary terms the cache has never seen become empty columns.
+        """
+        rows = self.rows_for(texts_or_rows)
+        features = vectorizer.get_feature_names_out()
+        columns = np.fromiter((self.vocabulary.get(term, -1) for term in features), dtype=np.int64, count=len(features))
+        if (columns >= 0).all():
+            X = self.counts[rows][:, columns]
+        else:
+            known = np.flatnonzero(columns >= 0)
+            selector = sp.csr_matrix((np.ones(len(known), dtype=np.int64), (columns[known], known)),
+                                     shape=(len(self.terms), len(features)))
+            X = (self.counts[rows] @ selector).tocsr()
+        return self._weigh(X, vectorizer)
+
+    @staticmethod
+    def _weigh(X: sp.csr_matrix, vectorizer: Union[CountVectorizer, TfidfVectorizer]) -> sp.csr_matrix:
+        if vectorizer.binary:
+            X = X.copy()
+            X.data.fill(1)
+        if not isinstance(vectorizer, TfidfVectorizer):
+            return X
+        X = X.astype(np.float64)
+        if vectorizer.sublinear_tf:
+            np.log(X.data, X.data)
+            X.data += 1.0
+        if vectorizer.use_idf:
+            X = X @ sp.diags(vectorizer.idf_)
+        return normalize(X, norm=vectorizer.norm, copy=False).tocsr() if vectorizer.norm else X.tocsr()
+
+    def save(self, path: str):
+        """Write `{path}.npz` (counts) and `{path}.json` (terms, texts, segments)."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        sp.save_npz(f"{path}.npz", self.counts)
+        texts = [None] * len(self.row_of)
+        for text, row in self.row_of.items():
+            texts[row] = text
+        with open(f"{path}.json", 'w') as f:
+            json.dump({
+                'analyzer_params': self.analyzer_params,
+                'terms': self.terms,
+                'texts': texts,
+                'segments': {name: rows.tolist() for name, rows in self.segments.items()}
+            }, f)
+
+    @classmethod
+    def load(cls, path: str) -> 'VectorizationCache':
+        with open(f"{path}.json") as f:
+            state = json.load(f)
+        cache = cls(**state['analyzer_params'])
+        cache.counts = sp.load_npz(f"{path}.npz").tocsr()
+        cache.terms = state['terms']
+        cache.vocabulary = {term: i for i, term in enumerate(cache.terms)}
+        cache.row_of = {text: row for row, text in enumerate(state['texts'])}
+        cache.segments = {name: np.asarray(rows, dtype=np.int64) for name, rows in state['segments'].items()}
+        return cache
+
+
+def select_columns(
+    counts: sp.csr_matrix,
+    rank: np.ndarray,
+    train_rows: np.ndarray,
+    max_features: Optional[int] = 5000,
+    min_df: Union[int, float] = 1,
+    max_df: Union[int, float] = 1.0,
+    allowed: Optional[np.ndarray] = None,
+    binary: bool = False
+) -> np.ndarray:
+    """
+    scikit-learn's vocabulary selection over a count matrix.
+
+    Args:
+        counts: Document-term counts of every cached text
+        rank: Alphabetical rank of every column
+        train_rows: Rows the vectorizer is fit on
+        max_features, min_df, max_df: Same meaning as in scikit-learn
+        allowed: Optional boolean mask of candidate columns
+        binary: Rank `max_features` by document frequency, as a binary vectorizer counts
+    """
+    train_counts = counts[train_rows]
+    dfs = np.bincount(train_counts.indices, minlength=counts.shape[1])
+    if allowed is not None:
+        dfs = np.where(allowed, dfs, 0)
+    present = np.flatnonzero(dfs)
+    present = present[np.argsort(rank[present], kind='stable')]
+
+    n_doc = len(train_rows)
+    high = max_df if isinstance(max_df, (int, np.integer)) else max_df * n_doc
+    low = min_df if isinstance(min_df, (int, np.integer)) else min_df * n_doc
+    mask = (dfs[present] <= high) & (dfs[present] >= low)
+    if max_features is not None and mask.sum() > max_features:
+        tfs = dfs[present] if binary else np.asarray(train_counts.sum(axis=0)).ravel()[present]
+        mask_inds = (-tfs[mask]).argsort()[:max_features]
+        new_mask = np.zeros(len(present), dtype=bool)
+        new_mask[np.where(mask)[0][mask_inds]] = True
+        mask = new_mask
+    return present[mask]
+
+
+def corpus_fingerprint(segments: Dict[str, Sequence[str]], params: Dict[str, Any]) -> str:
+    """Stable hash of named text segments plus analyzer parameters."""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode('utf-8'))
+    for name in sorted(segments):
+        digest.update(name.encode('utf-8'))
+        for text in segments[name]:
+            digest.update(str(text).encode('utf-8'))
+            digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+def build_cache(
+    segments: Dict[str, Sequence[str]],
+    cache_dir: Optional[str] = None,
+    **analyzer_params
+) -> VectorizationCache:
+    """
+    Build a cache over named segments (e.g. 'real', 'fake', 'synthetic').
+
+    With `cache_dir`, the tokenized matrix is stored under the corpus
+    fingerprint and reloaded on later runs instead of re-tokenizing.
+    """
+    cache = VectorizationCache(**analyzer_params)
+    path = None
+    if cache_dir:
+        path = os.path.join(cache_dir, f"vectorization_{corpus_fingerprint(segments, cache.analyzer_params)}")
+        if os.path.exists(f"{path}.npz"):
+            logger.info(f"Loading vectorization cache from {path}")
+            return VectorizationCache.load(path)
+
+    cache.add_texts([t for name in segments for t in segments[name]])
+    for name, texts in segments.items():
+        cache.add_texts(texts, name=name)
+    if path:
+        cache.save(path)
+    return cache
@@ -0,0 +1,481 @@
+"""
+Registry of the four source corpora with lazy, typed, memory-mapped loading.
+
+Every notebook parses the raw files itself (`load_data_files`,
+`prepare_original_data`, `prepare_text_data`, the headline / article
+`read_csv` cells) into object-dtype frames and re-derives the label
+mapping - with different conventions per notebook. Here each corpus is a
+`DatasetHandle` that parses its raw files once, normalizes them and caches
+the result as an uncompressed Arrow IPC snapshot. Later loads memory-map
+that snapshot instead of parsing text again.
+
+Normalized frames share a layout:
+
+- `text`: the classified text (tweet, headline title, article body, News),
+  kept as an Arrow-backed string column rather than Python objects
+- `label`: int8, 0 = real / legit, 1 = fake, for every corpus
+- repetitive string columns (subject, source, domain, language, split, ...)
+  as categoricals, integers downcast
+- rows sorted by (label, group column), so a filter on label, on label plus
+  subject / source / language, or on a group value that occurs under one
+  label only is a contiguous slice of the snapshot and is returned without
+  copying
+
+Snapshots are keyed by the size and modification time of the raw files and
+rebuilt when those change.
+
+This module provides:
+- DatasetSpec: where a corpus lives and how its raw files are parsed
+- DatasetHandle: lazy frame / Arrow table / filtered views of one corpus
+- DatasetRegistry: name -> handle lookup over a data directory
+- DATASETS: specs for tweets, headlines, articles and multilingual
+"""
+
+import os
+import glob
+import json
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Callable, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from dataset_store import optimize_frame
+
+SNAPSHOT_VERSION = 2  # 2: tweets without majority_target are dropped
+LABEL_NAMES = ('real', 'fake')
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+# ---------------------------------------------------------------------------- raw parsers
+
+def _tweet_sources(root: str) -> List[str]:
+    return [os.path.join(root, 'Twitter_Analysis.csv')]
+
+
+def _parse_tweets(paths: List[str]) -> pd.DataFrame:
+    frame = pd.read_csv(paths[0])
+    frame = frame.drop(columns=[c for c in frame.columns if c.startswith('Unnamed')])
+    # Rows without a majority label are neither `== True` nor `== False` in the notebooks: drop them
+    frame = frame.dropna(subset=['tweet', 'majority_target'])
+    frame['text'] = frame['tweet']
+    frame['label'] = (~frame['majority_target'].astype(bool)).astype(np.int8)  # majority_target True = real
+    return frame
+
+
+def _headline_sources(root: str) -> List[str]:
+    return [os.path.join(root, f'{source}_{kind}.csv') for source in ('gossipcop', 'politifact') for kind in ('real', 'fake')]
+
+
+def _parse_headlines(paths: List[str]) -> pd.DataFrame:
+    domains = {'gossipcop': 'entertainment', 'politifact': 'political'}
+    parts = []
+    for path in paths:
+        source, kind = os.path.splitext(os.path.basename(path))[0].split('_')
+        part = pd.read_csv(path)
+        part['source'] = source
+        part['domain'] = domains[source]
+        part['label'] = np.int8(kind == 'fake')
+        parts.append(part)
+    frame = pd.concat(parts, ignore_index=True)
+    frame['text'] = frame['title'].astype(str).str.strip()
+    return frame[frame['title'].notna() & (frame['text'] != '')]
+
+
+def _article_sources(root: str) -> List[str]:
+    return [os.path.join(root, 'True_articles.csv'), os.path.join(root, 'Fake_articles.csv')]
+
+
+def _parse_articles(paths: List[str]) -> pd.DataFrame:
+    real, fake = (pd.read_csv(path) for path in paths)
+    real['label'], fake['label'] = np.int8(0), np.int8(1)
+    frame = pd.concat([real, fake], ignore_index=True)
+    frame = frame.dropna(subset=['text'])
+    frame['subject'] = frame['subject'].astype(str).str.strip()
+    return frame
+
+
+def _multilingual_sources(root: str) -> List[str]:
+    """Language-annotated export if present, else the TALLIP Train/Test txt files."""
+    analyzed = os.path.join(root, 'multilingual_dataset_analyzed.csv')
+    if os.path.exists(analyzed):
+        return [analyzed]
+    return sorted(glob.glob(os.path.join(root, 'Train', '*.txt'))) + sorted(glob.glob(os.path.join(root, 'Test', '*.txt')))
+
+
+def _parse_multilingual(paths: List[str]) -> pd.DataFrame:
+    if len(paths) == 1 and paths[0].endswith('.csv'):
+        frame = pd.read_csv(paths[0], quoting=1, on_bad_lines='skip')
+    else:
+        parts = []
+        for path in paths:
+            part = pd.read_csv(path, sep='\t', encoding='utf-8', on_bad_lines='skip')
+            part['source_file'] = os.path.splitext(os.path.basename(path))[0]
+            part['split'] = os.path.basename(os.path.dirname(path)).lower()
+            parts.append(part)
+        frame = pd.concat(parts, ignore_index=True)
+    frame.columns = frame.columns.str.strip()
+    frame = frame.dropna(subset=['News'])
+    frame['text'] = frame['News']
+    labels = frame['Label'].astype(str).str.strip().str.lower().map({'fake': 1, 'legit': 0, 'legitimate': 0})
+    frame = frame[labels.notna()]
+    frame['label'] = labels[labels.notna()].astype(np.int8)
+    return frame
+
+
+@dataclass
+class DatasetSpec:
+    """
+    Where a corpus lives and how to parse it.
+
+    Args:
+        name: Registry key
+        root: Directory of the raw files, relative to the registry's data_dir
+        sources: root -> raw file paths (their sizes / mtimes key the snapshot)
+        parse: raw file paths -> frame with `text` and int8 `label` columns
+        group_column: Second sort key; filters on it are contiguous slices
+        group_fallback: Group column to use when `group_column` is missing
+        drop_columns: Columns not kept in the snapshot
+        description: One line for `DatasetRegistry.summary`
+    """
+    name: str
+    root: str
+    sources: Callable[[str], List[str]]
+    parse: Callable[[List[str]], pd.DataFrame]
+    group_column: Optional[str] = None
+    group_fallback: Optional[str] = None
+    drop_columns: Tuple[str, ...] = ()
+    description: str = ''
+
+
+DATASETS: Dict[str, DatasetSpec] = {
+    'tweets': DatasetSpec('tweets', 'raw', _tweet_sources, _parse_tweets,
+                          drop_columns=('embeddings',),
+                          description='Twitter_Analysis.csv tweets (majority_target True = real)'),
+    'headlines': DatasetSpec('headlines', 'headlines', _headline_sources, _parse_headlines,
+                             group_column='source',
+                             description='FakeNewsNet GossipCop + PolitiFact titles'),
+    'articles': DatasetSpec('articles', 'articles', _article_sources, _parse_articles,
+                            group_column='subject',
+                            description='ISOT True/Fake articles by subject'),
+    'multilingual': DatasetSpec('multilingual', 'multilingual', _multilingual_sources, _parse_multilingual,
+                                group_column='language', group_fallback='Domain',
+                                description='TALLIP multilingual news (Legit = real)'),
+}
+
+
+# ---------------------------------------------------------------------------- handles
+
+def _arrow_strings(arrow_type) -> Optional[Any]:
+    """types_mapper keeping Arrow strings Arrow-backed in pandas."""
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.ArrowDtype(arrow_type)
+    return None
+
+
+class DatasetHandle:
+    """
+    Lazily loaded corpus.
+
+    Nothing is read until `table`, `frame` or `view` is first used; the first
+    use maps the snapshot (building it from the raw files if it is missing
+    or stale).
+
+    Args:
+        spec: The corpus definition
+        root: Directory holding the raw files
+        cache_dir: Directory for Arrow snapshots
+    """
+
+    def __init__(self, spec: DatasetSpec, root: str, cache_dir: str):
+        if not PYARROW_AVAILABLE:
+            raise ImportError("DatasetHandle needs pyarrow")
+        self.spec = spec
+        self.root = root
+        self.cache_dir = cache_dir
+        self._table = None
+        self._frame = None
+        self._ranges: Dict[Tuple[int, Any], Tuple[int, int]] = {}
+        self.group_column: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    # ------------------------------------------------------------------ snapshot
+
+    def fingerprint(self) -> str:
+        """Hash of the raw files' paths, sizes and mtimes."""
+        paths = self.spec.sources(self.root)
+        missing = [p for p in paths if not os.path.exists(p)]
+        if not paths or missing:
+            raise FileNotFoundError(f"{self.name}: raw files not found under {self.root}: {missing or 'none matched'}")
+        digest = hashlib.sha1(str(SNAPSHOT_VERSION).encode())
+        for path in paths:
+            stat = os.stat(path)
+            digest.update(f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+        return digest.hexdigest()[:12]
+
+    def _snapshot_path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f"{self.name}-{fingerprint}.arrow")
+
+    def _latest_snapshot(self) -> Optional[str]:
+        snapshots = glob.glob(os.path.join(self.cache_dir, f"{self.name}-*.arrow"))
+        return max(snapshots, key=os.path.getmtime) if snapshots else None
+
+    def build(self) -> str:
+        """Parse the raw files and write a fresh snapshot; returns its path."""
+        fingerprint = self.fingerprint()
+        paths = self.spec.sources(self.root)
+        logger.info(f"Parsing {self.name} from {len(paths)} raw file(s)")
+        frame = self.spec.parse(paths)
+        frame = frame.drop(columns=[c for c in self.spec.drop_columns if c in frame.columns])
+        group = self.spec.group_column if self.spec.group_column in frame.columns else self.spec.group_fallback
+        group = group if group in frame.columns else None
+
+        frame = optimize_frame(frame.reset_index(drop=True))
+        frame['label'] = frame['label'].astype(np.int8)
+        if 'text' in frame.columns and isinstance(frame['text'].dtype, pd.CategoricalDtype):
+            frame['text'] = frame['text'].astype(str)
+        if group is not None and not isinstance(frame[group].dtype, pd.CategoricalDtype):
+            frame[group] = frame[group].astype('category')
+        frame = frame.sort_values(['label', group] if group else ['label'], kind='stable').reset_index(drop=True)
+
+        table = pa.Table.from_pandas(frame, preserve_index=False).combine_chunks()
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            b'dataset_registry': json.dumps({'name': self.name, 'group_column': group, 'label_names': LABEL_NAMES,
+                                             'sources': paths, 'fingerprint': fingerprint}).encode(),
+        })
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._snapshot_path(fingerprint)
+        with ipc.new_file(path + '.tmp', table.schema) as writer:
+            writer.write_table(table)
+        os.replace(path + '.tmp', path)
+        for stale in glob.glob(os.path.join(self.cache_dir, f"{self.name}-*.arrow")):
+            if stale != path:
+                os.remove(stale)
+        return path
+
+    def load(self, refresh: bool = False, check_sources: bool = True) -> 'pa.Table':
+        """
+        Map the snapshot, rebuilding it when missing, stale or `refresh` is set.
+
+        With `check_sources=False` an existing snapshot is used even if the raw
+        files are gone (e.g. on a machine holding only the cache).
+        """
+        if check_sources or refresh:
+            path = self._snapshot_path(self.fingerprint())
+            if refresh or not os.path.exists(path):
+                path = self.build()
+        else:
+            path = self._latest_snapshot() or self.build()
+
+        table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        meta = json.loads(table.schema.metadata[b'dataset_registry'])
+        self._table, self._frame = table, None
+        self.group_column = meta['group_column']
+        self._index_ranges()
+        return table
+
+    def _index_ranges(self):
+        """(label, group value) -> row range of the sorted snapshot."""
+        labels = self._table.column('label').to_numpy()
+        if self.group_column is not None:
+            groups = self._table.column(self.group_column).combine_chunks()
+            codes = groups.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+            values = groups.dictionary.to_pylist()
+            codes = np.where(groups.is_null().to_numpy(zero_copy_only=False), -1, codes)
+        else:
+            codes, values = np.zeros(len(labels), dtype=np.int64), []
+        keys = labels.astype(np.int64) * (len(values) + 2) + codes + 1
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]]) if len(keys) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(keys)]
+        self._ranges = {}
+        for start, stop in zip(starts, stops):
+            code = codes[start]
+            value = values[code] if self.group_column is not None and code >= 0 else None
+            self._ranges[(int(labels[start]), value)] = (int(start), int(stop))
+
+    # ------------------------------------------------------------------ access
+
+    @property
+    def table(self) -> 'pa.Table':
+        """Arrow table backed by the memory-mapped snapshot."""
+        if self._table is None:
+            self.load()
+        return self._table
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """Full corpus as a DataFrame (categoricals + Arrow-backed strings)."""
+        if self._frame is None:
+            self._frame = self.table.to_pandas(types_mapper=_arrow_strings, split_blocks=True)
+        return self._frame
+
+    def __len__(self) -> int:
+        return self.table.num_rows
+
+    @staticmethod
+    def _label_code(label: Union[int, str]) -> int:
+        if isinstance(label, str):
+            return LABEL_NAMES.index(label.lower())
+        return int(label)
+
+    def row_ranges(self, label: Union[int, str, None] = None, group: Any = None) -> List[Tuple[int, int]]:
+        """Merged row ranges matching `label` and / or a group-column value (or list of values)."""
+        self.table
+        labels = None if label is None else {self._label_code(v) for v in (label if isinstance(label, (list, tuple, set)) else [label])}
+        groups = None if group is None else set(group if isinstance(group, (list, tuple, set)) else [group])
+        ranges = sorted(span for (lab, value), span in self._ranges.items()
+                        if (labels is None or lab in labels) and (groups is None or value in groups))
+        merged: List[Tuple[int, int]] = []
+        for start, stop in ranges:
+            if merged and merged[-1][1] == start:
+                merged[-1] = (merged[-1][0], stop)
+            else:
+                merged.append((start, stop))
+        return merged
+
+    def view_table(self, label: Union[int, str, None] = None, **filters) -> 'pa.Table':
+        """
+        Arrow rows matching the filters.
+
+        `label` and the group column (subject / source / language, ...) are
+        resolved to row ranges: a single range is a zero-copy slice of the
+        mapped snapshot. Other columns are filtered with an Arrow mask.
+        """
+        group = filters.pop(self.group_column, None) if self.group_column else None
+        ranges = self.row_ranges(label, group)
+        parts = [self.table.slice(start, stop - start) for start, stop in ranges]
+        table = parts[0] if len(parts) == 1 else (pa.concat_tables(parts) if parts else self.table.slice(0, 0))
+        for column, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            table = table.filter(pc.is_in(table.column(column), value_set=pa.array(list(values))))
+        return table
+
+    def view(self, label: Union[int, str, None] = None, **filters) -> pd.DataFrame:
+        """
+        DataFrame rows matching the filters, e.g. `view(label='fake', subject='News')`.
+
+        Contiguous matches are positional slices of `frame` (no copy); matches
+        spanning several ranges or filtered on other columns are copies.
+        """
+        group = filters.pop(self.group_column, None) if self.group_column else None
+        ranges = self.row_ranges(label, group)
+        frame = self.frame
+        if len(ranges) == 1:
+            result = frame.iloc[ranges[0][0]:ranges[0][1]]
+        elif ranges:
+            result = pd.concat([frame.iloc[start:stop] for start, stop in ranges])
+        else:
+            result = frame.iloc[0:0]
+        for column, value in filters.items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            result = result[result[column].isin(values)]
+        return result
+
+    def texts_and_labels(self, **filters) -> Tuple[np.ndarray, np.ndarray]:
+        """(texts, int8 labels) for model training, replacing the per-notebook `prepare_*` helpers."""
+        table = self.view_table(**filters)
+        texts = table.column('text').to_numpy(zero_copy_only=False)
+        return texts, table.column('label').to_numpy()
+
+    def label_counts(self) -> Dict[str, int]:
+        return {LABEL_NAMES[lab]: sum(stop - start for start, stop in self.row_ranges(lab)) for lab in (0, 1)}
+
+    def group_counts(self) -> pd.DataFrame:
+        """Rows per (group value, label) - straight from the range index."""
+        self.table
+        rows = [{'group': value, 'label': LABEL_NAMES[lab], 'rows': stop - start}
+                for (lab, value), (start, stop) in self._ranges.items()]
+        counts = pd.DataFrame(rows).pivot_table(index='group', columns='label', values='rows', aggfunc='sum', fill_value=0)
+        return counts.reindex(columns=list(LABEL_NAMES), fill_value=0).astype(int)
+
+    def info(self) -> Dict[str, Any]:
+        table = self.table
+        return {'name': self.name, 'rows': table.num_rows, 'columns': table.num_columns,
+                'group_column': self.group_column, **self.label_counts(),
+                'memory_mb': round(table.nbytes / 1e6, 1)}
+
+
+class DatasetRegistry:
+    """
+    Name -> DatasetHandle over one data directory.
+
+    Args:
+        data_dir: Directory holding the corpora (default: the repo's `data/`)
+        cache_dir: Snapshot directory (default: `<data_dir>/processed/registry_cache`)
+        paths: Per-dataset raw directories overriding `<data_dir>/<spec.root>`,
+            e.g. {'multilingual': '/data/TALLIP-FakeNews-Dataset/Multilingual'}
+        specs: Dataset specs (default: DATASETS)
+
+    Example:
+        registry = DatasetRegistry()
+        articles = registry['articles']                  # nothing parsed yet
+        news = articles.view(label='fake', subject='News')
+        texts, labels = registry['multilingual'].texts_and_labels(language=['en', 'hi'])
+    """
+
+    def __init__(
+        self,
+        data_dir: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        paths: Optional[Dict[str, str]] = None,
+        specs: Optional[Dict[str, DatasetSpec]] = None
+    ):
+        self.data_dir = data_dir or DEFAULT_DATA_DIR
+        self.cache_dir = cache_dir or os.path.join(self.data_dir, 'processed', 'registry_cache')
+        self.paths = dict(paths or {})
+        self.specs = dict(specs or DATASETS)
+        self._handles: Dict[str, DatasetHandle] = {}
+
+    def register(self, spec: DatasetSpec, path: Optional[str] = None):
+        """Add (or replace) a corpus definition."""
+        self.specs[spec.name] = spec
+        self._handles.pop(spec.name, None)
+        if path is not None:
+            self.paths[spec.name] = path
+
+    def names(self) -> List[str]:
+        return list(self.specs)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.specs
+
+    def __getitem__(self, name: str) -> DatasetHandle:
+        if name not in self.specs:
+            raise KeyError(f"Unknown dataset: {name}. Available: {self.names()}")
+        if name not in self._handles:
+            spec = self.specs[name]
+            root = self.paths.get(name, os.path.join(self.data_dir, spec.root))
+            self._handles[name] = DatasetHandle(spec, root, self.cache_dir)
+        return self._handles[name]
+
+    def summary(self, load: bool = False) -> pd.DataFrame:
+        """One row per corpus; with `load` also row / label counts (builds missing snapshots)."""
+        rows = []
+        for name, spec in self.specs.items():
+            handle = self[name]
+            row = {'name': name, 'root': handle.root, 'description': spec.description}
+            try:
+                row['fingerprint'] = handle.fingerprint()
+                row['cached'] = os.path.exists(handle._snapshot_path(row['fingerprint']))
+                if load:
+                    row.update(handle.info())
+            except FileNotFoundError as e:
+                row['error'] = str(e)
+            rows.append(row)
+        return pd.DataFrame(rows)
@@ -0,0 +1,414 @@
+"""
+Columnar Parquet / Arrow storage for datasets, synthetic corpora and analysis outputs.
+
+Analysis results are written as timestamped CSV or pretty-printed JSON
+(`csv_files/`, `json_files/`, `ngram_results_raw.json`, `topic_results_raw.json`,
+the subject CSVs) and synthetic corpora as both, so every reload reparses
+text and re-infers types. Here each table is written once as typed,
+compressed Parquet under a hive layout
+
+    root/<dataset>/subject=<subject>/run=<run_id>/part-0.parquet
+
+and read back through memory-mapped Arrow with partition pruning on
+subject / run and row-group predicate pushdown on any column (label, model,
+...). Repetitive string columns are dictionary-encoded and integer columns
+downcast before writing. Every write is recorded in `catalog.jsonl` with its
+row count, schema, size, source file and free-form metadata.
+
+This module provides:
+- DatasetStore: write / read / scan / catalog / latest_run / delete_run over one root
+- optimize_frame: downcast integers and dictionary-encode repetitive strings
+- flatten_json_results: nested {subject: {kind: [records]}} JSON to one table
+- import_analysis_results: migrate a CSV / JSON results tree into a store
+"""
+
+import os
+import re
+import json
+import shutil
+import logging
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+_TIMESTAMP = re.compile(r'_?(\d{8}_\d{6})')
+_SAFE = re.compile(r'[^A-Za-z0-9_.-]+')
+
+Filters = Union[Dict[str, Any], 'ds.Expression', None]
+
+
+def _safe_name(value: Any) -> str:
+    """Partition-safe directory value ('Politics/Government' -> 'Politics_Government')."""
+    return _SAFE.sub('_', str(value)).strip('_') or 'all'
+
+
+def optimize_frame(frame: pd.DataFrame, max_category_ratio: float = 0.5, downcast_floats: bool = False) -> pd.DataFrame:
+    """
+    Typed copy of `frame` for columnar storage.
+
+    Integer columns are downcast to the smallest type holding their range
+    (labels become int8), string columns whose distinct values are at most
+    `max_category_ratio` of the rows become categoricals (stored as Parquet
+    dictionaries), and floats are optionally downcast to float32.
+    """
+    frame = frame.copy()
+    for column in frame.columns:
+        series = frame[column]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            frame[column] = pd.to_numeric(series, downcast='integer')
+        elif pd.api.types.is_float_dtype(series):
+            if downcast_floats:
+                frame[column] = series.astype(np.float32)
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            non_null = series.dropna()
+            if len(non_null) and non_null.map(type).eq(str).all():
+                if non_null.nunique() <= max_category_ratio * len(non_null):
+                    frame[column] = series.astype('category')
+    return frame
+
+
+def flatten_json_results(payload: Any, levels: Sequence[str] = ('subject', 'kind')) -> pd.DataFrame:
+    """
+    Flatten nested analysis JSON into one table.
+
+    `{"Politics/Government": {"unigrams": [{...}, ...]}}` becomes rows with
+    `subject` and `kind` columns plus the record fields; list-valued fields
+    (topic words, weights) stay list columns. A top-level list of records
+    is returned as is.
+    """
+    rows = []
+
+    def walk(node: Any, path: Tuple[str, ...]):
+        if isinstance(node, list) and (not node or isinstance(node[0], dict)):
+            tags = dict(zip(levels, path))
+            rows.extend({**tags, **record} for record in node)
+        elif isinstance(node, dict):
+            if node and all(not isinstance(v, (dict, list)) or (isinstance(v, list) and v and not isinstance(v[0], dict))
+                            for v in node.values()):
+                rows.append({**dict(zip(levels, path)), **node})  # a single record
+            else:
+                for key, value in node.items():
+                    walk(value, path + (str(key),))
+        else:
+            rows.append({**dict(zip(levels, path)), 'value': node})
+
+    walk(payload, ())
+    return pd.DataFrame(rows)
+
+
+class DatasetStore:
+    """
+    Partitioned Parquet store with a run catalog.
+
+    Args:
+        root: Store directory (created if missing)
+        compression: Parquet codec ('zstd', 'snappy', ...)
+        row_group_size: Rows per row group; smaller groups let filters skip more
+    """
+
+    def __init__(self, root: str, compression: str = 'zstd', row_group_size: int = 64_000):
+        if not PYARROW_AVAILABLE:
+            raise ImportError("DatasetStore needs pyarrow")
+        self.root = root
+        self.compression = compression
+        self.row_group_size = row_group_size
+        self.catalog_path = os.path.join(root, 'catalog.jsonl')
+        os.makedirs(root, exist_ok=True)
+
+    # ------------------------------------------------------------------ writing
+
+    def _run_dir(self, dataset: str, subject: str, run_id: str) -> str:
+        return os.path.join(self.root, _safe_name(dataset), f"subject={_safe_name(subject)}", f"run={_safe_name(run_id)}")
+
+    def write(
+        self,
+        frame: Union[pd.DataFrame, 'pa.Table'],
+        dataset: str,
+        subject: str = 'all',
+        run_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        source: Optional[str] = None,
+        optimize: bool = True,
+        overwrite: bool = False
+    ) -> str:
+        """
+        Write one table as a new run of `dataset` / `subject`.
+
+        Args:
+            frame: DataFrame or Arrow table
+            run_id: Run name (default: current `%Y%m%d_%H%M%S` timestamp)
+            metadata: JSON-serializable notes kept in the catalog (params, model, ...)
+            source: Original file the table came from
+            optimize: Apply `optimize_frame` to DataFrames first
+            overwrite: Replace an existing run of the same name
+
+        Returns:
+            The run id
+        """
+        run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
+        if isinstance(frame, pd.DataFrame):
+            if optimize:
+                frame = optimize_frame(frame)
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+        else:
+            table = frame
+        for column in ('subject', 'run'):
+            if column in table.column_names:
+                table = table.rename_columns([f'{name}_' if name == column else name for name in table.column_names])
+                logger.info(f"Renamed column '{column}' to '{column}_' (reserved for partitions)")
+
+        run_dir = self._run_dir(dataset, subject, run_id)
+        if os.path.exists(run_dir):
+            if not overwrite:
+                raise FileExistsError(f"Run {run_id!r} of {dataset}/{subject} already exists")
+            shutil.rmtree(run_dir)
+        os.makedirs(run_dir)
+        path = os.path.join(run_dir, 'part-0.parquet')
+        pq.write_table(table, path + '.tmp', compression=self.compression, row_group_size=self.row_group_size)
+        os.replace(path + '.tmp', path)
+
+        entry = {
+            'dataset': dataset, 'subject': str(subject), 'run_id': run_id,
+            'path': os.path.relpath(path, self.root), 'rows': table.num_rows,
+            'columns': table.column_names, 'schema': {f.name: str(f.type) for f in table.schema},
+            'bytes': os.path.getsize(path), 'source': source,
+            'created_at': datetime.now().isoformat(), 'metadata': metadata or {},
+        }
+        with open(self.catalog_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, default=str) + '\n')
+        return run_id
+
+    def import_file(self, path: str, dataset: Optional[str] = None, subject: str = 'all',
+                    run_id: Optional[str] = None, **kwargs) -> List[str]:
+        """
+        Import a CSV or JSON results file.
+
+        The dataset name defaults to the file stem without its timestamp and
+        the run id to that timestamp (or the file's modification time). JSON
+        keyed by subject is split into one run per subject.
+        """
+        stem = os.path.splitext(os.path.basename(path))[0]
+        stamp = _TIMESTAMP.search(stem)
+        dataset = dataset or _TIMESTAMP.sub('', stem)
+        run_id = run_id or (stamp.group(1) if stamp else datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y%m%d_%H%M%S'))
+
+        if path.endswith('.csv'):
+            return [self.write(pd.read_csv(path), dataset, subject, run_id, source=path, **kwargs)]
+        with open(path, encoding='utf-8') as f:
+            payload = json.load(f)
+        frame = flatten_json_results(payload)
+        if 'subject' in frame.columns and subject == 'all':
+            runs = []
+            for name, group in frame.groupby('subject', sort=False):
+                runs.append(self.write(group.drop(columns='subject'), dataset, name, run_id, source=path, **kwargs))
+            return runs
+        return [self.write(frame, dataset, subject, run_id, source=path, **kwargs)]
+
+    # ------------------------------------------------------------------ catalog
+
+    def catalog(self, dataset: Optional[str] = None) -> pd.DataFrame:
+        """One row per stored run (latest entry wins for re-written runs)."""
+        if not os.path.exists(self.catalog_path):
+            return pd.DataFrame(columns=['dataset', 'subject', 'run_id', 'rows', 'bytes', 'created_at'])
+        with open(self.catalog_path, encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        frame = pd.DataFrame(entries)
+        frame = frame.drop_duplicates(['dataset', 'subject', 'run_id'], keep='last')
+        frame = frame[[os.path.exists(os.path.join(self.root, p)) for p in frame['path']]]
+        if dataset is not None:
+            frame = frame[frame['dataset'] == dataset]
+        return frame.reset_index(drop=True)
+
+    def datasets(self) -> List[str]:
+        return sorted(self.catalog()['dataset'].unique())
+
+    def latest_run(self, dataset: str, subject: Optional[str] = None) -> Optional[str]:
+        runs = self.catalog(dataset)
+        if subject is not None:
+            runs = runs[runs['subject'] == str(subject)]
+        return runs.sort_values(['run_id', 'created_at'])['run_id'].iloc[-1] if len(runs) else None
+
+    def delete_run(self, dataset: str, subject: str, run_id: str):
+        """Remove a run's files (its catalog entry is hidden from then on)."""
+        shutil.rmtree(self._run_dir(dataset, subject, run_id), ignore_errors=True)
+
+    # ------------------------------------------------------------------ reading
+
+    @staticmethod
+    def _unify_schemas(schemas: List['pa.Schema']) -> Tuple['pa.Schema', List[str]]:
+        """
+        One schema covering every run: integer widths widened, columns missing
+        from some runs kept (read as nulls). Columns whose types cannot be
+        reconciled become strings; those mixing nested (list / struct) values
+        with anything else are returned separately, since Arrow cannot cast
+        them while scanning.
+        """
+        types: Dict[str, List['pa.DataType']] = {}
+        for schema in schemas:
+            for f in schema:
+                types.setdefault(f.name, []).append(f.type)
+        fields, nested_conflicts = [], []
+        for name, kinds in types.items():
+            try:
+                unified = pa.unify_schemas([pa.schema([(name, kind)]) for kind in kinds],
+                                           promote_options='permissive').field(name).type
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                unified = pa.string()
+                if any(pa.types.is_nested(kind) for kind in kinds):
+                    nested_conflicts.append(name)
+            fields.append(pa.field(name, unified))
+        return pa.schema(fields), nested_conflicts
+
+    @staticmethod
+    def _to_json_strings(column: 'pa.ChunkedArray') -> 'pa.Array':
+        values = column.to_pylist()
+        return pa.array([None if v is None else v if isinstance(v, str) else json.dumps(v, default=str) for v in values],
+                        type=pa.string())
+
+    def scan(self, dataset: str) -> 'ds.Dataset':
+        """
+        Arrow dataset over every run of `dataset`, read through memory maps.
+
+        Runs may differ in integer widths (each write downcasts to its own
+        range) or in columns; the dataset uses one schema unified over all
+        runs. If a column holds nested values in some runs and scalars in
+        others, runs are loaded individually with that column as JSON text.
+        """
+        directory = os.path.join(self.root, _safe_name(dataset))
+        runs = self.catalog(dataset)
+        if not os.path.isdir(directory) or not len(runs):
+            raise KeyError(f"Unknown dataset: {dataset}")
+        paths = [os.path.join(self.root, p) for p in runs['path']]
+        schema, nested_conflicts = self._unify_schemas([pq.read_schema(p).remove_metadata() for p in paths])
+        partition_schema = pa.schema([('subject', pa.string()), ('run', pa.string())])
+        full_schema = pa.schema(list(schema) + list(partition_schema))
+
+        if nested_conflicts:
+            logger.info(f"{dataset}: columns {nested_conflicts} mix nested and scalar values across runs; read as JSON text")
+            tables = []
+            for path, (_, row) in zip(paths, runs.iterrows()):
+                table = pq.read_table(path, memory_map=True).replace_schema_metadata(None)
+                for name in nested_conflicts:
+                    if name in table.column_names:
+                        table = table.set_column(table.column_names.index(name), name, self._to_json_strings(table[name]))
+                columns = [table[f.name].cast(f.type) if f.name in table.column_names else pa.nulls(table.num_rows, f.type)
+                           for f in schema]
+                columns += [pa.array([_safe_name(row['subject'])] * table.num_rows, pa.string()),
+                            pa.array([_safe_name(row['run_id'])] * table.num_rows, pa.string())]
+                tables.append(pa.Table.from_arrays(columns, schema=full_schema))
+            return ds.dataset(tables, schema=full_schema)
+
+        dictionary_columns = [f.name for f in schema if pa.types.is_dictionary(f.type)]
+        parquet_format = ds.ParquetFileFormat(read_options={'dictionary_columns': dictionary_columns})
+        return ds.dataset(paths, schema=full_schema, format=parquet_format,
+                          partitioning=ds.partitioning(partition_schema, flavor='hive'),
+                          partition_base_dir=directory,
+                          filesystem=pafs.LocalFileSystem(use_mmap=True))
+
+    @staticmethod
+    def _expression(filters: Filters) -> Optional['ds.Expression']:
+        if filters is None or not isinstance(filters, dict):
+            return filters
+        expression = None
+        for column, value in filters.items():
+            if isinstance(value, (list, tuple, set, np.ndarray, pd.Index)):
+                term = ds.field(column).isin(list(value))
+            else:
+                term = ds.field(column) == value
+            expression = term if expression is None else expression & term
+        return expression
+
+    def read_table(
+        self,
+        dataset: str,
+        subject: Union[str, Sequence[str], None] = None,
+        run: Optional[str] = 'latest',
+        columns: Optional[Sequence[str]] = None,
+        filters: Filters = None
+    ) -> 'pa.Table':
+        """
+        Arrow table of one dataset.
+
+        Args:
+            subject: Subject or subjects to read (None: all)
+            run: Run id, 'latest' (newest run per subject) or None (every run)
+            columns: Columns to read (others are never decoded)
+            filters: {column: value or list of values} or an Arrow expression;
+                pushed down to partitions and row-group statistics
+        """
+        expression = self._expression(filters)
+        if subject is not None:
+            subjects = [subject] if isinstance(subject, str) else list(subject)
+            term = ds.field('subject').isin([_safe_name(s) for s in subjects])
+            expression = term if expression is None else expression & term
+        if run == 'latest':
+            runs = self.catalog(dataset)
+            latest = runs.sort_values(['run_id', 'created_at']).groupby('subject')['run_id'].last()
+            term = None
+            for name, run_id in latest.items():
+                part = (ds.field('subject') == _safe_name(name)) & (ds.field('run') == _safe_name(run_id))
+                term = part if term is None else term | part
+            if term is not None:
+                expression = term if expression is None else expression & term
+        elif run is not None:
+            term = ds.field('run') == _safe_name(run)
+            expression = term if expression is None else expression & term
+        return self.scan(dataset).to_table(columns=list(columns) if columns else None, filter=expression)
+
+    def read(self, dataset: str, arrow_strings: bool = True, **kwargs) -> pd.DataFrame:
+        """
+        `read_table` as a DataFrame.
+
+        Dictionary columns come back as categoricals; with `arrow_strings`
+        the remaining strings stay Arrow-backed (`string[pyarrow]`) instead
+        of being copied into Python objects.
+        """
+        table = self.read_table(dataset, **kwargs)
+        mapper = {pa.string(): pd.ArrowDtype(pa.string()), pa.large_string(): pd.ArrowDtype(pa.large_string())}
+        return table.to_pandas(types_mapper=mapper.get if arrow_strings else None)
+
+    def disk_usage(self, dataset: Optional[str] = None) -> int:
+        """Bytes of Parquet data stored (for one dataset or all)."""
+        return int(self.catalog(dataset)['bytes'].sum())
+
+
+def import_analysis_results(directory: str, store: DatasetStore, overwrite: bool = False) -> pd.DataFrame:
+    """
+    Import every CSV / JSON under a results tree (e.g. stylistic_data/analysis_results).
+
+    Returns:
+        One row per imported file: dataset, runs, original and Parquet sizes
+    """
+    rows = []
+    for folder, _, files in os.walk(directory):
+        for name in sorted(files):
+            if not name.endswith(('.csv', '.json')):
+                continue
+            path = os.path.join(folder, name)
+            try:
+                runs = store.import_file(path, overwrite=overwrite)
+            except (ValueError, pa.ArrowException) as e:
+                logger.warning(f"Skipped {path}: {e}")
+                continue
+            dataset = _TIMESTAMP.sub('', os.path.splitext(name)[0])
+            stored = store.catalog(dataset)
+            stored = stored[stored['run_id'].isin(runs) & (stored['source'] == path)]
+            rows.append({'source': os.path.relpath(path, directory), 'dataset': dataset, 'runs': len(stored),
+                         'rows': int(stored['rows'].sum()), 'source_bytes': os.path.getsize(path),
+                         'parquet_bytes': int(stored['bytes'].sum())})
+    return pd.DataFrame(rows)
@@ -0,0 +1,325 @@
+"""
+Compiled multi-pattern lexicon matcher for word-list features and domain tagging.
+
+The feature extractors (`ArticleFeatureExtractor.setup_word_lists`/`setup_patterns`,
+the headline and tweet extractors' emotional/urgency/sensational lists) and
+`classify_headline_domain` test every lexicon term against every text with
+`term in text_lower`. This module merges all lexicons into one prefix-factored
+regex trie, scans each text once, and returns hit counts for every category at
+the same time. Adding a lexicon only adds branches to the trie.
+
+Matching is Unicode-aware (NFC + casefold) and the word-boundary check treats
+combining marks as word characters, so Devanagari, Vietnamese or Swahili
+lexicons behave like English ones.
+
+This module provides:
+- LexiconMatcher: count / count_batch / classify over any number of lexicons
+- Preset lexicons copied from the feature-analysis and generation notebooks
+"""
+
+import re
+import unicodedata
+import logging
+from collections import defaultdict
+from typing import List, Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------
+# Preset lexicons (kept identical to the notebook word lists)
+# ----------------------------------------------------------------------
+
+ARTICLE_LEXICONS = {
+    'attribution': [
+        'according to', 'said', 'told', 'reported', 'stated', 'claimed',
+        'confirmed', 'announced', 'revealed', 'disclosed', 'admitted',
+        'alleged', 'sources say', 'officials', 'spokesman', 'spokesperson'
+    ],
+    'certainty': [
+        'definitely', 'certainly', 'confirmed', 'proven', 'established',
+        'undoubtedly', 'clearly', 'obviously', 'without doubt', 'fact'
+    ],
+    'speculation': [
+        'allegedly', 'reportedly', 'supposedly', 'claims', 'suggests',
+        'appears', 'seems', 'may', 'might', 'could', 'possibly',
+        'potentially', 'likely', 'probably', 'perhaps'
+    ],
+    'emotional': [
+        'outraged', 'shocked', 'devastated', 'thrilled', 'excited',
+        'furious', 'delighted', 'appalled', 'concerned', 'worried',
+        'pleased', 'disappointed', 'frustrated', 'satisfied'
+    ],
+    'bias': [
+        'obviously', 'clearly', 'naturally', 'of course', 'everyone knows',
+        'it is clear that', 'undeniably', 'without question', 'certainly'
+    ],
+    'sensational': [
+        'breaking', 'urgent', 'shocking', 'stunning', 'incredible',
+        'unbelievable', 'explosive', 'bombshell', 'dramatic', 'crisis',
+        'disaster', 'scandal', 'controversy', 'outrageous'
+    ],
+    'formal': [
+        'furthermore', 'moreover', 'nevertheless', 'however', 'therefore',
+        'consequently', 'subsequently', 'accordingly', 'thus', 'hence'
+    ],
+}
+
+HEADLINE_LEXICONS = {
+    'clickbait': [
+        'shocking', 'unbelievable', 'incredible', 'amazing', 'stunning',
+        'outrageous', 'scandalous', 'exclusive', 'secret', 'exposed',
+        'revealed', 'bombshell', 'you wont believe', 'this will', 'what happens next'
+    ],
+    'sensational': [
+        'breaking', 'urgent', 'alert', 'crisis', 'disaster', 'tragedy',
+        'scandal', 'controversy', 'explosive', 'dramatic', 'shocking', 'devastating'
+    ],
+    'speculation': [
+        'allegedly', 'reportedly', 'supposedly', 'claims', 'suggests',
+        'may', 'might', 'could', 'possibly', 'potentially', 'appears', 'seems'
+    ],
+    'emotional': [
+        'love', 'hate', 'fear', 'anger', 'joy', 'sad', 'happy', 'excited',
+        'worried', 'concerned', 'thrilled', 'disappointed', 'frustrated'
+    ],
+}
+
+TWEET_LEXICONS = {
+    'urgency': [
+        'urgent', 'immediately', 'asap', 'quickly', 'fast', 'hurry', 'rush',
+        'emergency', 'breaking', 'alert', 'critical', 'important', 'now', 'instant'
+    ],
+}
+
+DOMAIN_KEYWORDS = {
+    'celebrity': [
+        'celebrity', 'star', 'actor', 'actress', 'singer', 'musician', 'hollywood',
+        'grammy', 'oscar', 'red carpet', 'kardashian', 'swift', 'beyonce', 'bieber',
+        'entertainment', 'movie', 'album', 'concert', 'dating', 'marriage', 'divorce'
+    ],
+    'political': [
+        'president', 'senator', 'congress', 'government', 'election', 'vote', 'campaign',
+        'democrat', 'republican', 'policy', 'law', 'bill', 'trump', 'biden', 'political',
+        'senate', 'house', 'supreme court', 'governor', 'mayor'
+    ],
+}
+
+
+# ----------------------------------------------------------------------
+# Helpers
+# ----------------------------------------------------------------------
+
+def normalize_text(text: str, case_sensitive: bool = False) -> str:
+    """NFC-normalize (and casefold unless case-sensitive) so lexicons and texts align."""
+    text = unicodedata.normalize('NFC', str(text))
+    return text if case_sensitive else text.casefold()
+
+
+def _is_word_char(char: str) -> bool:
+    """Letters, digits, underscore and combining marks (needed for Indic scripts)."""
+    return char.isalnum() or char == '_' or unicodedata.category(char).startswith('M')
+
+
+def build_trie_pattern(terms: Iterable[str]) -> str:
+    """
+    Build a prefix-factored regex that matches the longest term at a position.
+
+    Example: ['may', 'mayor', 'might'] -> 'm(?:ay(?:or)?|ight)'. Optional
+    suffix groups are greedy, so the regex engine returns the longest term.
+    """
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def render(node: Dict) -> str:
+        terminal = '' in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if terminal:
+            if len(branches) == 1 and len(branches[0]) > 1:
+                body = '(?:' + body + ')'
+            body += '?'
+        return body
+
+    return render(trie)
+
+
+# ----------------------------------------------------------------------
+# Matcher
+# ----------------------------------------------------------------------
+
+class LexiconMatcher:
+    """
+    Count hits for many lexicon categories with one scan per text.
+
+    Every position of the text is tested once against the merged trie
+    (zero-width lookahead, so overlapping terms are found). The longest term at a
+    position is expanded to all lexicon terms that are its prefixes, which
+    recovers every overlapping match without rescanning.
+
+    Args:
+        lexicons: {category: [terms]}
+        word_boundaries: Require terms to start and end at word boundaries.
+            False reproduces the notebooks' `term in text_lower` substring semantics.
+        case_sensitive: Match case-sensitively (default: casefolded)
+    """
+
+    def __init__(
+        self,
+        lexicons: Optional[Dict[str, Iterable[str]]] = None,
+        word_boundaries: bool = False,
+        case_sensitive: bool = False
+    ):
+        self.word_boundaries = word_boundaries
+        self.case_sensitive = case_sensitive
+        self.lexicons: Dict[str, List[str]] = {}
+        self._pattern: Optional[re.Pattern] = None
+        for name, terms in (lexicons or {}).items():
+            self.add_lexicon(name, terms)
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self.lexicons)
+
+    def add_lexicon(self, name: str, terms: Iterable[str]) -> 'LexiconMatcher':
+        """Register (or replace) a lexicon; the trie is rebuilt lazily on next use."""
+        cleaned = [normalize_text(t, self.case_sensitive).strip() for t in terms]
+        self.lexicons[name] = list(dict.fromkeys(t for t in cleaned if t))
+        self._pattern = None
+        return self
+
+    def _compile(self):
+        term_categories: Dict[str, List[int]] = defaultdict(list)
+        for index, terms in enumerate(self.lexicons.values()):
+            for term in terms:
+                term_categories[term].append(index)
+
+        terms = sorted(term_categories)
+        self._term_ids = {term: i for i, term in enumerate(terms)}
+        self._term_categories = [np.asarray(term_categories[t], dtype=np.intp) for t in terms]
+        # For each term, every lexicon term that is a prefix of it (including itself).
+        self._prefix_terms = {
+            term: [term[:k] for k in range(1, len(term) + 1) if term[:k] in term_categories]
+            for term in terms
+        }
+        self._pattern = re.compile('(?=(' + build_trie_pattern(terms) + '))') if terms else None
+        logger.debug(f"Compiled {len(terms)} terms across {len(self.lexicons)} lexicons")
+
+    def _bounded(self, text: str, start: int, end: int) -> bool:
+        if start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+            return False
+        if end < len(text) and _is_word_char(text[end]) and _is_word_char(text[end - 1]):
+            return False
+        return True
+
+    def find_terms(self, text: str) -> List[Tuple[int, str]]:
+        """All (position, term) hits in a text, including overlapping ones."""
+        if self._pattern is None:
+            if not self.lexicons:
+                return []
+            self._compile()
+            if self._pattern is None:
+                return []
+        text = normalize_text(text, self.case_sensitive)
+        hits = []
+        for match in self._pattern.finditer(text):
+            start = match.start()
+            for term in self._prefix_terms[match.group(1)]:
+                if not self.word_boundaries or self._bounded(text, start, start + len(term)):
+                    hits.append((start, term))
+        return hits
+
+    def count(self, text: str, mode: str = 'presence') -> Dict[str, int]:
+        """
+        Hit counts per category for one text.
+
+        Args:
+            mode: 'presence' counts distinct terms found (notebook semantics),
+                'occurrences' counts every hit
+
+        Returns:
+            {category: count}
+        """
+        return dict(zip(self.categories, self._count_vector(text, mode).tolist()))
+
+    def _count_vector(self, text: str, mode: str) -> np.ndarray:
+        if mode not in ('presence', 'occurrences'):
+            raise ValueError(f"Unknown mode: {mode}. Use 'presence' or 'occurrences'")
+        counts = np.zeros(len(self.lexicons), dtype=np.int32)
+        hits = self.find_terms(text)
+        terms = {term for _, term in hits} if mode == 'presence' else [term for _, term in hits]
+        for term in terms:
+            counts[self._term_categories[self._term_ids[term]]] += 1
+        return counts
+
+    def count_batch(self, texts: Sequence[str], mode: str = 'presence', suffix: str = '') -> pd.DataFrame:
+        """
+        Hit counts for every text and category.
+
+        Returns:
+            DataFrame with one row per text and one column per category
+            (column names get `suffix` appended, e.g. '_word_count')
+        """
+        matrix = np.zeros((len(texts), len(self.lexicons)), dtype=np.int32)
+        for row, text in enumerate(texts):
+            matrix[row] = self._count_vector('' if text is None else text, mode)
+        return pd.DataFrame(matrix, columns=[f'{name}{suffix}' for name in self.categories])
+
+    def classify(
+        self,
+        text: str,
+        labels: Optional[Sequence[str]] = None,
+        default: str = 'general',
+        mode: str = 'presence'
+    ) -> str:
+        """
+        Return the category with strictly the most hits, or `default` on ties/no hits.
+
+        Same decision rule as `classify_headline_domain`.
+        """
+        counts = self.count(text, mode)
+        labels = list(labels) if labels is not None else self.categories
+        scores = np.array([counts[label] for label in labels])
+        if len(scores) == 0 or scores.max() == 0 or (scores == scores.max()).sum() > 1:
+            return default
+        return labels[int(scores.argmax())]
+
+    def classify_batch(
+        self,
+        texts: Sequence[str],
+        labels: Optional[Sequence[str]] = None,
+        default: str = 'general',
+        mode: str = 'presence'
+    ) -> List[str]:
+        """Vectorized `classify` over many texts."""
+        labels = list(labels) if labels is not None else self.categories
+        scores = self.count_batch(texts, mode)[labels].to_numpy()
+        best = scores.max(axis=1)
+        winners = np.asarray(labels, dtype=object)[scores.argmax(axis=1)]
+        unique = (scores == best[:, None]).sum(axis=1) == 1
+        return np.where((best > 0) & unique, winners, default).tolist()
+
+
+def classify_headline_domain(headline: str, matcher: Optional[LexiconMatcher] = None) -> str:
+    """Drop-in replacement for the notebook's `classify_headline_domain`."""
+    matcher = matcher or _default_domain_matcher()
+    return matcher.classify(headline, labels=['celebrity', 'political'], default='general')
+
+
+_DOMAIN_MATCHER: Optional[LexiconMatcher] = None
+
+
+def _default_domain_matcher() -> LexiconMatcher:
+    global _DOMAIN_MATCHER
+    if _DOMAIN_MATCHER is None:
+        _DOMAIN_MATCHER = LexiconMatcher(DOMAIN_KEYWORDS)
+    return _DOMAIN_MATCHER
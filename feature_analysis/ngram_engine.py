@@ -0,0 +1,484 @@
+"""
+Single-pass discriminative n-gram engine for real vs fake news analysis.
+
+The notebook implementations (`analyze_discriminative_ngrams`,
+`CrossSubjectNgramAnalyzer.analyze_subject_ngrams`, `extract_distinctive_ngrams`)
+refit a `CountVectorizer` per subject, per n and per class. This module tokenizes
+the corpus once into a single sparse 1-3-gram document-term matrix and derives
+every per-class and per-subject statistic from it with sparse group-by products.
+
+This module provides:
+- NgramEngine: fit once, then query class/subject tables
+- Log-odds ratios with informative Dirichlet priors (Monroe et al., 2008)
+- Export of `ngram_results_raw.json`, `ngram_analysis_results.csv`
+  and the per-subject `{subject}_{n}-grams.csv` files in one run
+"""
+
+import os
+import re
+import json
+import string
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer
+
+logger = logging.getLogger(__name__)
+
+NGRAM_TYPE_NAMES = {1: 'unigrams', 2: 'bigrams', 3: 'trigrams'}
+
+URL_PATTERN = re.compile(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+')
+EMAIL_PATTERN = re.compile(r'\S+@\S+')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation.replace('.', '').replace('!', '').replace('?', ''))
+
+
+def preprocess_text(text: Any) -> str:
+    """Clean text the same way as `CrossSubjectNgramAnalyzer.preprocess_text`."""
+    if text is None or (isinstance(text, float) and np.isnan(text)):
+        return ""
+    text = str(text).lower()
+    text = URL_PATTERN.sub('', text)
+    text = EMAIL_PATTERN.sub('', text)
+    text = WHITESPACE_PATTERN.sub(' ', text)
+    return text.translate(PUNCTUATION_TABLE).strip()
+
+
+def group_indicator(codes: np.ndarray, n_groups: int) -> sparse.csr_matrix:
+    """
+    Build a sparse (n_groups x n_docs) indicator matrix from integer group codes.
+
+    Multiplying it with a document-term matrix sums the rows of each group, which
+    is the sparse equivalent of a pandas group-by sum. Negative codes are dropped.
+    """
+    codes = np.asarray(codes)
+    keep = np.flatnonzero(codes >= 0)
+    data = np.ones(len(keep), dtype=np.float64)
+    return sparse.csr_matrix((data, (codes[keep], keep)), shape=(n_groups, len(codes)))
+
+
+def log_odds_dirichlet(
+    counts_a: np.ndarray,
+    counts_b: np.ndarray,
+    prior: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Log-odds ratio of group a vs group b with an informative Dirichlet prior.
+
+    Args:
+        counts_a: Term counts for group a (1-D or 2-D with groups in rows)
+        counts_b: Term counts for group b, same shape as counts_a
+        prior: Pseudo-counts per term (usually scaled background frequencies)
+
+    Returns:
+        Tuple of (log-odds delta, z-score)
+    """
+    counts_a = np.asarray(counts_a, dtype=np.float64)
+    counts_b = np.asarray(counts_b, dtype=np.float64)
+    prior = np.asarray(prior, dtype=np.float64)
+    alpha0 = prior.sum()
+
+    total_a = counts_a.sum(axis=-1, keepdims=True)
+    total_b = counts_b.sum(axis=-1, keepdims=True)
+
+    # Terms with neither counts nor prior mass (absent from the background) carry
+    # no evidence; they get 0 instead of log(0) and 1/0 terms
+    supported = (counts_a + prior > 0) & (counts_b + prior > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        omega_a = (counts_a + prior) / (total_a + alpha0 - counts_a - prior)
+        omega_b = (counts_b + prior) / (total_b + alpha0 - counts_b - prior)
+        delta = np.log(omega_a) - np.log(omega_b)
+        variance = 1.0 / (counts_a + prior) + 1.0 / (counts_b + prior)
+        z_score = delta / np.sqrt(variance)
+    return np.where(supported, delta, 0.0), np.where(supported, z_score, 0.0)
+
+
+class NgramEngine:
+    """
+    Tokenize once, aggregate many times.
+
+    Fits one `CountVectorizer` over the whole corpus for the full n-gram range and
+    keeps the resulting sparse matrix. Class and subject statistics are computed by
+    multiplying the matrix with sparse group indicators, so adding subjects or
+    re-running with different top-k cutoffs never re-tokenizes the texts.
+    """
+
+    def __init__(
+        self,
+        ngram_range: Tuple[int, int] = (1, 3),
+        min_df: int = 2,
+        max_df: float = 1.0,
+        max_features: Optional[int] = None,
+        stop_words: Optional[str] = 'english',
+        token_pattern: str = r'\b[a-zA-Z]{2,}\b',
+        prior_strength: float = 1000.0,
+        preprocess: bool = True,
+        positive_label: str = 'fake',
+        negative_label: str = 'real'
+    ):
+        self.ngram_range = ngram_range
+        self.prior_strength = prior_strength
+        self.preprocess = preprocess
+        self.positive_label = positive_label
+        self.negative_label = negative_label
+        self.vectorizer = CountVectorizer(
+            ngram_range=ngram_range,
+            min_df=min_df,
+            max_df=max_df,
+            max_features=max_features,
+            stop_words=stop_words,
+            lowercase=True,
+            token_pattern=token_pattern,
+            dtype=np.int32
+        )
+
+        self.doc_term_matrix: Optional[sparse.csr_matrix] = None
+        self.feature_names: Optional[np.ndarray] = None
+        self.ngram_lengths: Optional[np.ndarray] = None
+        self.labels: Optional[np.ndarray] = None
+        self.subjects: Optional[np.ndarray] = None
+        self.subject_names: List[str] = []
+
+    def fit(
+        self,
+        texts: Sequence[Any],
+        labels: Sequence[Any],
+        subjects: Optional[Sequence[Any]] = None
+    ) -> 'NgramEngine':
+        """
+        Tokenize the corpus once and store the document-term matrix.
+
+        Args:
+            texts: Raw documents
+            labels: Class label per document (positive_label / negative_label)
+            subjects: Optional subject per document for per-subject tables
+        """
+        if len(texts) != len(labels):
+            raise ValueError("texts and labels must have the same length")
+        if subjects is not None and len(subjects) != len(texts):
+            raise ValueError("subjects must have the same length as texts")
+
+        docs = [preprocess_text(t) for t in texts] if self.preprocess else [str(t) for t in texts]
+        self.doc_term_matrix = self.vectorizer.fit_transform(docs).tocsr()
+        self.feature_names = self.vectorizer.get_feature_names_out()
+        self.ngram_lengths = np.fromiter(
+            (name.count(' ') + 1 for name in self.feature_names),
+            dtype=np.int8,
+            count=len(self.feature_names)
+        )
+
+        labels = np.asarray([str(label) for label in labels])
+        self.labels = np.where(
+            labels == self.positive_label, 1,
+            np.where(labels == self.negative_label, 0, -1)
+        ).astype(np.int8)
+
+        if subjects is not None:
+            self.subject_names, codes = np.unique(np.asarray([str(s) for s in subjects]), return_inverse=True)
+            self.subject_names = list(self.subject_names)
+            self.subjects = codes.astype(np.int32)
+        else:
+            self.subject_names = []
+            self.subjects = None
+
+        logger.info(
+            f"Tokenized {len(docs):,} documents into {len(self.feature_names):,} "
+            f"{self.ngram_range[0]}-{self.ngram_range[1]}-grams"
+        )
+        return self
+
+    def _check_fitted(self):
+        if self.doc_term_matrix is None:
+            raise RuntimeError("NgramEngine must be fitted before querying results")
+
+    def _class_codes(self, subject: Optional[str] = None) -> np.ndarray:
+        """Class code per document, masked to -1 outside the requested subject."""
+        codes = self.labels.astype(np.int32)
+        if subject is not None:
+            if self.subjects is None:
+                raise ValueError("Engine was fitted without subjects")
+            subject_code = self.subject_names.index(subject)
+            codes = np.where(self.subjects == subject_code, codes, -1)
+        return codes
+
+    def group_counts(self, codes: np.ndarray, n_groups: int, binary: bool = False) -> np.ndarray:
+        """
+        Sum term counts (or document frequencies if binary) per group.
+
+        Returns:
+            Dense (n_groups x n_terms) array
+        """
+        self._check_fitted()
+        matrix = self.doc_term_matrix
+        if binary:
+            matrix = matrix.copy()
+            matrix.data = np.ones_like(matrix.data)
+        return np.asarray((group_indicator(codes, n_groups) @ matrix).todense())
+
+    def class_table(self, subject: Optional[str] = None, min_total_count: int = 1) -> pd.DataFrame:
+        """
+        Per-n-gram real vs fake statistics for the whole corpus or one subject.
+
+        Columns follow the notebooks: `real_freq`/`fake_freq` are mean counts per
+        document (as in `CrossSubjectNgramAnalyzer`), `*_doc_freq` the share of
+        documents containing the n-gram, and `log_odds_z` the prior-smoothed
+        log-odds z-score (positive means fake-leaning).
+        """
+        self._check_fitted()
+        codes = self._class_codes(subject)
+        counts = self.group_counts(codes, 2)
+        doc_counts = self.group_counts(codes, 2, binary=True)
+        n_docs = np.bincount(codes[codes >= 0], minlength=2).astype(np.float64)
+        if n_docs.min() == 0:
+            return pd.DataFrame()
+
+        real_count, fake_count = counts[0], counts[1]
+        background = real_count + fake_count
+        prior = self.prior_strength * background / max(background.sum(), 1.0)
+        delta, z_score = log_odds_dirichlet(fake_count, real_count, prior)
+
+        real_freq = real_count / n_docs[0]
+        fake_freq = fake_count / n_docs[1]
+        diff = fake_freq - real_freq
+
+        table = pd.DataFrame({
+            'ngram': self.feature_names,
+            'ngram_length': self.ngram_lengths,
+            'real_count': real_count,
+            'fake_count': fake_count,
+            'real_freq': real_freq,
+            'fake_freq': fake_freq,
+            'real_doc_freq': doc_counts[0] / n_docs[0],
+            'fake_doc_freq': doc_counts[1] / n_docs[1],
+            'diff': diff,
+            'ratio': fake_freq / (real_freq + 1e-10),
+            'abs_diff': np.abs(diff),
+            'log_odds_ratio': delta,
+            'log_odds_z': z_score,
+            'abs_log_odds_z': np.abs(z_score),
+        })
+        table = table[(real_count + fake_count) >= min_total_count]
+        table['preference'] = np.where(
+            table['ratio'] > 1.5, 'fake', np.where(table['ratio'] < 0.67, 'real', 'neutral')
+        )
+        return table.sort_values('abs_diff', ascending=False).reset_index(drop=True)
+
+    def all_subject_tables(self) -> Dict[str, pd.DataFrame]:
+        """
+        Real vs fake tables for every subject from a single group-by product.
+
+        Uses one indicator with a row per (subject, class) pair instead of
+        calling `class_table` once per subject.
+        """
+        self._check_fitted()
+        if self.subjects is None:
+            raise ValueError("Engine was fitted without subjects")
+
+        n_subjects = len(self.subject_names)
+        codes = np.where(self.labels >= 0, self.subjects * 2 + self.labels, -1)
+        counts = self.group_counts(codes, n_subjects * 2).reshape(n_subjects, 2, -1)
+        doc_counts = self.group_counts(codes, n_subjects * 2, binary=True).reshape(n_subjects, 2, -1)
+        n_docs = np.bincount(codes[codes >= 0], minlength=n_subjects * 2).reshape(n_subjects, 2).astype(np.float64)
+
+        background = counts.sum(axis=1)
+        prior = self.prior_strength * background / np.maximum(background.sum(axis=1, keepdims=True), 1.0)
+        # Per-subject priors differ, so evaluate the log-odds formula row by row in one broadcast.
+        alpha0 = prior.sum(axis=1, keepdims=True)
+        real_count, fake_count = counts[:, 0], counts[:, 1]
+        total_real = real_count.sum(axis=1, keepdims=True)
+        total_fake = fake_count.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta = (np.log((fake_count + prior) / (total_fake + alpha0 - fake_count - prior))
+                     - np.log((real_count + prior) / (total_real + alpha0 - real_count - prior)))
+            z_score = delta / np.sqrt(1.0 / (fake_count + prior) + 1.0 / (real_count + prior))
+
+        tables = {}
+        for s, subject in enumerate(self.subject_names):
+            if n_docs[s].min() == 0:
+                logger.warning(f"Subject {subject} lacks one of the classes, skipping")
+                continue
+            present = background[s] > 0
+            real_freq = real_count[s] / n_docs[s, 0]
+            fake_freq = fake_count[s] / n_docs[s, 1]
+            diff = fake_freq - real_freq
+            table = pd.DataFrame({
+                'ngram': self.feature_names[present],
+                'ngram_length': self.ngram_lengths[present],
+                'real_count': real_count[s, present],
+                'fake_count': fake_count[s, present],
+                'real_freq': real_freq[present],
+                'fake_freq': fake_freq[present],
+                'real_doc_freq': doc_counts[s, 0, present] / n_docs[s, 0],
+                'fake_doc_freq': doc_counts[s, 1, present] / n_docs[s, 1],
+                'diff': diff[present],
+                'ratio': (fake_freq / (real_freq + 1e-10))[present],
+                'abs_diff': np.abs(diff[present]),
+                'log_odds_ratio': delta[s, present],
+                'log_odds_z': z_score[s, present],
+                'abs_log_odds_z': np.abs(z_score[s, present]),
+            })
+            table['preference'] = np.where(
+                table['ratio'] > 1.5, 'fake', np.where(table['ratio'] < 0.67, 'real', 'neutral')
+            )
+            tables[subject] = table.sort_values('abs_diff', ascending=False).reset_index(drop=True)
+        return tables
+
+    def tfidf_by_subject(self, n: int, top_n: int = 20, max_df: float = 0.8, min_df: int = 2) -> Dict[str, pd.DataFrame]:
+        """
+        Mean TF-IDF of n-grams of a single length within each subject.
+
+        Reproduces `extract_distinctive_ngrams` (per-subject IDF, l2-normalized rows,
+        `max_df`/`min_df` filtering) by column- and row-slicing the shared matrix.
+        """
+        self._check_fitted()
+        if self.subjects is None:
+            raise ValueError("Engine was fitted without subjects")
+
+        columns = np.flatnonzero(self.ngram_lengths == n)
+        matrix = self.doc_term_matrix[:, columns].astype(np.float64)
+        binary = matrix.copy()
+        binary.data = np.ones_like(binary.data)
+        n_subjects = len(self.subject_names)
+        subject_df = np.asarray((group_indicator(self.subjects, n_subjects) @ binary).todense())
+        n_docs = np.bincount(self.subjects, minlength=n_subjects)
+
+        results = {}
+        for s, subject in enumerate(self.subject_names):
+            rows = np.flatnonzero(self.subjects == s)
+            if len(rows) == 0:
+                continue
+            doc_freq = subject_df[s]
+            keep = (doc_freq >= min_df) & (doc_freq <= max_df * n_docs[s])
+            if not keep.any():
+                results[subject] = pd.DataFrame(columns=['ngram', 'tfidf_score'])
+                continue
+            idf = np.log((1.0 + n_docs[s]) / (1.0 + doc_freq[keep])) + 1.0
+            weighted = matrix[rows][:, keep] @ sparse.diags(idf)
+            norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+            norms[norms == 0] = 1.0
+            mean_tfidf = np.asarray((sparse.diags(1.0 / norms) @ weighted).mean(axis=0)).ravel()
+            order = np.argsort(mean_tfidf)[::-1][:top_n]
+            results[subject] = pd.DataFrame({
+                'ngram': self.feature_names[columns[keep][order]],
+                'tfidf_score': mean_tfidf[order],
+            })
+        return results
+
+    def to_raw_results(self, top_k: Optional[Dict[str, int]] = None) -> Dict[str, Dict[str, List[Dict]]]:
+        """
+        Build the `ngram_results_raw.json` structure: {subject: {ngram_type: [rows]}}.
+
+        Args:
+            top_k: Rows kept per n-gram type (defaults to the notebook cutoffs)
+        """
+        top_k = top_k or {'unigrams': 100, 'bigrams': 50, 'trigrams': 50}
+        columns = ['ngram', 'real_freq', 'fake_freq', 'diff', 'ratio', 'abs_diff', 'log_odds_z']
+
+        tables = self.all_subject_tables() if self.subjects is not None else {'all': self.class_table()}
+        raw_results = {}
+        for subject, table in tables.items():
+            subject_results = {}
+            for n, ngram_type in NGRAM_TYPE_NAMES.items():
+                if ngram_type not in top_k:
+                    continue
+                rows = table[table['ngram_length'] == n].head(top_k[ngram_type])
+                subject_results[ngram_type] = rows[columns].to_dict(orient='records')
+            raw_results[subject] = subject_results
+        return raw_results
+
+    def save_outputs(
+        self,
+        advanced_dir: str,
+        subject_dir: Optional[str] = None,
+        top_k: Optional[Dict[str, int]] = None,
+        csv_top_k: Optional[Dict[str, int]] = None,
+        subject_top_n: int = 20
+    ) -> List[str]:
+        """
+        Write every n-gram artifact from the already-fitted matrix.
+
+        Args:
+            advanced_dir: Directory for `ngram_results_raw.json` and `ngram_analysis_results.csv`
+            subject_dir: Directory for `{subject}_{n}-grams.csv` (skipped if None)
+            top_k: Rows per n-gram type in the raw JSON
+            csv_top_k: Rows per n-gram type in the flattened CSV
+            subject_top_n: Rows per per-subject TF-IDF CSV
+
+        Returns:
+            List of written file paths
+        """
+        os.makedirs(advanced_dir, exist_ok=True)
+        saved_files = []
+
+        raw_results = self.to_raw_results(top_k)
+        raw_path = os.path.join(advanced_dir, 'ngram_results_raw.json')
+        with open(raw_path, 'w') as f:
+            json.dump(raw_results, f, indent=2, default=float)
+        saved_files.append(raw_path)
+
+        csv_top_k = csv_top_k or {'unigrams': 50, 'bigrams': 30, 'trigrams': 30}
+        ngram_data = []
+        for subject, results in raw_results.items():
+            for ngram_type, rows in results.items():
+                for row in rows[:csv_top_k.get(ngram_type, len(rows))]:
+                    ngram_data.append({
+                        'subject': subject,
+                        'ngram_type': ngram_type[:-1],
+                        'ngram': row['ngram'],
+                        'real_freq': row['real_freq'],
+                        'fake_freq': row['fake_freq'],
+                        'difference': row['diff'],
+                        'ratio': row['ratio'],
+                        'log_odds_z': row['log_odds_z'],
+                        'pattern': 'FAKE' if row['diff'] > 0 else 'REAL'
+                    })
+        csv_path = os.path.join(advanced_dir, 'ngram_analysis_results.csv')
+        pd.DataFrame(ngram_data).to_csv(csv_path, index=False)
+        saved_files.append(csv_path)
+
+        if subject_dir is not None and self.subjects is not None:
+            os.makedirs(subject_dir, exist_ok=True)
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                for subject, table in self.tfidf_by_subject(n, top_n=subject_top_n).items():
+                    path = os.path.join(subject_dir, f'{subject}_{n}-grams.csv')
+                    table.to_csv(path, index=False)
+                    saved_files.append(path)
+
+        logger.info(f"Saved {len(saved_files)} n-gram files")
+        return saved_files
+
+
+def analyze_ngrams(
+    df: pd.DataFrame,
+    text_column: str = 'text',
+    label_column: str = 'label',
+    subject_column: Optional[str] = 'subject',
+    advanced_dir: Optional[str] = None,
+    subject_dir: Optional[str] = None,
+    **engine_kwargs
+) -> NgramEngine:
+    """
+    Convenience wrapper: fit an engine on a DataFrame and optionally save outputs.
+
+    Args:
+        df: DataFrame with text, label and (optionally) subject columns
+        text_column: Column containing the documents
+        label_column: Column containing 'real'/'fake' labels
+        subject_column: Column with subjects (None for class-only analysis)
+        advanced_dir: If given, write the raw JSON and flattened CSV here
+        subject_dir: If given, write the per-subject n-gram CSVs here
+        **engine_kwargs: Passed to NgramEngine
+
+    Returns:
+        The fitted NgramEngine
+    """
+    subjects = df[subject_column].tolist() if subject_column and subject_column in df.columns else None
+    engine = NgramEngine(**engine_kwargs).fit(
+        df[text_column].tolist(), df[label_column].tolist(), subjects
+    )
+    if advanced_dir is not None:
+        engine.save_outputs(advanced_dir, subject_dir)
+    return engine
@@ -0,0 +1,439 @@
+"""
+Vectorized real vs fake feature difference statistics.
+
+Replaces the per-column loops in `calculate_comprehensive_differences`,
+`calculate_feature_differences`, `calculate_comprehensive_feature_differences`
+and the notebooks' `cohens_d` helpers. All features are processed at once as
+columns of a single float matrix, so regenerating
+`comprehensive_feature_differences_*.csv` or `article_statistical_differences.csv`
+is a handful of NumPy/SciPy array operations.
+
+This module provides:
+- feature_differences: means, medians, Cohen's d, Welch/Student t, Mann-Whitney U
+  and KS statistics for every feature in one pass
+- Bootstrap confidence intervals for mean difference and Cohen's d, split across cores
+- Bonferroni, Holm and Benjamini-Hochberg corrections
+- article_statistical_differences: the column layout of the article notebook
+"""
+
+import os
+import logging
+from typing import List, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+from joblib import Parallel, delayed
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------
+# Multiple-comparison corrections
+# ----------------------------------------------------------------------
+
+def bonferroni(p_values: np.ndarray) -> np.ndarray:
+    """Bonferroni-adjusted p-values."""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    return np.minimum(p_values * np.sum(~np.isnan(p_values)), 1.0)
+
+
+def holm(p_values: np.ndarray) -> np.ndarray:
+    """Holm step-down adjusted p-values."""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    adjusted = np.full_like(p_values, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    m = len(valid)
+    if m == 0:
+        return adjusted
+    order = valid[np.argsort(p_values[valid])]
+    stepped = np.maximum.accumulate((m - np.arange(m)) * p_values[order])
+    adjusted[order] = np.minimum(stepped, 1.0)
+    return adjusted
+
+
+def fdr_bh(p_values: np.ndarray) -> np.ndarray:
+    """Benjamini-Hochberg FDR-adjusted p-values (same as statsmodels 'fdr_bh')."""
+    p_values = np.asarray(p_values, dtype=np.float64)
+    adjusted = np.full_like(p_values, np.nan)
+    valid = np.flatnonzero(~np.isnan(p_values))
+    m = len(valid)
+    if m == 0:
+        return adjusted
+    order = valid[np.argsort(p_values[valid])[::-1]]
+    scaled = p_values[order] * m / np.arange(m, 0, -1)
+    adjusted[order] = np.minimum(np.minimum.accumulate(scaled), 1.0)
+    return adjusted
+
+
+CORRECTIONS = {
+    'bonferroni': bonferroni,
+    'holm': holm,
+    'fdr_bh': fdr_bh,
+}
+
+
+# ----------------------------------------------------------------------
+# Column-wise statistics
+# ----------------------------------------------------------------------
+
+def cohens_d(
+    real: np.ndarray,
+    fake: np.ndarray,
+    pooled_std: str = 'weighted'
+) -> np.ndarray:
+    """
+    Cohen's d (fake - real) for every column of two NaN-padded matrices.
+
+    Args:
+        real: (n_real x n_features) array
+        fake: (n_fake x n_features) array
+        pooled_std: 'weighted' for the df-weighted pooled SD, 'average' for
+            sqrt((s1^2 + s2^2) / 2) as used in the tweet/article notebooks
+    """
+    real = np.atleast_2d(np.asarray(real, dtype=np.float64).T).T
+    fake = np.atleast_2d(np.asarray(fake, dtype=np.float64).T).T
+    n_real = np.sum(~np.isnan(real), axis=0)
+    n_fake = np.sum(~np.isnan(fake), axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_real = np.nanvar(real, axis=0, ddof=1)
+        var_fake = np.nanvar(fake, axis=0, ddof=1)
+        if pooled_std == 'weighted':
+            pooled = np.sqrt(((n_real - 1) * var_real + (n_fake - 1) * var_fake) / (n_real + n_fake - 2))
+        elif pooled_std == 'average':
+            pooled = np.sqrt((var_real + var_fake) / 2)
+        else:
+            raise ValueError(f"Unknown pooled_std: {pooled_std}")
+        d = (np.nanmean(fake, axis=0) - np.nanmean(real, axis=0)) / pooled
+    return np.where(pooled > 0, d, 0.0)
+
+
+def t_tests(real: np.ndarray, fake: np.ndarray, equal_var: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Column-wise two-sample t-test of real vs fake (Welch by default)."""
+    n_real = np.sum(~np.isnan(real), axis=0).astype(np.float64)
+    n_fake = np.sum(~np.isnan(fake), axis=0).astype(np.float64)
+    mean_diff = np.nanmean(real, axis=0) - np.nanmean(fake, axis=0)
+    var_real = np.nanvar(real, axis=0, ddof=1)
+    var_fake = np.nanvar(fake, axis=0, ddof=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if equal_var:
+            dof = n_real + n_fake - 2
+            pooled = ((n_real - 1) * var_real + (n_fake - 1) * var_fake) / dof
+            se = np.sqrt(pooled * (1 / n_real + 1 / n_fake))
+        else:
+            a, b = var_real / n_real, var_fake / n_fake
+            se = np.sqrt(a + b)
+            dof = (a + b) ** 2 / (a ** 2 / (n_real - 1) + b ** 2 / (n_fake - 1))
+        t_stat = mean_diff / se
+    p_value = 2 * stats.t.sf(np.abs(t_stat), dof)
+    return t_stat, p_value
+
+
+def mann_whitney(real: np.ndarray, fake: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Column-wise two-sided Mann-Whitney U (asymptotic, tie- and continuity-corrected).
+
+    Matches `scipy.stats.mannwhitneyu(real, fake, alternative='two-sided')` for
+    large samples. The statistic is U for the real sample.
+    """
+    combined = np.vstack([real, fake])
+    missing = np.isnan(combined)
+    # NaNs are ranked last as +inf so they never shift the ranks of observed values.
+    filled = np.where(missing, np.inf, combined)
+    ranks = stats.rankdata(filled, method='average', axis=0)
+    tie_sizes = stats.rankdata(filled, method='max', axis=0) - stats.rankdata(filled, method='min', axis=0) + 1
+    ranks[missing] = 0.0
+    tie_sizes[missing] = 1.0
+
+    n_real = np.sum(~np.isnan(real), axis=0).astype(np.float64)
+    n_fake = np.sum(~np.isnan(fake), axis=0).astype(np.float64)
+    n_total = n_real + n_fake
+
+    u_real = ranks[:len(real)].sum(axis=0) - n_real * (n_real + 1) / 2
+    u_max = np.maximum(u_real, n_real * n_fake - u_real)
+    tie_term = (tie_sizes ** 2 - 1).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.sqrt(n_real * n_fake / 12 * ((n_total + 1) - tie_term / (n_total * (n_total - 1))))
+        z = (u_max - n_real * n_fake / 2 - 0.5) / sigma
+    p_value = np.clip(2 * stats.norm.sf(z), 0, 1)
+    return u_real, p_value
+
+
+def ks_tests(real: np.ndarray, fake: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Column-wise two-sample Kolmogorov-Smirnov statistic and asymptotic p-value.
+
+    The empirical CDFs of both classes are evaluated on the jointly sorted column,
+    only at the last position of each run of tied values.
+    """
+    combined = np.vstack([real, fake])
+    is_real = np.concatenate([np.ones(len(real)), np.zeros(len(fake))])
+    order = np.argsort(combined, axis=0, kind='mergesort')  # NaNs sort last
+    sorted_values = np.take_along_axis(combined, order, axis=0)
+    sorted_real = is_real[order]
+    observed = ~np.isnan(sorted_values)
+
+    n_real = np.sum(~np.isnan(real), axis=0).astype(np.float64)
+    n_fake = np.sum(~np.isnan(fake), axis=0).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cdf_real = np.cumsum(sorted_real * observed, axis=0) / n_real
+        cdf_fake = np.cumsum((1 - sorted_real) * observed, axis=0) / n_fake
+
+    run_end = np.ones_like(observed)
+    run_end[:-1] = sorted_values[1:] != sorted_values[:-1]
+    valid = observed & run_end
+    d_stat = np.where(valid, np.abs(cdf_real - cdf_fake), 0.0).max(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        effective_n = np.round(n_real * n_fake / (n_real + n_fake))
+    p_value = np.clip(stats.kstwo.sf(d_stat, np.maximum(effective_n, 1)), 0, 1)
+    return d_stat, p_value
+
+
+# ----------------------------------------------------------------------
+# Bootstrap
+# ----------------------------------------------------------------------
+
+def _bootstrap_chunk(
+    real: np.ndarray,
+    fake: np.ndarray,
+    n_resamples: int,
+    seed: np.random.SeedSequence,
+    pooled_std: str
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Resample both classes `n_resamples` times; runs in a worker process."""
+    rng = np.random.default_rng(seed)
+    mean_diffs = np.empty((n_resamples, real.shape[1]))
+    effect_sizes = np.empty((n_resamples, real.shape[1]))
+    for b in range(n_resamples):
+        real_sample = real[rng.integers(0, len(real), len(real))]
+        fake_sample = fake[rng.integers(0, len(fake), len(fake))]
+        mean_diffs[b] = np.nanmean(fake_sample, axis=0) - np.nanmean(real_sample, axis=0)
+        effect_sizes[b] = cohens_d(real_sample, fake_sample, pooled_std)
+    return mean_diffs, effect_sizes
+
+
+def bootstrap_intervals(
+    real: np.ndarray,
+    fake: np.ndarray,
+    n_bootstrap: int = 1000,
+    confidence: float = 0.95,
+    n_jobs: int = -1,
+    random_state: int = 42,
+    pooled_std: str = 'weighted'
+) -> Dict[str, np.ndarray]:
+    """
+    Percentile bootstrap CIs for mean difference and Cohen's d of every feature.
+
+    Resamples are split into one chunk per worker; each chunk gets an independent
+    child seed, so results are reproducible for a fixed `random_state` and `n_jobs`.
+    """
+    n_workers = max(1, min(n_bootstrap, n_jobs if n_jobs > 0 else (os.cpu_count() or 1)))
+    chunk_sizes = np.diff(np.linspace(0, n_bootstrap, n_workers + 1).astype(int))
+    seeds = np.random.SeedSequence(random_state).spawn(n_workers)
+
+    chunks = Parallel(n_jobs=n_workers)(
+        delayed(_bootstrap_chunk)(real, fake, int(size), seed, pooled_std)
+        for size, seed in zip(chunk_sizes, seeds) if size > 0
+    )
+    mean_diffs = np.vstack([c[0] for c in chunks])
+    effect_sizes = np.vstack([c[1] for c in chunks])
+
+    alpha = (1 - confidence) / 2
+    quantiles = [alpha * 100, (1 - alpha) * 100]
+    md_low, md_high = np.nanpercentile(mean_diffs, quantiles, axis=0)
+    d_low, d_high = np.nanpercentile(effect_sizes, quantiles, axis=0)
+    return {
+        'mean_difference_ci_low': md_low,
+        'mean_difference_ci_high': md_high,
+        'cohens_d_ci_low': d_low,
+        'cohens_d_ci_high': d_high,
+    }
+
+
+# ----------------------------------------------------------------------
+# Public entry points
+# ----------------------------------------------------------------------
+
+def _split_classes(
+    df: pd.DataFrame,
+    feature_columns: Optional[Sequence[str]],
+    label_column: str,
+    real_label: str,
+    fake_label: str
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    if feature_columns is None:
+        feature_columns = [
+            col for col in df.select_dtypes(include=[np.number, bool]).columns
+            if col != label_column
+        ]
+    feature_columns = list(feature_columns)
+    values = df[feature_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+    labels = df[label_column].to_numpy()
+    return feature_columns, values[labels == real_label], values[labels == fake_label]
+
+
+def feature_differences(
+    df: pd.DataFrame,
+    feature_columns: Optional[Sequence[str]] = None,
+    label_column: str = 'label',
+    real_label: str = 'real',
+    fake_label: str = 'fake',
+    min_samples: int = 10,
+    pooled_std: str = 'weighted',
+    equal_var: bool = False,
+    n_bootstrap: int = 0,
+    confidence: float = 0.95,
+    correction: str = 'fdr_bh',
+    alpha: float = 0.05,
+    n_jobs: int = -1,
+    random_state: int = 42
+) -> pd.DataFrame:
+    """
+    Compute all real vs fake difference statistics for every feature at once.
+
+    Output columns match `comprehensive_feature_differences_*.csv`; corrected
+    p-values are added for the U and KS tests, and bootstrap CI columns when
+    `n_bootstrap > 0`.
+
+    Args:
+        df: Feature table with one row per document
+        feature_columns: Columns to test (defaults to all numeric columns)
+        label_column: Column containing class labels
+        real_label: Label value of the real class
+        fake_label: Label value of the fake class
+        min_samples: Features with fewer non-missing values per class are dropped
+        pooled_std: Cohen's d denominator, 'weighted' or 'average'
+        equal_var: Student's t-test if True, Welch's otherwise
+        n_bootstrap: Bootstrap resamples for CIs (0 disables)
+        confidence: CI coverage
+        correction: Method used for the `fdr_*` columns ('fdr_bh', 'holm', 'bonferroni')
+        alpha: Family-wise significance level
+        n_jobs: Worker processes for the bootstrap
+        random_state: Bootstrap seed
+
+    Returns:
+        DataFrame sorted by absolute Cohen's d
+    """
+    feature_columns, real, fake = _split_classes(df, feature_columns, label_column, real_label, fake_label)
+    if len(feature_columns) == 0:
+        return pd.DataFrame()
+
+    n_real = np.sum(~np.isnan(real), axis=0)
+    n_fake = np.sum(~np.isnan(fake), axis=0)
+    keep = (n_real > min_samples) & (n_fake > min_samples)
+    feature_columns = [col for col, k in zip(feature_columns, keep) if k]
+    real, fake = real[:, keep], fake[:, keep]
+    n_real, n_fake = n_real[keep], n_fake[keep]
+    if len(feature_columns) == 0:
+        return pd.DataFrame()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        real_mean = np.nanmean(real, axis=0)
+        fake_mean = np.nanmean(fake, axis=0)
+        real_median = np.nanmedian(real, axis=0)
+        fake_median = np.nanmedian(fake, axis=0)
+        percent_diff = np.where(real_mean != 0, (fake_mean - real_mean) / np.abs(real_mean) * 100, np.inf)
+
+    d = cohens_d(real, fake, pooled_std)
+    t_stat, t_p = t_tests(real, fake, equal_var)
+    u_stat, u_p = mann_whitney(real, fake)
+    ks_stat, ks_p = ks_tests(real, fake)
+
+    results = pd.DataFrame({
+        'feature': feature_columns,
+        'real_mean': real_mean,
+        'fake_mean': fake_mean,
+        'real_std': np.nanstd(real, axis=0, ddof=1),
+        'fake_std': np.nanstd(fake, axis=0, ddof=1),
+        'real_median': real_median,
+        'fake_median': fake_median,
+        'mean_difference': fake_mean - real_mean,
+        'median_difference': fake_median - real_median,
+        'percent_difference': percent_diff,
+        'cohens_d': d,
+        'abs_cohens_d': np.abs(d),
+        't_statistic': t_stat,
+        't_p_value': t_p,
+        'mannwhitney_u': u_stat,
+        'mannwhitney_p': u_p,
+        'ks_statistic': ks_stat,
+        'ks_p_value': ks_p,
+        'small_effect': np.abs(d) > 0.2,
+        'medium_effect': np.abs(d) > 0.5,
+        'large_effect': np.abs(d) > 0.8,
+        'real_n': n_real,
+        'fake_n': n_fake,
+    })
+
+    if correction not in CORRECTIONS:
+        raise ValueError(f"Unknown correction: {correction}. Use one of {list(CORRECTIONS)}")
+    correct = CORRECTIONS[correction]
+    results['bonferroni_significant'] = t_p < alpha / len(results)
+    results['fdr_p_value'] = correct(t_p)
+    results['fdr_significant'] = results['fdr_p_value'] < alpha
+    results['mannwhitney_fdr_p'] = correct(u_p)
+    results['ks_fdr_p'] = correct(ks_p)
+
+    if n_bootstrap > 0:
+        intervals = bootstrap_intervals(
+            real, fake, n_bootstrap, confidence, n_jobs, random_state, pooled_std
+        )
+        for column, values in intervals.items():
+            results[column] = values
+
+    return results.sort_values('abs_cohens_d', ascending=False).reset_index(drop=True)
+
+
+def effect_size_category(d: np.ndarray) -> np.ndarray:
+    """Label absolute effect sizes as Large/Medium/Small/Negligible."""
+    d = np.abs(np.asarray(d))
+    return np.select([d > 0.8, d > 0.5, d > 0.2], ['Large', 'Medium', 'Small'], 'Negligible')
+
+
+def article_statistical_differences(
+    df: pd.DataFrame,
+    feature_columns: Optional[Sequence[str]] = None,
+    label_column: str = 'label',
+    **kwargs
+) -> pd.DataFrame:
+    """
+    `article_statistical_differences.csv` layout from the vectorized engine.
+
+    Uses the article notebook's conventions: averaged-variance Cohen's d,
+    Student's t-test and the fixed p < 0.001 significance cut-off.
+    """
+    results = feature_differences(
+        df, feature_columns, label_column,
+        min_samples=0, pooled_std='average', equal_var=True, **kwargs
+    )
+    if results.empty:
+        return results
+
+    article = pd.DataFrame({
+        'feature': results['feature'],
+        'real_mean': results['real_mean'],
+        'fake_mean': results['fake_mean'],
+        'real_std': results['real_std'],
+        'fake_std': results['fake_std'],
+        'real_median': results['real_median'],
+        'fake_median': results['fake_median'],
+        'mean_difference': results['mean_difference'],
+        'percent_difference': np.where(
+            results['real_mean'] != 0,
+            results['mean_difference'] / results['real_mean'] * 100, 0
+        ),
+        'cohens_d': results['cohens_d'],
+        'abs_cohens_d': results['abs_cohens_d'],
+        't_statistic': results['t_statistic'],
+        'p_value': results['t_p_value'],
+        'u_statistic': results['mannwhitney_u'],
+        'u_p_value': results['mannwhitney_p'],
+        'significant_t': results['t_p_value'] < 0.001,
+        'significant_u': results['mannwhitney_p'] < 0.001,
+        'effect_size_category': effect_size_category(results['cohens_d']),
+    })
+    for column in [c for c in results.columns if c.endswith(('_ci_low', '_ci_high'))]:
+        article[column] = results[column]
+    return article
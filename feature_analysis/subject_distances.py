@@ -0,0 +1,301 @@
+"""
+Pairwise distances between subject (or source) partitions.
+
+`cross_subject_comparison_matrix.csv` and `find_consistent_patterns` are built
+with nested loops over subjects and per-subject dictionaries. This module
+aggregates feature, n-gram and topic data into one row per partition with sparse
+group-by products and computes all-pairs distances with matrix operations, so it
+scales to hundreds of partitions (e.g. per-site slices of FakeNewsNet).
+
+This module provides:
+- SubjectDistanceEngine: per-partition profiles and all-pairs distance matrices
+- jensen_shannon_matrix / cosine_matrix / effect_size_matrix
+- consistent_patterns: vectorized replacement for `find_consistent_patterns`
+- comparison_summary: the `cross_subject_comparison_matrix.csv` layout
+"""
+
+import logging
+from typing import List, Dict, Any, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from ngram_engine import group_indicator
+from stat_differences import feature_differences
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------
+# Distance kernels
+# ----------------------------------------------------------------------
+
+def _as_distributions(matrix) -> np.ndarray:
+    """Row-normalize a dense or sparse non-negative matrix into probability rows."""
+    if sparse.issparse(matrix):
+        matrix = matrix.toarray()
+    matrix = np.asarray(matrix, dtype=np.float64)
+    totals = matrix.sum(axis=1, keepdims=True)
+    totals[totals == 0] = 1.0
+    return matrix / totals
+
+
+def jensen_shannon_matrix(distributions, max_block_elements: int = 20_000_000) -> np.ndarray:
+    """
+    All-pairs Jensen-Shannon distance (base 2, in [0, 1]) between rows.
+
+    Pairs are evaluated in row blocks with broadcasting; the block size is chosen
+    so that no intermediate array exceeds `max_block_elements` entries.
+    """
+    p = _as_distributions(distributions)
+    n_rows, n_terms = p.shape
+    # Drop columns that are zero everywhere; they contribute nothing.
+    p = p[:, p.sum(axis=0) > 0]
+    n_terms = p.shape[1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_log_p = np.where(p > 0, p * np.log2(p), 0.0)
+    entropy = -p_log_p.sum(axis=1)
+
+    divergence = np.zeros((n_rows, n_rows))
+    block = max(1, max_block_elements // max(1, n_rows * n_terms))
+    for start in range(0, n_rows, block):
+        stop = min(start + block, n_rows)
+        mixture = (p[start:stop, None, :] + p[None, :, :]) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mixture_entropy = -np.where(mixture > 0, mixture * np.log2(mixture), 0.0).sum(axis=2)
+        divergence[start:stop] = mixture_entropy - (entropy[start:stop, None] + entropy[None, :]) / 2
+    np.fill_diagonal(divergence, 0.0)
+    return np.sqrt(np.clip(divergence, 0.0, 1.0))
+
+
+def cosine_matrix(matrix) -> np.ndarray:
+    """All-pairs cosine distance between rows of a dense or sparse matrix."""
+    if sparse.issparse(matrix):
+        matrix = sparse.csr_matrix(matrix, dtype=np.float64)
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        normalized = sparse.diags(1.0 / norms) @ matrix
+        similarity = (normalized @ normalized.T).toarray()
+    else:
+        matrix = np.asarray(matrix, dtype=np.float64)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        normalized = matrix / norms
+        similarity = normalized @ normalized.T
+    distance = 1.0 - np.clip(similarity, -1.0, 1.0)
+    np.fill_diagonal(distance, 0.0)
+    return distance
+
+
+def effect_size_matrix(means: np.ndarray, variances: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    All-pairs root-mean-square Cohen's d across features.
+
+    Args:
+        means: (n_partitions x n_features) feature means
+        variances: (n_partitions x n_features) feature variances (ddof=1)
+        counts: (n_partitions x n_features) non-missing counts
+
+    Returns:
+        (n_partitions x n_partitions) distance matrix
+    """
+    n_i = counts[:, None, :]
+    n_j = counts[None, :, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pooled = np.sqrt(((n_i - 1) * variances[:, None, :] + (n_j - 1) * variances[None, :, :])
+                         / (n_i + n_j - 2))
+        d = (means[:, None, :] - means[None, :, :]) / pooled
+    d = np.where(np.isfinite(d), d, 0.0)
+    return np.sqrt(np.mean(d ** 2, axis=2))
+
+
+def square_frame(matrix: np.ndarray, names: Sequence[str]) -> pd.DataFrame:
+    """Wrap a square matrix in a DataFrame indexed by partition names."""
+    return pd.DataFrame(matrix, index=list(names), columns=list(names))
+
+
+# ----------------------------------------------------------------------
+# Engine
+# ----------------------------------------------------------------------
+
+class SubjectDistanceEngine:
+    """
+    Build per-partition profiles once and compare every pair of partitions.
+
+    Partitions are arbitrary string keys per document (subject, source site,
+    subject x label, ...). Each data block is aggregated with a single sparse
+    indicator product.
+    """
+
+    def __init__(self, partitions: Sequence[Any]):
+        names, codes = np.unique(np.asarray([str(p) for p in partitions]), return_inverse=True)
+        self.names: List[str] = list(names)
+        self.codes = codes.astype(np.int32)
+        self.indicator = group_indicator(self.codes, len(self.names))
+        self.sizes = np.bincount(self.codes, minlength=len(self.names))
+
+        self.feature_columns: List[str] = []
+        self.feature_means: Optional[np.ndarray] = None
+        self.feature_variances: Optional[np.ndarray] = None
+        self.feature_counts: Optional[np.ndarray] = None
+        self.ngram_profiles = None
+        self.topic_profiles: Optional[np.ndarray] = None
+
+    def add_features(self, features: pd.DataFrame, feature_columns: Optional[Sequence[str]] = None):
+        """Aggregate per-partition means and variances of numeric feature columns."""
+        if feature_columns is None:
+            feature_columns = list(features.select_dtypes(include=[np.number, bool]).columns)
+        self.feature_columns = list(feature_columns)
+        values = features[self.feature_columns].to_numpy(dtype=np.float64, na_value=np.nan)
+        observed = ~np.isnan(values)
+        filled = np.where(observed, values, 0.0)
+
+        counts = self.indicator @ observed.astype(np.float64)
+        sums = self.indicator @ filled
+        squares = self.indicator @ (filled ** 2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means = sums / counts
+            variances = (squares - counts * means ** 2) / (counts - 1)
+        self.feature_counts = counts
+        self.feature_means = means
+        self.feature_variances = np.clip(variances, 0.0, None)
+        return self
+
+    def add_ngrams(self, doc_term_matrix):
+        """Aggregate a (sparse) document-term matrix into per-partition term counts."""
+        self.ngram_profiles = (self.indicator @ sparse.csr_matrix(doc_term_matrix)).tocsr()
+        return self
+
+    def add_topics(self, topic_distributions: np.ndarray):
+        """Aggregate per-document topic distributions into per-partition mean mixtures."""
+        sums = self.indicator @ np.asarray(topic_distributions, dtype=np.float64)
+        self.topic_profiles = sums / np.maximum(self.sizes[:, None], 1)
+        return self
+
+    def distance_matrices(self) -> Dict[str, pd.DataFrame]:
+        """
+        Compute every available all-pairs distance.
+
+        Returns:
+            Dictionary of square DataFrames keyed by metric name
+        """
+        matrices = {}
+        if self.feature_means is not None:
+            matrices['feature_effect_size'] = effect_size_matrix(
+                self.feature_means, self.feature_variances, self.feature_counts
+            )
+            standardized = (self.feature_means - np.nanmean(self.feature_means, axis=0)) \
+                / (np.nanstd(self.feature_means, axis=0) + 1e-12)
+            matrices['feature_cosine'] = cosine_matrix(np.nan_to_num(standardized))
+        if self.ngram_profiles is not None:
+            matrices['ngram_jensen_shannon'] = jensen_shannon_matrix(self.ngram_profiles)
+            matrices['ngram_cosine'] = cosine_matrix(self.ngram_profiles)
+        if self.topic_profiles is not None:
+            matrices['topic_jensen_shannon'] = jensen_shannon_matrix(self.topic_profiles)
+            matrices['topic_cosine'] = cosine_matrix(self.topic_profiles)
+        return {name: square_frame(matrix, self.names) for name, matrix in matrices.items()}
+
+    def pairwise_table(self) -> pd.DataFrame:
+        """Long-format table with one row per unordered partition pair and a column per metric."""
+        matrices = self.distance_matrices()
+        rows, cols = np.triu_indices(len(self.names), k=1)
+        table = pd.DataFrame({
+            'partition_a': np.asarray(self.names)[rows],
+            'partition_b': np.asarray(self.names)[cols],
+            'n_a': self.sizes[rows],
+            'n_b': self.sizes[cols],
+        })
+        for name, frame in matrices.items():
+            table[name] = frame.to_numpy()[rows, cols]
+        return table
+
+
+# ----------------------------------------------------------------------
+# Cross-subject summaries
+# ----------------------------------------------------------------------
+
+def consistent_patterns(
+    ngram_results: Dict[str, Dict[str, List[Dict[str, Any]]]],
+    ngram_type: str = 'unigrams',
+    top_n: int = 20,
+    min_subjects: int = 2
+) -> pd.DataFrame:
+    """
+    N-grams that lean the same way (fake or real) in at least `min_subjects` subjects.
+
+    Vectorized replacement for the notebook's `find_consistent_patterns`: takes the
+    `ngram_results_raw.json` structure, keeps the top `top_n` rows per subject and
+    aggregates with a single group-by.
+
+    Returns:
+        DataFrame with ngram, direction, count, avg_diff, avg_ratio, subjects
+    """
+    frames = []
+    for subject, results in ngram_results.items():
+        rows = pd.DataFrame(results.get(ngram_type, [])[:top_n])
+        if not rows.empty:
+            rows['subject'] = subject
+            frames.append(rows)
+    if not frames:
+        return pd.DataFrame(columns=['ngram', 'direction', 'count', 'avg_diff', 'avg_ratio', 'subjects'])
+
+    table = pd.concat(frames, ignore_index=True)
+    table = table[table['diff'] != 0]
+    table['direction'] = np.where(table['diff'] > 0, 'fake', 'real')
+    table['abs_diff'] = table['diff'].abs()
+    with np.errstate(divide='ignore'):
+        table['directed_ratio'] = np.where(
+            table['diff'] > 0, table['ratio'],
+            np.where(table['ratio'] > 0, 1 / table['ratio'], 0)
+        )
+
+    grouped = table.groupby(['ngram', 'direction']).agg(
+        count=('subject', 'size'),
+        avg_diff=('abs_diff', 'mean'),
+        avg_ratio=('directed_ratio', 'mean'),
+        subjects=('subject', list)
+    ).reset_index()
+    grouped = grouped[grouped['count'] >= min_subjects]
+    return grouped.sort_values(['count', 'avg_diff'], ascending=False).reset_index(drop=True)
+
+
+def comparison_summary(
+    df: pd.DataFrame,
+    feature_columns: Sequence[str],
+    category_column: str = 'category',
+    subject_column: str = 'subject',
+    label_column: str = 'label',
+    **difference_kwargs
+) -> pd.DataFrame:
+    """
+    Rebuild `cross_subject_comparison_matrix.csv`: one row per category with
+    counts, significant/large/medium effect totals and the top feature.
+
+    Each category is one call to the vectorized `feature_differences`.
+    """
+    rows = []
+    for category, group in df.groupby(category_column, sort=True):
+        n_real = int((group[label_column] == 'real').sum())
+        n_fake = int((group[label_column] == 'fake').sum())
+        if n_real == 0 or n_fake == 0:
+            continue
+        differences = feature_differences(group, feature_columns, label_column, **difference_kwargs)
+        if differences.empty:
+            continue
+        top = differences.iloc[0]
+        rows.append({
+            'category': category,
+            'n_real': n_real,
+            'n_fake': n_fake,
+            'n_significant': int(differences['fdr_significant'].sum()),
+            'n_large_effect': int(differences['large_effect'].sum()),
+            'n_medium_effect': int((differences['medium_effect'] & ~differences['large_effect']).sum()),
+            'avg_effect_size': float(differences['abs_cohens_d'].mean()),
+            'top_feature': top['feature'],
+            'top_effect': float(top['cohens_d']),
+            'real_subjects': ', '.join(map(str, group.loc[group[label_column] == 'real', subject_column].unique())),
+            'fake_subjects': ', '.join(map(str, group.loc[group[label_column] == 'fake', subject_column].unique())),
+        })
+    return pd.DataFrame(rows)
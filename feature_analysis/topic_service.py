@@ -0,0 +1,369 @@
+"""
+Online topic modeling service shared across subjects and classes.
+
+`CrossSubjectTopicAnalyzer.extract_topics_for_subject` and `perform_topic_modeling`
+refit a vectorizer and a batch LDA for every subject/class, which forces the
+notebooks to subsample via `n_samples_per_category`. This service vectorizes the
+corpus once (optionally cached on disk), fits one online LDA per
+(subject, class) cell in parallel, and keeps the fitted models so new documents,
+e.g. a fresh batch of synthetic articles, can be scored or folded in with
+`partial_fit` instead of refitting.
+
+This module provides:
+- TopicModelService: shared doc-term matrix + per-cell online LDA models
+- Scoring and warm-started updates for new batches
+- Export of `topic_results_raw.json` and `topic_modeling_results.csv`
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from joblib import Parallel, delayed
+from sklearn.decomposition import LatentDirichletAllocation
+from sklearn.feature_extraction.text import CountVectorizer
+
+logger = logging.getLogger(__name__)
+
+LABEL_PREFIXES = {'real': 'REAL', 'fake': 'FAKE'}
+ALL_LABELS = '__all__'
+
+
+def preprocess_for_topics(text: Any) -> str:
+    """Clean text the same way as `CrossSubjectTopicAnalyzer.preprocess_for_topics`."""
+    if text is None or (isinstance(text, float) and np.isnan(text)):
+        return ""
+    text = str(text).lower()
+    text = re.sub(r'http[s]?://\S+', '', text)
+    text = re.sub(r'\S+@\S+', '', text)
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def corpus_fingerprint(texts: Sequence[str], params: Dict[str, Any]) -> str:
+    """Stable hash of the corpus and vectorizer parameters, used as the cache key."""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()[:16]
+
+
+def _fit_online_lda(
+    matrix: sparse.csr_matrix,
+    n_topics: int,
+    batch_size: int,
+    max_iter: int,
+    random_state: int
+) -> LatentDirichletAllocation:
+    """Fit one online LDA model; module-level so it can run in worker processes."""
+    model = LatentDirichletAllocation(
+        n_components=n_topics,
+        learning_method='online',
+        batch_size=batch_size,
+        total_samples=matrix.shape[0],
+        max_iter=max_iter,
+        random_state=random_state,
+        n_jobs=1
+    )
+    model.fit(matrix)
+    return model
+
+
+class TopicModelService:
+    """
+    Fit, cache and reuse topic models for every subject/class cell.
+
+    The vocabulary is fixed after `fit`, so every cell model shares the same term
+    space and new documents are scored with a plain `transform` of the cached
+    vectorizer.
+    """
+
+    def __init__(
+        self,
+        n_topics: int = 8,
+        max_features: int = 1000,
+        ngram_range: Tuple[int, int] = (1, 2),
+        min_df: int = 2,
+        max_df: float = 0.8,
+        token_pattern: str = r'\b[a-zA-Z]{3,}\b',
+        batch_size: int = 256,
+        max_iter: int = 10,
+        n_jobs: int = -1,
+        cache_dir: Optional[str] = None,
+        random_state: int = 42
+    ):
+        self.n_topics = n_topics
+        self.batch_size = batch_size
+        self.max_iter = max_iter
+        self.n_jobs = n_jobs
+        self.cache_dir = cache_dir
+        self.random_state = random_state
+        self.vectorizer_params = {
+            'max_features': max_features,
+            'ngram_range': ngram_range,
+            'min_df': min_df,
+            'max_df': max_df,
+            'token_pattern': token_pattern,
+            'stop_words': 'english',
+            'lowercase': True,
+        }
+        self.vectorizer = CountVectorizer(**self.vectorizer_params)
+
+        self.doc_term_matrix: Optional[sparse.csr_matrix] = None
+        self.feature_names: Optional[np.ndarray] = None
+        self.labels: Optional[np.ndarray] = None
+        self.subjects: Optional[np.ndarray] = None
+        self.models: Dict[Tuple[str, str], LatentDirichletAllocation] = {}
+        self.cell_sizes: Dict[Tuple[str, str], int] = {}
+
+    # ------------------------------------------------------------------
+    # Shared document-term matrix
+    # ------------------------------------------------------------------
+
+    def _cache_paths(self, key: str) -> Tuple[str, str]:
+        return (os.path.join(self.cache_dir, f'topic_dtm_{key}.npz'),
+                os.path.join(self.cache_dir, f'topic_vocab_{key}.json'))
+
+    def build_matrix(self, texts: Sequence[Any]) -> sparse.csr_matrix:
+        """
+        Vectorize the corpus once, loading it from the cache when available.
+
+        Returns:
+            CSR document-term count matrix
+        """
+        docs = [preprocess_for_topics(t) for t in texts]
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            key = corpus_fingerprint(docs, self.vectorizer_params)
+            matrix_path, vocab_path = self._cache_paths(key)
+            if os.path.exists(matrix_path) and os.path.exists(vocab_path):
+                with open(vocab_path, 'r') as f:
+                    vocabulary = json.load(f)
+                self.vectorizer = CountVectorizer(**{**self.vectorizer_params, 'vocabulary': vocabulary})
+                self.vectorizer.fit([])  # validates the fixed vocabulary without tokenizing
+                self.doc_term_matrix = sparse.load_npz(matrix_path).tocsr()
+                self.feature_names = self.vectorizer.get_feature_names_out()
+                logger.info(f"Loaded cached topic matrix {key} ({self.doc_term_matrix.shape})")
+                return self.doc_term_matrix
+
+        self.doc_term_matrix = self.vectorizer.fit_transform(docs).tocsr()
+        self.feature_names = self.vectorizer.get_feature_names_out()
+
+        if self.cache_dir:
+            sparse.save_npz(matrix_path, self.doc_term_matrix)
+            with open(vocab_path, 'w') as f:
+                json.dump({term: int(idx) for term, idx in self.vectorizer.vocabulary_.items()}, f)
+        return self.doc_term_matrix
+
+    # ------------------------------------------------------------------
+    # Fitting
+    # ------------------------------------------------------------------
+
+    def fit(
+        self,
+        texts: Sequence[Any],
+        labels: Sequence[Any],
+        subjects: Optional[Sequence[Any]] = None,
+        include_comparison: bool = True,
+        min_docs: int = 10
+    ) -> 'TopicModelService':
+        """
+        Fit one online LDA per (subject, label) cell in parallel.
+
+        Args:
+            texts: Raw documents (the full corpus, no subsampling needed)
+            labels: 'real'/'fake' label per document
+            subjects: Optional subject per document; all documents share one subject if None
+            include_comparison: Also fit a subject-wide model used to compare class weights
+            min_docs: Cells with fewer documents are skipped
+        """
+        self.build_matrix(texts)
+        self.labels = np.asarray([str(label) for label in labels])
+        self.subjects = np.asarray([str(s) for s in subjects]) if subjects is not None \
+            else np.full(len(self.labels), 'all')
+
+        cells = []
+        for subject in map(str, pd.unique(self.subjects)):
+            in_subject = self.subjects == subject
+            for label in LABEL_PREFIXES:
+                rows = np.flatnonzero(in_subject & (self.labels == label))
+                if len(rows) >= min_docs:
+                    cells.append(((subject, label), rows))
+            if include_comparison and in_subject.sum() >= min_docs:
+                cells.append(((subject, ALL_LABELS), np.flatnonzero(in_subject)))
+
+        logger.info(f"Fitting {len(cells)} topic models on {self.doc_term_matrix.shape[0]:,} documents")
+        models = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fit_online_lda)(
+                self.doc_term_matrix[rows],
+                max(1, min(self.n_topics, len(rows) // 2)),
+                self.batch_size,
+                self.max_iter,
+                self.random_state
+            )
+            for _, rows in cells
+        )
+        for (key, rows), model in zip(cells, models):
+            self.models[key] = model
+            self.cell_sizes[key] = len(rows)
+        return self
+
+    # ------------------------------------------------------------------
+    # Scoring and warm-started updates
+    # ------------------------------------------------------------------
+
+    def _get_model(self, subject: str, label: str) -> LatentDirichletAllocation:
+        key = (subject, label)
+        if key not in self.models:
+            raise KeyError(f"No topic model fitted for subject={subject!r}, label={label!r}")
+        return self.models[key]
+
+    def transform_texts(self, texts: Sequence[Any]) -> sparse.csr_matrix:
+        """Vectorize new documents in the fixed shared vocabulary."""
+        if self.feature_names is None:
+            raise RuntimeError("TopicModelService must be fitted first")
+        return self.vectorizer.transform([preprocess_for_topics(t) for t in texts])
+
+    def score_batch(self, texts: Sequence[Any], subject: str, label: str = 'fake') -> Dict[str, Any]:
+        """
+        Score new documents against existing topics without refitting.
+
+        Returns:
+            Dictionary with per-document topic distributions, the mean topic
+            weights, and the model's approximate perplexity on the batch
+        """
+        model = self._get_model(subject, label)
+        matrix = self.transform_texts(texts)
+        distributions = model.transform(matrix)
+        return {
+            'topic_distributions': distributions,
+            'mean_topic_weights': distributions.mean(axis=0),
+            'perplexity': float(model.perplexity(matrix)),
+            'n_texts': matrix.shape[0]
+        }
+
+    def update(self, texts: Sequence[Any], subject: str, label: str = 'fake') -> LatentDirichletAllocation:
+        """Fold new documents into an existing cell model with online mini-batch updates."""
+        model = self._get_model(subject, label)
+        matrix = self.transform_texts(texts)
+        self.cell_sizes[(subject, label)] += matrix.shape[0]
+        model.total_samples = self.cell_sizes[(subject, label)]
+        for start in range(0, matrix.shape[0], self.batch_size):
+            model.partial_fit(matrix[start:start + self.batch_size])
+        return model
+
+    # ------------------------------------------------------------------
+    # Results
+    # ------------------------------------------------------------------
+
+    def topic_words(self, subject: str, label: str, n_words: int = 8) -> List[Dict[str, Any]]:
+        """Top words per topic in the same shape as `extract_topic_words`."""
+        model = self._get_model(subject, label)
+        prefix = LABEL_PREFIXES.get(label, 'CMP')
+        order = np.argsort(model.components_, axis=1)[:, ::-1][:, :n_words]
+        topics = []
+        for topic_idx, indices in enumerate(order):
+            weights = model.components_[topic_idx, indices]
+            topics.append({
+                'topic_id': f"{prefix}_T{topic_idx+1}",
+                'words': self.feature_names[indices].tolist(),
+                'weights': weights.tolist(),
+                'coherence_score': float(np.mean(weights))
+            })
+        return topics
+
+    def compare_topics(self, subject: str, n_words: int = 8) -> List[Dict[str, Any]]:
+        """Compare real vs fake mean weights on the subject-wide model."""
+        if (subject, ALL_LABELS) not in self.models:
+            return []
+        model = self.models[(subject, ALL_LABELS)]
+        in_subject = self.subjects == subject
+        real_rows = np.flatnonzero(in_subject & (self.labels == 'real'))
+        fake_rows = np.flatnonzero(in_subject & (self.labels == 'fake'))
+        if len(real_rows) == 0 or len(fake_rows) == 0:
+            return []
+
+        real_weights = model.transform(self.doc_term_matrix[real_rows]).mean(axis=0)
+        fake_weights = model.transform(self.doc_term_matrix[fake_rows]).mean(axis=0)
+        differences = fake_weights - real_weights
+        comparison = [
+            {
+                'topic_id': topic['topic_id'],
+                'words': topic['words'],
+                'real_weight': float(real_weights[i]),
+                'fake_weight': float(fake_weights[i]),
+                'difference': float(differences[i]),
+                'abs_difference': float(abs(differences[i]))
+            }
+            for i, topic in enumerate(self.topic_words(subject, ALL_LABELS, n_words))
+        ]
+        comparison.sort(key=lambda x: x['abs_difference'], reverse=True)
+        return comparison
+
+    def to_raw_results(self, n_words: int = 8) -> Dict[str, Dict[str, Any]]:
+        """Build the `topic_results_raw.json` structure for every fitted subject."""
+        results = {}
+        for subject in map(str, pd.unique(self.subjects)):
+            if (subject, 'real') not in self.models or (subject, 'fake') not in self.models:
+                continue
+            in_subject = self.subjects == subject
+            subject_results = {}
+            for label in LABEL_PREFIXES:
+                rows = np.flatnonzero(in_subject & (self.labels == label))
+                subject_results[f'{label}_topics'] = self.topic_words(subject, label, n_words)
+                subject_results[f'{label}_topic_weights'] = \
+                    self.models[(subject, label)].transform(self.doc_term_matrix[rows]).mean(axis=0).tolist()
+                subject_results[f'n_{label}_texts'] = int(len(rows))
+            subject_results['topic_comparison'] = self.compare_topics(subject, n_words)
+            results[subject] = subject_results
+        return results
+
+    def save_outputs(self, output_dir: str, n_words: int = 8) -> List[str]:
+        """
+        Write `topic_results_raw.json` and the flattened `topic_modeling_results.csv`.
+
+        Returns:
+            List of written file paths
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        raw_results = self.to_raw_results(n_words)
+
+        raw_path = os.path.join(output_dir, 'topic_results_raw.json')
+        with open(raw_path, 'w') as f:
+            json.dump(raw_results, f, indent=2, default=float)
+
+        topic_data = []
+        for subject, results in raw_results.items():
+            for label in LABEL_PREFIXES:
+                for topic in results[f'{label}_topics']:
+                    topic_data.append({
+                        'subject': subject,
+                        'topic_type': label,
+                        'topic_id': topic['topic_id'],
+                        'top_words': ', '.join(topic['words']),
+                        'coherence_score': topic['coherence_score'],
+                        'n_articles': results[f'n_{label}_texts']
+                    })
+            for topic in results['topic_comparison']:
+                topic_data.append({
+                    'subject': subject,
+                    'topic_type': 'comparative',
+                    'topic_id': topic['topic_id'],
+                    'top_words': ', '.join(topic['words']),
+                    'coherence_score': None,
+                    'real_weight': topic['real_weight'],
+                    'fake_weight': topic['fake_weight'],
+                    'difference': topic['difference'],
+                    'pattern': 'FAKE' if topic['difference'] > 0 else 'REAL'
+                })
+        csv_path = os.path.join(output_dir, 'topic_modeling_results.csv')
+        pd.DataFrame(topic_data).to_csv(csv_path, index=False)
+        return [raw_path, csv_path]
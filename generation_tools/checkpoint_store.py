@@ -0,0 +1,339 @@
+"""
+Log-structured checkpoint store for generation sessions.
+
+The notebooks and `utils.save_batch_progress` each checkpoint by dumping the
+whole session state with `json.dump(..., indent=2)` on every save, so saving
+batch k rewrites everything generated in batches 1..k. Here a session is a
+directory holding
+
+    snapshot.json   full state as of sequence number `seq` (atomic replace)
+    log.jsonl       one compact JSON record per save since that snapshot
+
+A save appends only what changed: new list items (`extend`), changed mapping
+keys (`update`) and replaced scalars (`set`). Once the log grows past a
+fraction of the snapshot size it is compacted into a new snapshot, so the
+amortized save cost stays proportional to the new work. Records are flushed
+and fsynced before `commit` returns; a torn last line left by a crash is
+dropped on load and records already folded into the snapshot are skipped,
+so a session always reloads to the last completed save.
+
+This module provides:
+- CheckpointStore: delta-logged, snapshot-compacted state of one session
+- list_sessions: sessions under a checkpoint directory, newest first
+- latest_session: the most recently saved session
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime, date
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = 'snapshot.json'
+LOG_FILE = 'log.jsonl'
+
+
+def _json_default(value: Any) -> Any:
+    """JSON fallback for datetimes, numpy scalars/arrays and paths."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default, ensure_ascii=False, separators=(',', ':'))
+
+
+def _normalize(value: Any) -> Any:
+    """`value` as it reads back from JSON (tuples -> lists, datetimes -> strings, ...)."""
+    return json.loads(_dumps(value))
+
+
+def _same_prefix(value: Sequence[Any], stored: List[Any]) -> bool:
+    """Whether `value` starts with the (JSON-normalized) `stored` items."""
+    prefix = list(value[:len(stored)])
+    # Plain equality is a C-level scan; normalize only when types differ (tuples, datetimes, ...)
+    return prefix == stored or _normalize(prefix) == stored
+
+
+def _fsync_dir(directory: str):
+    """Persist a rename in `directory` (no-op where directories cannot be opened)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _atomic_write(path: str, text: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    _fsync_dir(os.path.dirname(path) or '.')
+
+
+class CheckpointStore:
+    """
+    Delta-logged checkpoint of one session's state (a JSON-serializable dict).
+
+    Callers either describe the delta themselves with `commit(set=..., extend=...,
+    update=...)` or pass the full state to `save(state)`, which logs only the
+    difference from the last save: lists that grew by appending log their new
+    tail, dicts log their changed keys, everything else that changed is set.
+
+    Args:
+        directory: Session directory (created if missing)
+        compact_ratio: Compact once the log exceeds this fraction of the snapshot size
+        min_compact_bytes: Never compact a log smaller than this
+        fsync: fsync every append (disable only for throwaway runs)
+
+    Example:
+        store = CheckpointStore('checkpoints/generation_20251027_062923')
+        state = store.load()                       # {} for a new session
+        store.commit(extend={'headlines': batch}, update={'domain_progress': {'politics': 120}},
+                     set={'batch_count': 12})
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        compact_ratio: float = 0.5,
+        min_compact_bytes: int = 1 << 20,
+        fsync: bool = True
+    ):
+        self.directory = directory
+        self.compact_ratio = compact_ratio
+        self.min_compact_bytes = min_compact_bytes
+        self.fsync = fsync
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self.log_path = os.path.join(directory, LOG_FILE)
+        os.makedirs(directory, exist_ok=True)
+
+        self.state: Dict[str, Any] = {}
+        self.seq = 0
+        self.snapshot_seq = 0
+        self.snapshot_bytes = 0
+        self.log_bytes = 0
+        self.stats = {'commits': 0, 'bytes_written': 0, 'compactions': 0, 'dropped_records': 0}
+        self._log = None
+        self._loaded = False
+
+    @property
+    def session_id(self) -> str:
+        return os.path.basename(os.path.normpath(self.directory))
+
+    def exists(self) -> bool:
+        return os.path.exists(self.snapshot_path) or os.path.exists(self.log_path)
+
+    # ------------------------------------------------------------------ loading
+
+    def load(self) -> Dict[str, Any]:
+        """Rebuild the state from the snapshot plus the log (empty dict for a new session)."""
+        self.state, self.seq, self.snapshot_seq, self.snapshot_bytes = {}, 0, 0, 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+            self.state = snapshot.get('state', {})
+            self.seq = self.snapshot_seq = snapshot.get('seq', 0)
+            self.snapshot_bytes = os.path.getsize(self.snapshot_path)
+
+        valid_bytes = 0
+        if os.path.exists(self.log_path):
+            with open(self.log_path, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # torn write from a crash: everything after it is unusable
+                    if not line.endswith(b'\n'):
+                        break
+                    valid_bytes += len(line)
+                    if record['seq'] <= self.seq:
+                        continue  # already folded into the snapshot
+                    self._apply(record)
+                    self.seq = record['seq']
+            size = os.path.getsize(self.log_path)
+            if size > valid_bytes:
+                logger.warning(f"Dropping {size - valid_bytes} bytes of incomplete checkpoint log in {self.directory}")
+                self.stats['dropped_records'] += 1
+                with open(self.log_path, 'r+b') as f:
+                    f.truncate(valid_bytes)
+        self.log_bytes = valid_bytes
+        self._loaded = True
+        return self.state
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _apply(self, record: Dict[str, Any]):
+        for key, value in record.get('set', {}).items():
+            self.state[key] = value
+        for key, items in record.get('extend', {}).items():
+            self.state.setdefault(key, []).extend(items)
+        for key, changes in record.get('update', {}).items():
+            self.state.setdefault(key, {}).update(changes)
+        for key in record.get('delete', []):
+            self.state.pop(key, None)
+
+    # ------------------------------------------------------------------ saving
+
+    def commit(
+        self,
+        set: Optional[Dict[str, Any]] = None,
+        extend: Optional[Dict[str, List[Any]]] = None,
+        update: Optional[Dict[str, Dict[str, Any]]] = None,
+        delete: Optional[List[str]] = None
+    ) -> int:
+        """
+        Durably apply one delta and return its sequence number.
+
+        Args:
+            set: Fields replaced wholesale
+            extend: List fields and the items appended to them
+            update: Dict fields and the keys changed in them
+            delete: Fields removed from the state
+        """
+        self._ensure_loaded()
+        record = {'seq': self.seq + 1, 'time': time.time()}
+        for name, part in (('set', set), ('extend', extend), ('update', update), ('delete', delete)):
+            if part:
+                record[name] = part
+        line = (_dumps(record) + '\n').encode('utf-8')
+        # Normalize through JSON so the in-memory state matches what a reload gives
+        record = json.loads(line)
+
+        if self._log is None:
+            self._log = open(self.log_path, 'ab')
+        self._log.write(line)
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+
+        self._apply(record)
+        self.seq = record['seq']
+        self.log_bytes += len(line)
+        self.stats['commits'] += 1
+        self.stats['bytes_written'] += len(line)
+        if self.log_bytes > max(self.min_compact_bytes, self.compact_ratio * self.snapshot_bytes):
+            self.compact()
+        return self.seq
+
+    def diff(self, state: Dict[str, Any]) -> Tuple[Dict, Dict, Dict, List]:
+        """
+        (set, extend, update, delete) turning the stored state into `state`.
+
+        A list counts as appended to when it is at least as long as the stored
+        one and its first items equal the stored items; only its new tail is
+        serialized and written, so the bytes written per save do not grow with
+        the items already stored. Any other change (an item edited in place,
+        a shorter list) rewrites the list with `set`.
+        """
+        self._ensure_loaded()
+        to_set, to_extend, to_update = {}, {}, {}
+        for key, value in state.items():
+            key = str(key)
+            old = self.state.get(key)
+            if isinstance(value, (list, tuple)) and isinstance(old, list) and len(value) >= len(old) \
+                    and _same_prefix(value, old):
+                if len(value) > len(old):
+                    to_extend[key] = _normalize(list(value[len(old):]))
+                continue
+            value = _normalize(value)
+            if isinstance(value, dict) and isinstance(old, dict) and all(k in value for k in old):
+                changed = {k: v for k, v in value.items() if k not in old or old[k] != v}
+                if changed:
+                    to_update[key] = changed
+            elif key not in self.state or old != value:
+                to_set[key] = value
+        keys = {str(key) for key in state}
+        to_delete = [key for key in self.state if key not in keys]
+        return to_set, to_extend, to_update, to_delete
+
+    def save(self, state: Dict[str, Any]) -> Optional[int]:
+        """Log the difference between `state` and the stored state (None if unchanged)."""
+        to_set, to_extend, to_update, to_delete = self.diff(state)
+        if not (to_set or to_extend or to_update or to_delete):
+            return None
+        return self.commit(set=to_set, extend=to_extend, update=to_update, delete=to_delete)
+
+    def compact(self):
+        """Fold the log into a new snapshot and start an empty log."""
+        self._ensure_loaded()
+        snapshot = _dumps({'seq': self.seq, 'saved_at': datetime.now().isoformat(), 'state': self.state})
+        _atomic_write(self.snapshot_path, snapshot)
+        # A crash between these two writes is harmless: replay skips records <= seq
+        self.close()
+        _atomic_write(self.log_path, '')
+        self.snapshot_seq = self.seq
+        self.snapshot_bytes = len(snapshot.encode('utf-8'))
+        self.log_bytes = 0
+        self.stats['compactions'] += 1
+        self.stats['bytes_written'] += self.snapshot_bytes
+        logger.debug(f"Compacted {self.directory} at seq {self.seq} ({self.snapshot_bytes:,} bytes)")
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def info(self) -> Dict[str, Any]:
+        """Session summary used by `list_sessions`."""
+        paths = [p for p in (self.snapshot_path, self.log_path) if os.path.exists(p)]
+        modified = max((os.path.getmtime(p) for p in paths), default=0)
+        return {
+            'session_id': self.session_id,
+            'directory': self.directory,
+            'seq': self.seq,
+            'snapshot_seq': self.snapshot_seq,
+            'snapshot_bytes': self.snapshot_bytes,
+            'log_bytes': self.log_bytes,
+            'modified': datetime.fromtimestamp(modified).isoformat() if modified else None,
+        }
+
+
+def list_sessions(checkpoint_dir: str, prefix: str = '') -> List[Dict[str, Any]]:
+    """Sessions under `checkpoint_dir` (optionally name-prefixed), most recently saved first."""
+    if not os.path.isdir(checkpoint_dir):
+        return []
+    sessions = []
+    for name in os.listdir(checkpoint_dir):
+        directory = os.path.join(checkpoint_dir, name)
+        if not name.startswith(prefix) or not os.path.isdir(directory):
+            continue
+        store = CheckpointStore(directory)
+        if store.exists():
+            store.load()
+            sessions.append(store.info())
+    return sorted(sessions, key=lambda s: s['modified'] or '', reverse=True)
+
+
+def latest_session(checkpoint_dir: str, prefix: str = '', **kwargs) -> Optional[CheckpointStore]:
+    """Loaded store of the most recently saved session, or None."""
+    sessions = list_sessions(checkpoint_dir, prefix)
+    if not sessions:
+        return None
+    store = CheckpointStore(sessions[0]['directory'], **kwargs)
+    store.load()
+    return store
@@ -0,0 +1,127 @@
+"""
+Inline near-duplicate gate for generation loops.
+
+Instead of generating, deduplicating afterwards and running replacement rounds,
+each candidate is checked against a live NearDuplicateIndex as soon as it is
+parsed. Rejections are counted per prompt, and the observed acceptance rate is
+used to over-request in the same API call so a batch still yields the number
+of items that was actually needed.
+
+This module provides:
+- PromptGateStats: per-prompt counters (requested, received, accepted, rejected)
+- DedupGate: admit / filter candidates and size the next request
+"""
+
+import math
+import logging
+from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, Iterable, Hashable
+
+from near_duplicate_index import NearDuplicateIndex
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PromptGateStats:
+    """Gate counters for one prompt (domain, template, stage, ...)."""
+    requested: int = 0   # Items asked for from the model
+    received: int = 0    # Candidates parsed from responses
+    unique: int = 0      # Candidates that passed the gate (used or not)
+    accepted: int = 0    # Candidates admitted to the dataset
+    rejected: int = 0    # Near-duplicates of already admitted items
+
+    @property
+    def acceptance_rate(self) -> float:
+        """Smoothed share of received candidates that pass the gate."""
+        return (self.unique + 1) / (self.received + 1)
+
+
+class DedupGate:
+    """
+    Live near-duplicate filter shared by all prompts of a generation run.
+
+    Args:
+        seed_texts: Already accepted items (e.g. a previous run) to dedupe against
+        index: Existing index to use instead of building a new one
+        max_overshoot: Upper bound on request_size / needed
+        **index_kwargs: NearDuplicateIndex arguments when `index` is None
+    """
+
+    def __init__(
+        self,
+        seed_texts: Iterable[str] = (),
+        index: Optional[NearDuplicateIndex] = None,
+        max_overshoot: float = 2.0,
+        **index_kwargs
+    ):
+        self.index = index if index is not None else NearDuplicateIndex(**index_kwargs)
+        self.max_overshoot = max_overshoot
+        self.prompt_stats: Dict[Hashable, PromptGateStats] = {}
+        for text in seed_texts:
+            self.index.check_and_insert(text)
+        logger.info(f"Dedup gate seeded with {len(self.index):,} items")
+
+    def stats_for(self, prompt_key: Hashable) -> PromptGateStats:
+        return self.prompt_stats.setdefault(prompt_key, PromptGateStats())
+
+    def request_size(self, prompt_key: Hashable, needed: int, max_request: Optional[int] = None) -> int:
+        """
+        Number of items to ask for so that about `needed` survive the gate.
+
+        Args:
+            prompt_key: Prompt whose acceptance history is used
+            needed: Items still required from this call
+            max_request: Hard cap (e.g. the largest batch the prompt handles well)
+        """
+        if needed <= 0:
+            return 0
+        rate = self.stats_for(prompt_key).acceptance_rate
+        size = max(needed, min(math.ceil(needed / rate), math.ceil(needed * self.max_overshoot)))
+        if max_request is not None:
+            size = min(size, max_request)
+        self.stats_for(prompt_key).requested += size
+        return size
+
+    def admit(self, text: str, prompt_key: Hashable = 'default') -> bool:
+        """Admit a single candidate; False if it near-duplicates an admitted item."""
+        stats = self.stats_for(prompt_key)
+        stats.received += 1
+        if self.index.check_and_insert(text) is not None:
+            stats.rejected += 1
+            return False
+        stats.unique += 1
+        stats.accepted += 1
+        return True
+
+    def filter(self, candidates: List[str], prompt_key: Hashable = 'default', needed: Optional[int] = None) -> List[str]:
+        """
+        Admit candidates in order until `needed` are accepted.
+
+        Surplus candidates are still checked (so the acceptance rate stays
+        honest) but are not added to the index, leaving them free for later.
+        """
+        stats = self.stats_for(prompt_key)
+        accepted = []
+        for text in candidates:
+            if needed is None or len(accepted) < needed:
+                if self.admit(text, prompt_key):
+                    accepted.append(text)
+                continue
+            stats.received += 1
+            if self.index.query(text):
+                stats.rejected += 1
+            else:
+                stats.unique += 1
+        return accepted
+
+    def summary(self) -> Dict[str, Any]:
+        """Per-prompt counters plus totals, JSON-serializable."""
+        per_prompt = {str(key): {**asdict(stats), 'acceptance_rate': stats.acceptance_rate}
+                      for key, stats in self.prompt_stats.items()}
+        return {
+            'indexed_items': len(self.index),
+            'total_received': sum(s.received for s in self.prompt_stats.values()),
+            'total_rejected': sum(s.rejected for s in self.prompt_stats.values()),
+            'prompts': per_prompt
+        }
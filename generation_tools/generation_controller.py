@@ -0,0 +1,455 @@
+"""
+Closed-loop generation controller driven by per-variant acceptance rates.
+
+The article and headline generators produce a whole batch, score it afterwards
+(feature targets, baseline-classifier detection rate, deduplication) and then
+regenerate whatever fell short. Here every candidate is scored the moment it
+is parsed from a response: fast feature checks first, then the cached baseline
+vectorizer + model, then the dedup gate. Acceptance and cost are tracked per
+(prompt variant, topic) arm, and each new call goes to the arm with the lowest
+sampled cost per accepted sample (Thompson sampling on the acceptance rate),
+with a batch size proportional to that arm's share of the remaining target.
+Streamed responses are cut off as soon as the target is reached.
+
+This module provides:
+- quick_features: cheap surface features matching the notebooks' extractors
+- CandidateScorer: feature-target, classifier and dedup checks for one candidate
+- ArmStats: per-arm counters, acceptance rate and cost per accepted sample
+- GenerationController: arm selection, batch sizing, budget tracking and run loop
+- iter_stream_lines / make_openai_generate_fn: parse streamed chat responses item by item
+"""
+
+import re
+import math
+import time
+import logging
+from dataclasses import dataclass, field, asdict
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Callable, Tuple, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+Arm = Tuple[str, str]  # (prompt variant, topic)
+
+_SENTENCE_END = re.compile(r'[.!?]+(?:\s|$)')
+_LIST_MARKER = re.compile(r'^\s*(?:\d+[.)]|[-*•])\s*')
+
+
+def quick_features(text: str) -> Dict[str, float]:
+    """
+    Surface features computable in microseconds.
+
+    Names follow the notebooks' feature extractors (word_count, commas,
+    question_marks, ...), so their target ranges can be reused directly.
+    """
+    words = text.split()
+    return {
+        'word_count': len(words),
+        'char_count': len(text),
+        'sentence_count': max(1, len(_SENTENCE_END.findall(text))),
+        'avg_word_length': sum(len(w) for w in words) / len(words) if words else 0.0,
+        'commas': text.count(','),
+        'question_marks': text.count('?'),
+        'exclamation_marks': text.count('!'),
+        'quotation_marks': text.count('"') + text.count("'"),
+        'caps_words': sum(1 for w in words if len(w) > 1 and w.isupper()),
+    }
+
+
+@dataclass
+class Verdict:
+    """Outcome of scoring one candidate."""
+    accepted: bool
+    reason: Optional[str] = None          # 'empty', 'features', 'classifier' or 'duplicate'
+    target_share: Optional[float] = None  # Share of feature targets met
+    probability: Optional[float] = None   # Classifier probability of the target label
+
+
+class CandidateScorer:
+    """
+    Accept / reject a single candidate, cheapest check first.
+
+    Args:
+        feature_targets: {feature: (min, max)} as used by `validate_against_targets`
+        min_target_share: Share of targets that must be in range
+        feature_fn: text -> feature dict (default: quick_features)
+        vectorizer, model: Cached baseline vectorizer and classifier; the
+            candidate passes if the model assigns it `target_label`
+        predictor: Alternative to vectorizer + model: any object with
+            `predict_proba(texts)` (e.g. a loaded model bundle)
+        target_label: Label synthetic items should be classified as
+        min_probability: Minimum probability of `target_label` (default: 0.5)
+        dedup_gate: Optional DedupGate; only candidates passing every other
+            check are admitted to its index
+        min_words: Candidates shorter than this are rejected as empty
+    """
+
+    def __init__(
+        self,
+        feature_targets: Optional[Dict[str, Tuple[float, float]]] = None,
+        min_target_share: float = 0.8,
+        feature_fn: Callable[[str], Dict[str, float]] = quick_features,
+        vectorizer: Any = None,
+        model: Any = None,
+        predictor: Any = None,
+        target_label: Any = 1,
+        min_probability: float = 0.5,
+        dedup_gate: Any = None,
+        min_words: int = 3
+    ):
+        if (vectorizer is None) != (model is None):
+            raise ValueError("Give both vectorizer and model, or neither")
+        self.feature_targets = feature_targets or {}
+        self.min_target_share = min_target_share
+        self.feature_fn = feature_fn
+        self.vectorizer = vectorizer
+        self.model = model
+        self.predictor = predictor
+        self.target_label = target_label
+        self.min_probability = min_probability
+        self.dedup_gate = dedup_gate
+        self.min_words = min_words
+
+        classes = getattr(predictor or model, 'classes_', None)
+        self._target_column = int(np.flatnonzero(np.asarray(classes) == target_label)[0]) if classes is not None else None
+
+    def target_probability(self, text: str) -> float:
+        """Probability (or 0/1 vote) that the baseline assigns `target_label`."""
+        if self.predictor is not None:
+            proba = np.asarray(self.predictor.predict_proba([text]))[0]
+            return float(proba[self._target_column if self._target_column is not None else int(self.target_label)])
+        X = self.vectorizer.transform([text])
+        if hasattr(self.model, 'predict_proba'):
+            return float(self.model.predict_proba(X)[0, self._target_column])
+        return float(self.model.predict(X)[0] == self.target_label)
+
+    def score(self, text: str, arm: Any = 'default') -> Verdict:
+        text = text.strip()
+        if len(text.split()) < self.min_words:
+            return Verdict(False, 'empty')
+
+        share = None
+        if self.feature_targets:
+            features = self.feature_fn(text)
+            checked = [lo <= features[name] <= hi for name, (lo, hi) in self.feature_targets.items() if name in features]
+            share = sum(checked) / len(checked) if checked else 1.0
+            if share < self.min_target_share:
+                return Verdict(False, 'features', target_share=share)
+
+        probability = None
+        if self.predictor is not None or self.model is not None:
+            probability = self.target_probability(text)
+            if probability < self.min_probability:
+                return Verdict(False, 'classifier', share, probability)
+
+        if self.dedup_gate is not None and not self.dedup_gate.admit(text, arm):
+            return Verdict(False, 'duplicate', share, probability)
+        return Verdict(True, None, share, probability)
+
+
+@dataclass
+class ArmStats:
+    """Counters for one (prompt variant, topic) arm."""
+    calls: int = 0
+    requested: int = 0
+    received: int = 0
+    accepted: int = 0
+    cost: float = 0.0
+    rejected: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def acceptance_rate(self) -> float:
+        """Smoothed share of received candidates that were accepted."""
+        return (self.accepted + 1) / (self.received + 2)
+
+    @property
+    def cost_per_item(self) -> Optional[float]:
+        """Cost per received candidate; calls that returned nothing still count (None before any call)."""
+        return self.cost / max(self.received, 1) if self.calls else None
+
+    @property
+    def cost_per_accepted(self) -> float:
+        return self.cost / self.accepted if self.accepted else float('inf')
+
+
+class GenerationController:
+    """
+    Allocate generation calls across prompt variants and topics.
+
+    Args:
+        variants: {name: prompt template}; templates may use {topic} and {n}
+        topics: Topics crossed with every variant
+        scorer: CandidateScorer applied to every parsed candidate
+        target: Accepted samples wanted
+        budget: Total cost allowed (same unit as the reported call costs:
+            tokens, dollars, seconds...); None for no limit
+        cost_fn: (variant, topic, n_requested, n_received) -> cost, used when a
+            call does not report its own cost (default: n_requested)
+        min_batch, max_batch: Bounds on items requested per call
+        max_calls: Safety limit on calls
+        random_state: Seed for Thompson sampling
+    """
+
+    def __init__(
+        self,
+        variants: Dict[str, str],
+        topics: Sequence[str],
+        scorer: CandidateScorer,
+        target: int,
+        budget: Optional[float] = None,
+        cost_fn: Optional[Callable[[str, str, int, int], float]] = None,
+        min_batch: int = 5,
+        max_batch: int = 25,
+        max_calls: int = 10000,
+        random_state: int = 42
+    ):
+        if not variants or not topics:
+            raise ValueError("Need at least one variant and one topic")
+        self.variants = dict(variants)
+        self.topics = list(topics)
+        self.scorer = scorer
+        self.target = target
+        self.budget = budget
+        self.cost_fn = cost_fn or (lambda variant, topic, n_requested, n_received: float(n_requested))
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.max_calls = max_calls
+        self.rng = np.random.default_rng(random_state)
+
+        self.arms: Dict[Arm, ArmStats] = {(v, t): ArmStats() for v in self.variants for t in self.topics}
+        self.accepted: List[Dict[str, Any]] = []
+        self.spent = 0.0
+        self.calls = 0
+
+    @property
+    def remaining(self) -> int:
+        return max(0, self.target - len(self.accepted))
+
+    def _default_cost_per_item(self) -> float:
+        received = sum(s.received for s in self.arms.values())
+        return self.spent / max(received, 1) if self.calls else 1.0
+
+    def _sampled_costs(self) -> Dict[Arm, float]:
+        """Cost per accepted sample with the acceptance rate drawn from its Beta posterior."""
+        prior = self._default_cost_per_item()
+        costs = {}
+        for arm, stats in self.arms.items():
+            rate = self.rng.beta(stats.accepted + 1, stats.received - stats.accepted + 1)
+            costs[arm] = (stats.cost_per_item or prior) / max(rate, 1e-6)
+        return costs
+
+    def next_request(self) -> Optional[Tuple[Arm, int]]:
+        """
+        The arm to call next and how many items to ask for (None when done).
+
+        The arm's batch covers its share of the remaining target, where shares
+        are proportional to 1 / sampled cost per accepted sample, inflated by
+        the arm's acceptance rate and capped by the remaining budget.
+        """
+        if self.remaining == 0 or self.calls >= self.max_calls:
+            return None
+        if self.budget is not None and self.spent >= self.budget:
+            return None
+
+        costs = self._sampled_costs()
+        arm = min(costs, key=costs.get)
+        inverse = {a: 1.0 / c for a, c in costs.items()}
+        share = inverse[arm] / sum(inverse.values())
+
+        stats = self.arms[arm]
+        planned = max(1.0, self.remaining * share)
+        size = math.ceil(planned / stats.acceptance_rate)
+        size = min(max(size, self.min_batch), self.max_batch, math.ceil(self.remaining / stats.acceptance_rate))
+        if self.budget is not None:
+            per_item = stats.cost_per_item or self._default_cost_per_item()
+            size = min(size, max(1, int((self.budget - self.spent) / per_item)))
+        return arm, max(1, size)
+
+    def prompt_for(self, arm: Arm, n: int) -> str:
+        variant, topic = arm
+        return self.variants[variant].format_map(_Defaults(topic=topic, n=n))
+
+    def observe(self, arm: Arm, text: str, **extra) -> Verdict:
+        """Score one parsed candidate from `arm` and keep it if accepted."""
+        stats = self.arms[arm]
+        stats.received += 1
+        verdict = self.scorer.score(text, arm=f"{arm[0]}|{arm[1]}")
+        if verdict.accepted:
+            stats.accepted += 1
+            self.accepted.append({'text': text.strip(), 'variant': arm[0], 'topic': arm[1],
+                                  'probability': verdict.probability, 'target_share': verdict.target_share, **extra})
+        else:
+            stats.rejected[verdict.reason] = stats.rejected.get(verdict.reason, 0) + 1
+        return verdict
+
+    def record_call(self, arm: Arm, n_requested: int, n_received: int, cost: Optional[float] = None):
+        """Book one finished call against the arm and the budget."""
+        stats = self.arms[arm]
+        if cost is None:
+            cost = self.cost_fn(arm[0], arm[1], n_requested, n_received)
+        stats.calls += 1
+        stats.requested += n_requested
+        stats.cost += cost
+        self.spent += cost
+        self.calls += 1
+
+    def run(self, generate_fn: Callable[[str, int], Any], progress_every: int = 10) -> List[Dict[str, Any]]:
+        """
+        Generate until the target is met, the budget is spent or calls run out.
+
+        Args:
+            generate_fn: (prompt, n) -> texts. May return a list, a lazy
+                iterator (scored as items arrive and closed early once the
+                target is met), a (texts, cost) tuple, or an iterable with a
+                `cost` attribute set once it is exhausted.
+            progress_every: Log a status line every this many calls
+
+        Returns:
+            Accepted items with their variant, topic and scores
+        """
+        start = time.time()
+        while True:
+            request = self.next_request()
+            if request is None:
+                break
+            arm, n = request
+            result, cost, received = None, None, 0
+            try:
+                result = generate_fn(self.prompt_for(arm, n), n)
+                if isinstance(result, tuple) and len(result) == 2:
+                    result, cost = result
+                # Streamed results can fail mid-iteration; keep what arrived before the error
+                iterator = iter(result)
+                try:
+                    for text in iterator:
+                        received += 1
+                        self.observe(arm, text)
+                        if self.remaining == 0:
+                            break
+                finally:
+                    if hasattr(iterator, 'close'):
+                        iterator.close()
+            except Exception as e:
+                logger.warning(f"Call for {arm} failed after {received} items: {e}")
+            finally:
+                self.record_call(arm, n, received, cost if cost is not None else getattr(result, 'cost', None))
+
+            if progress_every and self.calls % progress_every == 0:
+                logger.info(f"{self.calls} calls: {len(self.accepted):,}/{self.target:,} accepted, "
+                            f"spent {self.spent:,.1f}" + (f"/{self.budget:,.1f}" if self.budget else ""))
+        logger.info(f"Controller stopped after {self.calls} calls ({time.time() - start:.0f}s): "
+                    f"{len(self.accepted):,}/{self.target:,} accepted, spent {self.spent:,.1f}")
+        return self.accepted
+
+    def arm_frame(self) -> pd.DataFrame:
+        """One row per arm: calls, acceptance rate, cost per accepted sample, rejection reasons."""
+        rows = []
+        for (variant, topic), stats in self.arms.items():
+            counts = asdict(stats)
+            rejected = counts.pop('rejected')
+            rows.append({'variant': variant, 'topic': topic, **counts,
+                         'acceptance_rate': stats.accepted / stats.received if stats.received else None,
+                         'cost_per_accepted': stats.cost_per_accepted,
+                         **{f'rejected_{reason}': count for reason, count in rejected.items()}})
+        return pd.DataFrame(rows).sort_values('cost_per_accepted').reset_index(drop=True)
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals plus per-variant acceptance, JSON-serializable."""
+        frame = self.arm_frame()
+        by_variant = frame.groupby('variant')[['calls', 'received', 'accepted', 'cost']].sum()
+        return {
+            'target': self.target,
+            'accepted': len(self.accepted),
+            'calls': self.calls,
+            'spent': self.spent,
+            'budget': self.budget,
+            'cost_per_accepted': self.spent / len(self.accepted) if self.accepted else None,
+            'variants': {name: {**{k: float(v) for k, v in row.items()},
+                                'acceptance_rate': float(row['accepted'] / row['received']) if row['received'] else None}
+                         for name, row in by_variant.iterrows()},
+        }
+
+
+class _Defaults(dict):
+    """format_map helper that leaves unknown placeholders untouched."""
+
+    def __missing__(self, key: str) -> str:
+        return '{' + key + '}'
+
+
+def clean_item(line: str) -> str:
+    """Strip list markers and surrounding quotes from one generated item."""
+    line = _LIST_MARKER.sub('', line.strip())
+    return re.sub(r'^["\']|["\']$', '', line).strip()
+
+
+def iter_stream_lines(chunks: Iterable[str], min_chars: int = 1) -> Iterator[str]:
+    """Yield each complete line of a streamed response as soon as its newline arrives."""
+    buffer = ''
+    for chunk in chunks:
+        buffer += chunk
+        while '\n' in buffer:
+            line, buffer = buffer.split('\n', 1)
+            item = clean_item(line)
+            if len(item) >= min_chars:
+                yield item
+    item = clean_item(buffer)
+    if len(item) >= min_chars:
+        yield item
+
+
+class _StreamedCall:
+    """Iterable over parsed items of one streamed chat completion; `cost` is set at the end."""
+
+    def __init__(self, stream: Any, prompt_chars: int = 0):
+        self.stream = stream
+        self.cost: Optional[float] = None
+        self._chars = prompt_chars
+
+    def _chunks(self) -> Iterator[str]:
+        for event in self.stream:
+            if getattr(event, 'usage', None) is not None:
+                self.cost = float(event.usage.total_tokens)
+            if event.choices and event.choices[0].delta.content:
+                self._chars += len(event.choices[0].delta.content)
+                yield event.choices[0].delta.content
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            yield from iter_stream_lines(self._chunks())
+        finally:
+            # Closing the stream early stops generation (and billing) on the server
+            if hasattr(self.stream, 'close'):
+                self.stream.close()
+            if self.cost is None:
+                self.cost = self._chars / 4  # Usage only arrives with the last event; ~4 chars per token
+
+
+def make_openai_generate_fn(
+    client: Any,
+    model: str = "gpt-3.5-turbo",
+    system_prompt: str = "You are creating synthetic fake news headlines for research.",
+    temperature: float = 0.9,
+    tokens_per_item: int = 40
+) -> Callable[[str, int], _StreamedCall]:
+    """
+    `generate_fn` for GenerationController.run using streamed chat completions.
+
+    Items are parsed line by line while the response streams in; the call's
+    cost is its total token count.
+    """
+    def generate(prompt: str, n: int) -> _StreamedCall:
+        user_prompt = f"{prompt}\n\nReturn {n} items, one per line."
+        stream = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": system_prompt},
+                      {"role": "user", "content": user_prompt}],
+            max_tokens=tokens_per_item * n + 20,
+            temperature=temperature,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        return _StreamedCall(stream, prompt_chars=len(system_prompt) + len(user_prompt))
+    return generate
@@ -0,0 +1,376 @@
+"""
+Batched LLM-as-classifier evaluation with caching.
+
+`chatbot_classification_evaluation.ipynb` pastes numbered tweets into a
+chatbot and recovers labels from free text with `parse_predictions`, which
+counts REAL / FAKE mentions line by line, so one missing or extra line shifts
+every later label. Here many items are packed into one prompt under short
+IDs and the model must answer with a JSON object keyed by those IDs; answers
+with missing IDs or unknown labels are re-asked in smaller batches instead of
+being guessed. Labels are cached by (model, prompt version, text) in SQLite,
+batches run with bounded concurrency through the same OpenAI / Gemini
+generator objects the generation pipeline uses, and the metrics match the
+notebook's `evaluate_predictions` / `analyze_errors`.
+
+This module provides:
+- LabelCache: SQLite label cache keyed by model, prompt version and text
+- provider_complete_fn: JSON-mode completion function from an OpenAI / DeepMind generator
+- LLMClassifier: ID-keyed multi-item prompts, retries, caching and concurrency
+- evaluate_predictions / analyze_errors: the notebook's metrics and error listing
+"""
+
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Sequence, Tuple
+
+import numpy as np
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, classification_report
+
+from quota_scheduler import is_rate_limit_error
+
+logger = logging.getLogger(__name__)
+
+# (system prompt, user prompt) -> (response text, tokens used or None)
+CompleteFn = Callable[[str, str], Tuple[str, Optional[int]]]
+
+DEFAULT_INSTRUCTIONS = (
+    'Classify each tweet as either "REAL" or "FAKE". REAL tweets are legitimate news or political '
+    'content, while FAKE tweets contain misinformation, conspiracy theories, or inflammatory content '
+    'designed to deceive.'
+)
+
+_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+class LabelCache:
+    """
+    Persistent label cache (SQLite, safe to share between threads).
+
+    Args:
+        path: Database file; ':memory:' for a throwaway cache
+    """
+
+    def __init__(self, path: str = 'llm_label_cache.sqlite'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS labels (key TEXT PRIMARY KEY, model TEXT, '
+                         'prompt_version TEXT, label TEXT, created REAL)')
+        self._db.commit()
+
+    @staticmethod
+    def key(model: str, prompt_version: str, text: str) -> str:
+        return hashlib.sha256('\x1f'.join((model, prompt_version, text)).encode('utf-8')).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, str]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = list(keys[start:start + 500])
+                marks = ','.join('?' * len(chunk))
+                found.update(self._db.execute(f'SELECT key, label FROM labels WHERE key IN ({marks})', chunk).fetchall())
+        return found
+
+    def put_many(self, rows: Sequence[Tuple[str, str, str, str]]):
+        """Store (key, model, prompt_version, label) rows."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?, ?)',
+                                 [(*row, now) for row in rows])
+            self._db.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM labels').fetchone()[0]
+
+
+def provider_complete_fn(generator: Any, temperature: float = 0.0, max_tokens: int = 2000) -> CompleteFn:
+    """
+    JSON-mode completion function for an OpenAIGenerator or DeepMindGenerator.
+
+    Uses the generator's client / model object and model name, so the
+    classifier runs on whatever `create_generator(provider, model, config_path)`
+    returns.
+    """
+    if hasattr(generator, 'client'):
+        def complete(system: str, user: str) -> Tuple[str, Optional[int]]:
+            response = generator.client.chat.completions.create(
+                model=generator.model_name,
+                messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+                temperature=temperature,
+                max_tokens=max_tokens,
+                response_format={"type": "json_object"}
+            )
+            usage = getattr(response, 'usage', None)
+            return response.choices[0].message.content, getattr(usage, 'total_tokens', None)
+        return complete
+
+    if hasattr(generator, 'model') and hasattr(generator.model, 'generate_content'):
+        def complete(system: str, user: str) -> Tuple[str, Optional[int]]:
+            response = generator.model.generate_content(
+                f"{system}\n\n{user}",
+                generation_config={'temperature': temperature, 'max_output_tokens': max_tokens,
+                                   'response_mime_type': 'application/json'}
+            )
+            usage = getattr(response, 'usage_metadata', None)
+            return response.text, getattr(usage, 'total_token_count', None)
+        return complete
+
+    raise ValueError(f"Unsupported generator type: {type(generator).__name__}")
+
+
+class LLMClassifier:
+    """
+    Classify texts with an LLM, many per prompt.
+
+    Args:
+        complete_fn: (system prompt, user prompt) -> (JSON text, tokens); see
+            `provider_complete_fn`
+        model_name: Model identifier used in the cache key
+        labels: {label name in the prompt: value returned}, e.g. {'REAL': 0, 'FAKE': 1}
+        instructions: Task description placed in the system prompt
+        examples: Optional few-shot (text, label name) pairs
+        prompt_version: Name of this prompt; a digest of the prompt text is
+            appended, so editing instructions or examples never reuses stale labels
+        batch_size: Items per prompt at most
+        max_chars: Characters of item text per prompt at most
+        max_concurrency: Prompts in flight at once
+        max_attempts: Times an item is asked before it is left unlabelled
+        retry_delay: Base wait after a rate-limit error, doubled per attempt
+        cache: LabelCache, or None to disable caching
+    """
+
+    def __init__(
+        self,
+        complete_fn: CompleteFn,
+        model_name: str,
+        labels: Optional[Dict[str, Any]] = None,
+        instructions: str = DEFAULT_INSTRUCTIONS,
+        examples: Optional[Sequence[Tuple[str, str]]] = None,
+        prompt_version: str = 'v1',
+        batch_size: int = 25,
+        max_chars: int = 12000,
+        max_concurrency: int = 4,
+        max_attempts: int = 3,
+        retry_delay: float = 10.0,
+        cache: Optional[LabelCache] = None
+    ):
+        self.complete_fn = complete_fn
+        self.model_name = model_name
+        self.labels = dict(labels or {'REAL': 0, 'FAKE': 1})
+        self.instructions = instructions
+        self.examples = list(examples or [])
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.cache = cache
+
+        unknown = {label for _, label in self.examples} - set(self.labels)
+        if unknown:
+            raise ValueError(f"Examples use unknown labels: {sorted(unknown)}")
+        self.system_prompt = self._system_prompt()
+        digest = hashlib.sha256(self.system_prompt.encode('utf-8')).hexdigest()[:10]
+        self.prompt_version = f"{prompt_version}-{digest}"
+        self.last_run: Dict[str, Any] = {}
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_generator(cls, generator: Any, temperature: float = 0.0, **kwargs) -> 'LLMClassifier':
+        """Build on a generator from `create_generator` (OpenAI or DeepMind)."""
+        return cls(provider_complete_fn(generator, temperature), generator.model_name, **kwargs)
+
+    def _system_prompt(self) -> str:
+        names = ' or '.join(f'"{name}"' for name in self.labels)
+        parts = [
+            self.instructions,
+            f"You receive a JSON array of items, each with an \"id\" and a \"text\". Return only a JSON object "
+            f"mapping every id to its label ({names}), for example {{\"t1\": \"{next(iter(self.labels))}\"}}. "
+            f"Include every id exactly once and nothing else.",
+        ]
+        if self.examples:
+            shots = '\n'.join(json.dumps({'text': text, 'label': label}, ensure_ascii=False) for text, label in self.examples)
+            parts.append(f"Labelled examples:\n{shots}")
+        return '\n\n'.join(parts)
+
+    def user_prompt(self, items: Sequence[Tuple[str, str]]) -> str:
+        """JSON array of {id, text} for one packed batch."""
+        return json.dumps([{'id': item_id, 'text': text} for item_id, text in items], ensure_ascii=False)
+
+    def parse_response(self, response: str, ids: Sequence[str]) -> Dict[str, str]:
+        """{id: label name} for the requested ids with a valid label; anything else is dropped."""
+        text = _FENCE.sub('', (response or '').strip())
+        try:
+            payload = json.loads(text)
+        except json.JSONDecodeError:
+            start, end = text.find('{'), text.rfind('}')
+            try:
+                payload = json.loads(text[start:end + 1]) if start != -1 and end > start else {}
+            except json.JSONDecodeError:
+                payload = {}
+        if isinstance(payload, dict) and len(payload) == 1 and isinstance(next(iter(payload.values())), dict):
+            payload = next(iter(payload.values()))  # e.g. {"labels": {...}}
+        if isinstance(payload, list):  # [{"id": ..., "label": ...}]
+            payload = {str(row.get('id')): row.get('label') for row in payload if isinstance(row, dict)}
+        if not isinstance(payload, dict):
+            return {}
+        wanted = set(ids)
+        parsed = {}
+        for item_id, label in payload.items():
+            label = str(label).strip().upper() if label is not None else ''
+            if str(item_id) in wanted and label in self.labels:
+                parsed[str(item_id)] = label
+        return parsed
+
+    def _pack(self, indices: Sequence[int], texts: Sequence[str], size: int) -> List[List[int]]:
+        """Split item indices into prompts of at most `size` items and `max_chars` characters."""
+        batches, current, chars = [], [], 0
+        for index in indices:
+            length = len(texts[index])
+            if current and (len(current) >= size or chars + length > self.max_chars):
+                batches.append(current)
+                current, chars = [], 0
+            current.append(index)
+            chars += length
+        if current:
+            batches.append(current)
+        return batches
+
+    def _ask(self, batch: List[int], texts: Sequence[str], attempt: int) -> Dict[int, str]:
+        """One prompt; returns {item index: label name} for the items answered correctly."""
+        ids = [f"t{position + 1}" for position in range(len(batch))]
+        prompt = self.user_prompt(list(zip(ids, (texts[i] for i in batch))))
+        try:
+            response, tokens = self.complete_fn(self.system_prompt, prompt)
+        except Exception as e:
+            with self._stats_lock:
+                self.last_run['errors'] += 1
+            if is_rate_limit_error(e):
+                time.sleep(self.retry_delay * 2 ** (attempt - 1))
+            else:
+                logger.warning(f"Classification call failed ({len(batch)} items): {e}")
+            return {}
+        parsed = self.parse_response(response, ids)
+        with self._stats_lock:
+            self.last_run['calls'] += 1
+            self.last_run['tokens'] += tokens or 0
+        by_id = dict(zip(ids, batch))
+        return {by_id[item_id]: label for item_id, label in parsed.items()}
+
+    def classify(self, texts: Sequence[str]) -> List[Any]:
+        """
+        Label every text (None where the model never gave a valid answer).
+
+        Identical texts are asked once; cached labels are reused and new
+        labels are written back as soon as each attempt round finishes.
+        """
+        start = time.time()
+        texts = [str(t) for t in texts]
+        unique = list(dict.fromkeys(texts))
+        self.last_run = {'items': len(texts), 'unique': len(unique), 'cached': 0, 'calls': 0,
+                         'tokens': 0, 'errors': 0, 'unlabelled': 0}
+
+        answers: Dict[str, str] = {}
+        if self.cache is not None:
+            keys = {text: LabelCache.key(self.model_name, self.prompt_version, text) for text in unique}
+            hits = self.cache.get_many(list(keys.values()))
+            answers = {text: hits[key] for text, key in keys.items() if hits.get(key) in self.labels}
+            self.last_run['cached'] = len(answers)
+
+        pending = [i for i, text in enumerate(unique) if text not in answers]
+        size = self.batch_size
+        for attempt in range(1, self.max_attempts + 1):
+            if not pending:
+                break
+            batches = self._pack(pending, unique, size)
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+                results = list(pool.map(lambda batch: self._ask(batch, unique, attempt), batches))
+            fresh = {unique[index]: label for result in results for index, label in result.items()}
+            answers.update(fresh)
+            if self.cache is not None and fresh:
+                self.cache.put_many([(LabelCache.key(self.model_name, self.prompt_version, text),
+                                      self.model_name, self.prompt_version, label) for text, label in fresh.items()])
+            pending = [i for i in pending if unique[i] not in answers]
+            if pending:
+                logger.info(f"Attempt {attempt}: {len(pending):,} items unanswered, retrying in smaller prompts")
+            size = max(1, size // 2)
+
+        predictions = [self.labels[answers[text]] if text in answers else None for text in texts]
+        self.last_run['unlabelled'] = sum(p is None for p in predictions)
+        self.last_run['seconds'] = time.time() - start
+        logger.info(f"Classified {len(texts):,} texts: {self.last_run['cached']:,} cached, "
+                    f"{self.last_run['calls']} calls, {self.last_run['tokens']:,} tokens, "
+                    f"{self.last_run['unlabelled']} unlabelled ({self.last_run['seconds']:.0f}s)")
+        return predictions
+
+    def evaluate(self, texts: Sequence[str], true_labels: Sequence[Any], method_name: str = 'LLM') -> Dict[str, Any]:
+        """`classify` followed by `evaluate_predictions` and `analyze_errors`."""
+        predictions = self.classify(texts)
+        metrics = evaluate_predictions(true_labels, predictions, method_name,
+                                       target_names=list(self.labels), label_values=list(self.labels.values()))
+        if metrics is not None:
+            names = {value: name for name, value in self.labels.items()}
+            metrics['errors'] = analyze_errors(true_labels, predictions, texts, names)
+            metrics['run'] = dict(self.last_run)
+        return metrics
+
+
+def evaluate_predictions(
+    true_labels: Sequence[Any],
+    predictions: Sequence[Any],
+    method_name: str = 'LLM',
+    target_names: Sequence[str] = ('REAL', 'FAKE'),
+    label_values: Optional[Sequence[Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Accuracy and weighted precision / recall / F1, as in the evaluation notebook.
+
+    Unlabelled predictions (None) are left out of the scores and reported
+    as `coverage`.
+    """
+    if len(predictions) != len(true_labels):
+        raise ValueError(f"Mismatch in lengths - Ground truth: {len(true_labels)}, Predictions: {len(predictions)}")
+    answered = [i for i, p in enumerate(predictions) if p is not None]
+    if not answered:
+        logger.warning(f"No predictions available for {method_name}")
+        return None
+    y_true = np.asarray(true_labels)[answered]
+    y_pred = np.asarray([predictions[i] for i in answered])
+    return {
+        'accuracy': accuracy_score(y_true, y_pred),
+        'precision': precision_score(y_true, y_pred, average='weighted', zero_division=0),
+        'recall': recall_score(y_true, y_pred, average='weighted', zero_division=0),
+        'f1': f1_score(y_true, y_pred, average='weighted', zero_division=0),
+        'coverage': len(answered) / len(predictions),
+        'report': classification_report(y_true, y_pred, labels=list(label_values or range(len(target_names))),
+                                        target_names=list(target_names), zero_division=0),
+        'predictions': list(predictions),
+    }
+
+
+def analyze_errors(
+    true_labels: Sequence[Any],
+    predictions: Sequence[Any],
+    texts: Sequence[str],
+    label_names: Optional[Dict[Any, str]] = None,
+    max_chars: int = 200
+) -> List[Dict[str, Any]]:
+    """Misclassified (and unlabelled) items with truncated text, as in the evaluation notebook."""
+    label_names = label_names or {0: 'REAL', 1: 'FAKE'}
+    errors = []
+    for i, (truth, predicted, text) in enumerate(zip(true_labels, predictions, texts)):
+        if predicted != truth:
+            errors.append({
+                'index': i,
+                'tweet': text[:max_chars] + '...' if len(text) > max_chars else text,
+                'true_label': label_names.get(truth, truth),
+                'predicted_label': label_names.get(predicted, 'UNLABELLED') if predicted is not None else 'UNLABELLED',
+            })
+    return errors
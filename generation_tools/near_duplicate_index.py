@@ -0,0 +1,320 @@
+"""
+MinHash-LSH near-duplicate index for synthetic text corpora.
+
+The headline notebooks look for near-duplicates with `difflib.SequenceMatcher`
+over every pair, which is O(n^2) and therefore capped at a 1,000-headline
+sample. This index shingles each text, compresses the shingle set into a
+MinHash signature, and buckets signatures with LSH banding. Only texts that
+share a bucket are verified exactly, so the whole corpus is deduplicated in one
+pass and new items can be inserted and queried incrementally.
+
+This module provides:
+- NearDuplicateIndex: incremental insert / query / check_and_insert
+- deduplicate: one-pass corpus deduplication with the duplicate pairs found
+- export_deduplicated: write `synthetic_headlines_deduplicated_*.csv`
+"""
+
+import os
+import re
+import zlib
+import difflib
+import logging
+from datetime import datetime
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Sequence, Tuple, Callable, Hashable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Prime just above 2^32; with a < 2^31 and 32-bit hashes, a*h + b fits in uint64.
+_HASH_PRIME = np.uint64(4294967311)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so trivial variants hash identically."""
+    return re.sub(r'\s+', ' ', str(text).lower()).strip()
+
+
+def shingle_hashes(text: str, shingle_size: int = 3, unit: str = 'char') -> np.ndarray:
+    """
+    Hash the distinct shingles of a normalized text to 32-bit integers.
+
+    Args:
+        text: Normalized text
+        shingle_size: Characters (or words) per shingle
+        unit: 'char' or 'word'
+    """
+    if unit == 'word':
+        tokens = text.split()
+        pieces = [' '.join(tokens[i:i + shingle_size]) for i in range(max(1, len(tokens) - shingle_size + 1))]
+    elif unit == 'char':
+        pieces = [text[i:i + shingle_size] for i in range(max(1, len(text) - shingle_size + 1))]
+    else:
+        raise ValueError(f"Unknown shingle unit: {unit}. Use 'char' or 'word'")
+    return np.fromiter(
+        {zlib.crc32(piece.encode('utf-8')) for piece in pieces if piece},
+        dtype=np.uint64
+    )
+
+
+def optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Choose (bands, rows) with bands * rows <= num_perm whose S-curve midpoint
+    (1/bands)^(1/rows) is closest to, but not above, the candidate threshold.
+    """
+    best, best_gap = (num_perm, 1), float('inf')
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        midpoint = (1.0 / bands) ** (1.0 / rows)
+        gap = threshold - midpoint
+        if 0 <= gap < best_gap:
+            best, best_gap = (bands, rows), gap
+    return best
+
+
+def sequence_similarity(text_a: str, text_b: str, threshold: float = 0.0) -> float:
+    """
+    `difflib.SequenceMatcher` ratio, as used in the headline notebooks.
+
+    The cheap upper bounds (`real_quick_ratio`, `quick_ratio`) are checked
+    first; when either falls below `threshold` that bound is returned instead
+    of the exact ratio, which is enough to reject the pair.
+    """
+    matcher = difflib.SequenceMatcher(None, text_a, text_b)
+    for bound in (matcher.real_quick_ratio, matcher.quick_ratio):
+        upper = bound()
+        if upper < threshold:
+            return upper
+    return matcher.ratio()
+
+
+class NearDuplicateIndex:
+    """
+    Incremental near-duplicate index with exact verification of LSH candidates.
+
+    Args:
+        threshold: Minimum verified similarity to call two texts near-duplicates
+        similarity: 'sequence' (difflib ratio, notebook-compatible) or 'jaccard'
+            (exact shingle-set Jaccard)
+        candidate_threshold: Approximate Jaccard at which LSH starts proposing
+            candidates; lower means higher recall and more verifications
+        shingle_size: Shingle length
+        shingle_unit: 'char' or 'word'
+        num_perm: MinHash signature length
+        seed: Seed for the MinHash permutations
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        similarity: str = 'sequence',
+        candidate_threshold: float = 0.5,
+        shingle_size: int = 3,
+        shingle_unit: str = 'char',
+        num_perm: int = 128,
+        seed: int = 1
+    ):
+        if similarity not in ('sequence', 'jaccard'):
+            raise ValueError(f"Unknown similarity: {similarity}. Use 'sequence' or 'jaccard'")
+        self.threshold = threshold
+        self.similarity = similarity
+        self.shingle_size = shingle_size
+        self.shingle_unit = shingle_unit
+        self.num_perm = num_perm
+        self.bands, self.rows = optimal_bands(candidate_threshold, num_perm)
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2 ** 32, size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, List[Hashable]]] = [defaultdict(list) for _ in range(self.bands)]
+        self._texts: Dict[Hashable, str] = {}
+        self._shingles: Dict[Hashable, np.ndarray] = {}
+        self._exact: Dict[str, Hashable] = {}
+        self._auto_keys = 0
+        self._corpus_calls = 0
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._texts
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """MinHash signature of a shingle-hash array."""
+        if len(hashes) == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _HASH_PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        usable = signature[:self.bands * self.rows].reshape(self.bands, self.rows)
+        return [band.tobytes() for band in usable]
+
+    def _score(self, text: str, hashes: np.ndarray, key: Hashable) -> float:
+        if self.similarity == 'sequence':
+            return sequence_similarity(text, self._texts[key], self.threshold)
+        other = self._shingles[key]
+        union = len(np.union1d(hashes, other))
+        return len(np.intersect1d(hashes, other, assume_unique=True)) / union if union else 1.0
+
+    def _prepare(self, text: str) -> Tuple[str, np.ndarray, List[bytes]]:
+        normalized = normalize_text(text)
+        hashes = shingle_hashes(normalized, self.shingle_size, self.shingle_unit)
+        return normalized, hashes, self._band_keys(self.signature(hashes))
+
+    def _query_prepared(
+        self,
+        normalized: str,
+        hashes: np.ndarray,
+        band_keys: List[bytes],
+        first_only: bool
+    ) -> List[Tuple[Hashable, float]]:
+        if normalized in self._exact:
+            return [(self._exact[normalized], 1.0)]
+        candidates = dict.fromkeys(
+            key for band, band_key in enumerate(band_keys)
+            for key in self._buckets[band].get(band_key, ())
+        )
+        matches = []
+        for key in candidates:
+            score = self._score(normalized, hashes, key)
+            if score >= self.threshold:
+                matches.append((key, score))
+                if first_only:
+                    break
+        return sorted(matches, key=lambda m: m[1], reverse=True)
+
+    def _insert_prepared(self, key: Hashable, normalized: str, hashes: np.ndarray, band_keys: List[bytes]):
+        if key in self._texts:
+            raise KeyError(f"Key already indexed: {key!r}")
+        self._texts[key] = normalized
+        if self.similarity == 'jaccard':
+            self._shingles[key] = hashes
+        self._exact.setdefault(normalized, key)
+        for band, band_key in enumerate(band_keys):
+            self._buckets[band][band_key].append(key)
+
+    def insert(self, key: Hashable, text: str):
+        """Add a text under `key` without checking for duplicates."""
+        self._insert_prepared(key, *self._prepare(text))
+
+    def query(self, text: str) -> List[Tuple[Hashable, float]]:
+        """All indexed texts at or above the threshold, best first."""
+        return self._query_prepared(*self._prepare(text), first_only=False)
+
+    def check_and_insert(self, text: str, key: Optional[Hashable] = None) -> Optional[Tuple[Hashable, float]]:
+        """
+        Insert `text` unless it near-duplicates an indexed text.
+
+        Without a `key` the text is stored under ('auto', n) from the index's
+        own counter, so generated keys never collide with caller keys.
+
+        Returns:
+            None if inserted, otherwise (matching key, similarity)
+        """
+        normalized, hashes, band_keys = self._prepare(text)
+        matches = self._query_prepared(normalized, hashes, band_keys, first_only=True)
+        if matches:
+            return matches[0]
+        if key is None:
+            key = ('auto', self._auto_keys)
+            while key in self._texts:
+                self._auto_keys += 1
+                key = ('auto', self._auto_keys)
+            self._auto_keys += 1
+        self._insert_prepared(key, normalized, hashes, band_keys)
+        return None
+
+
+def deduplicate(
+    texts: Sequence[str],
+    index: Optional[NearDuplicateIndex] = None,
+    **index_kwargs
+) -> Tuple[List[int], List[Dict[str, Any]]]:
+    """
+    Deduplicate a corpus in one pass, keeping the first occurrence of each group.
+
+    Args:
+        texts: Texts in priority order
+        index: Existing index to deduplicate against (e.g. already accepted items,
+            or earlier corpora deduplicated with the same index)
+        **index_kwargs: NearDuplicateIndex arguments when `index` is None
+
+    Returns:
+        Tuple of (indices of kept texts, duplicate pair records). `duplicate_of`
+        is the row index for a match within `texts` and the stored key for a
+        match already in the index
+    """
+    if index is None:
+        index = NearDuplicateIndex(**index_kwargs)
+    # Each call inserts under its own ('corpus', call_id, i) keys, so an index can be reused
+    call_id = index._corpus_calls
+    index._corpus_calls += 1
+    kept, duplicates = [], []
+    for i, text in enumerate(texts):
+        match = index.check_and_insert(text, key=('corpus', call_id, i))
+        if match is None:
+            kept.append(i)
+        else:
+            matched_key, score = match
+            duplicates.append({
+                'index': i,
+                'text': text,
+                'duplicate_of': matched_key[2] if isinstance(matched_key, tuple) and matched_key[:2] == ('corpus', call_id)
+                else matched_key,
+                'similarity': score
+            })
+    logger.info(f"Kept {len(kept):,} of {len(texts):,} texts ({len(duplicates):,} near-duplicates)")
+    return kept, duplicates
+
+
+def export_deduplicated(
+    headlines: Sequence[str],
+    output_dir: str = "results",
+    domain_fn: Optional[Callable[[str], str]] = None,
+    timestamp: Optional[str] = None,
+    **index_kwargs
+) -> Dict[str, Any]:
+    """
+    Deduplicate headlines and write `synthetic_headlines_deduplicated_{timestamp}.csv`.
+
+    Args:
+        headlines: Synthetic headlines
+        output_dir: Output directory
+        domain_fn: Optional classifier for the `domain` column (e.g. the lexicon
+            matcher's `classify_headline_domain`); 'general' if not given
+        timestamp: Override the file timestamp
+        **index_kwargs: NearDuplicateIndex arguments
+
+    Returns:
+        Summary dictionary with file paths and counts
+    """
+    import pandas as pd
+
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    kept, duplicates = deduplicate(headlines, **index_kwargs)
+
+    kept_headlines = [headlines[i] for i in kept]
+    table = pd.DataFrame({
+        'headline': kept_headlines,
+        'length': [len(h) for h in kept_headlines],
+        'domain': [domain_fn(h) if domain_fn else 'general' for h in kept_headlines],
+    })
+    csv_file = os.path.join(output_dir, f"synthetic_headlines_deduplicated_{timestamp}.csv")
+    table.to_csv(csv_file, index=False)
+
+    pairs_file = os.path.join(output_dir, f"near_duplicate_pairs_{timestamp}.csv")
+    pd.DataFrame(duplicates, columns=['index', 'text', 'duplicate_of', 'similarity']).to_csv(pairs_file, index=False)
+
+    return {
+        'csv_file': csv_file,
+        'pairs_file': pairs_file,
+        'total_headlines': len(headlines),
+        'unique_headlines': len(kept),
+        'duplicates_removed': len(duplicates),
+        'duplicate_rate': len(duplicates) / len(headlines) if headlines else 0.0
+    }
@@ -0,0 +1,459 @@
+"""
+Priority-based quota scheduling for multi-dimension generation plans.
+
+The generation notebooks walk their plans one dimension at a time: headline
+domains in `generation_plan` order, `generate_articles_for_all_languages`
+language by language, tweet topics one after another. A slow or rate-limited
+cell therefore stalls every cell behind it. Here each plan cell is a quota
+with a target count; batches are interleaved across cells by remaining
+deficit (the cell furthest from its target, relative to its size, goes next)
+and dispatched to whichever model has headroom under its own requests /
+tokens per minute and concurrency limits. Rate-limit errors cool down only the
+model that raised them, other failures only the cell that caused them, so the
+rest of the plan keeps moving.
+
+This module provides:
+- Quota: one plan cell with its target, progress and failure state
+- ModelLimits: per-model RPM / TPM / concurrency limits (readable from generation_config.yaml)
+- ModelLimiter: sliding-window limiter with rate-limit backoff for one model
+- QuotaScheduler: deficit-weighted dispatch of batches across cells and models
+- flatten_plan / is_rate_limit_error: helpers for nested plans and error triage
+"""
+
+import math
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Callable, Hashable, Sequence, Tuple, Union
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def flatten_plan(plan: Dict[Hashable, Any], prefix: Tuple = ()) -> Dict[Hashable, int]:
+    """
+    Flatten a nested plan into {cell key: target}.
+
+    `{'en': {'fake': 500, 'real': 500}}` becomes `{('en', 'fake'): 500, ...}`;
+    a flat plan such as the headline `generation_plan` is returned unchanged.
+    """
+    cells = {}
+    for key, value in plan.items():
+        if isinstance(value, dict):
+            cells.update(flatten_plan(value, prefix + (key,)))
+        else:
+            cells[prefix + (key,) if prefix else key] = int(value)
+    return cells
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """True for HTTP 429 / quota errors from the OpenAI or Gemini clients."""
+    message = str(error).lower()
+    return ('ratelimit' in type(error).__name__.lower() or getattr(error, 'status_code', None) == 429
+            or 'rate_limit' in message or 'rate limit' in message or 'resource_exhausted' in message)
+
+
+@dataclass
+class Quota:
+    """One plan cell: how many items it needs and how far it has got."""
+    key: Hashable
+    target: int
+    done: int = 0
+    in_flight: int = 0                    # Items requested by running batches
+    weight: float = 1.0                   # Priority multiplier
+    models: Optional[Tuple[str, ...]] = None  # Models allowed to serve this cell (None: any)
+    calls: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    cooldown_until: float = 0.0
+    exhausted: bool = False               # Gave up after too many consecutive failures
+
+    @property
+    def deficit(self) -> int:
+        return max(0, self.target - self.done)
+
+    @property
+    def open_deficit(self) -> int:
+        """Deficit not yet covered by running batches."""
+        return max(0, self.target - self.done - self.in_flight)
+
+    @property
+    def priority(self) -> float:
+        """Share of the target still open, times the weight."""
+        return self.weight * self.open_deficit / self.target if self.target else 0.0
+
+
+@dataclass
+class ModelLimits:
+    """Rate limits of one model; None means unlimited."""
+    requests_per_minute: Optional[float] = None
+    tokens_per_minute: Optional[float] = None
+    max_concurrency: int = 4
+
+    @classmethod
+    def from_config(cls, provider_config: Dict[str, Any], model: str, max_concurrency: int = 4) -> 'ModelLimits':
+        """
+        Limits for `model` from a provider section of generation_config.yaml.
+
+        `model` may be the section key (`gpt3_5_turbo`) or the model name
+        (`gpt-3.5-turbo`); a model without a `rate_limit` entry is unlimited.
+        """
+        entry = provider_config.get(model)
+        if entry is None:
+            entry = next((e for e in provider_config.values() if isinstance(e, dict) and e.get('model') == model), {})
+        rate_limit = entry.get('rate_limit') or {}
+        return cls(rate_limit.get('requests_per_minute'), rate_limit.get('tokens_per_minute'), max_concurrency)
+
+
+class ModelLimiter:
+    """
+    Sliding-window request / token limiter for one model.
+
+    Token use is booked with an estimate when a batch starts and corrected
+    to the reported usage when it finishes. Rate-limit errors put the model
+    on an exponentially growing cooldown that resets after a clean call.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limits: ModelLimits,
+        window: float = 60.0,
+        base_backoff: float = 5.0,
+        max_backoff: float = 120.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.limits = limits
+        self.window = window
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.clock = clock
+
+        self.events: deque = deque()  # [start time, tokens] per batch inside the window
+        self.active = 0
+        self.cooldown_until = 0.0
+        self.consecutive_rate_limits = 0
+        self.stats = {'calls': 0, 'items': 0, 'tokens': 0, 'failures': 0, 'rate_limited': 0, 'seconds': 0.0}
+
+    def _trim(self, now: float):
+        while self.events and self.events[0][0] <= now - self.window:
+            self.events.popleft()
+
+    def wait_time(self, tokens: float, now: Optional[float] = None) -> float:
+        """Seconds until a batch of `tokens` may start (0: now; inf: waits on a running batch)."""
+        now = self.clock() if now is None else now
+        self._trim(now)
+        if self.active >= self.limits.max_concurrency:
+            return math.inf
+        delay = max(0.0, self.cooldown_until - now)
+        rpm, tpm = self.limits.requests_per_minute, self.limits.tokens_per_minute
+        if rpm and len(self.events) >= rpm:
+            delay = max(delay, self.events[len(self.events) - int(rpm)][0] + self.window - now)
+        if tpm and self.events:
+            used = sum(n for _, n in self.events)
+            if used + tokens > tpm:
+                # Wait until enough of the oldest batches leave the window
+                for start, n in self.events:
+                    used -= n
+                    if used + tokens <= tpm:
+                        delay = max(delay, start + self.window - now)
+                        break
+        return delay
+
+    def load(self, now: Optional[float] = None) -> float:
+        """Utilisation in [0, 1]: the tighter of concurrency and request-rate use."""
+        now = self.clock() if now is None else now
+        self._trim(now)
+        load = self.active / self.limits.max_concurrency
+        if self.limits.requests_per_minute:
+            load = max(load, len(self.events) / self.limits.requests_per_minute)
+        return load
+
+    def acquire(self, tokens: float) -> List[float]:
+        """Book a starting batch; returns its window entry for `release`."""
+        entry = [self.clock(), float(tokens)]
+        self.events.append(entry)
+        self.active += 1
+        return entry
+
+    def release(self, entry: List[float], tokens: Optional[float] = None, items: int = 0, error: Optional[BaseException] = None):
+        """Book a finished batch, correcting its token estimate and applying backoff on rate limits."""
+        self.active -= 1
+        now = self.clock()
+        if tokens is not None:
+            entry[1] = float(tokens)
+        self.stats['calls'] += 1
+        self.stats['items'] += items
+        self.stats['tokens'] += int(entry[1])
+        self.stats['seconds'] += now - entry[0]
+        if error is None:
+            self.consecutive_rate_limits = 0
+            return
+        self.stats['failures'] += 1
+        if is_rate_limit_error(error):
+            self.stats['rate_limited'] += 1
+            self.consecutive_rate_limits += 1
+            backoff = min(self.max_backoff, self.base_backoff * 2 ** (self.consecutive_rate_limits - 1))
+            self.cooldown_until = max(self.cooldown_until, now + backoff)
+            logger.info(f"{self.name} rate limited; cooling down for {backoff:.1f}s")
+
+
+@dataclass
+class _Job:
+    quota: Quota
+    model: str
+    n: int
+    entry: List[float]
+
+
+class QuotaScheduler:
+    """
+    Fill every cell of a generation plan, interleaving cells and spreading them over models.
+
+    Args:
+        quotas: Plan cells (see `from_plan` to build them from a plan dict)
+        models: {model name: ModelLimits, a `rate_limit`-style dict, or None}
+        generate_fn: (model, cell key, n) -> items, or (items, tokens used).
+            Called from worker threads; exceptions fail the batch.
+        batch_size: Items requested per call at most
+        tokens_per_item, prompt_tokens: Token estimate of a call before its
+            usage is known (n * tokens_per_item + prompt_tokens)
+        max_workers: Concurrent calls overall (default: sum of model concurrencies)
+        max_failures: Consecutive failed batches after which a cell is given up
+        retry_delay, max_retry_delay: Cell cooldown after a failure, doubling per
+            consecutive failure
+        on_batch: (cell key, model, items) -> kept items, run on the scheduling
+            thread after each batch (checkpointing, dedup, bookkeeping); only the
+            returned items count toward the cell (None keeps all)
+        progress_every: Log a status line every this many batches
+        clock: Time source (monotonic seconds)
+    """
+
+    def __init__(
+        self,
+        quotas: Sequence[Quota],
+        models: Dict[str, Union[ModelLimits, Dict[str, Any], None]],
+        generate_fn: Callable[[str, Hashable, int], Any],
+        batch_size: int = 10,
+        tokens_per_item: float = 40,
+        prompt_tokens: float = 300,
+        max_workers: Optional[int] = None,
+        max_failures: int = 5,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 120.0,
+        on_batch: Optional[Callable[[Hashable, str, List[Any]], Optional[List[Any]]]] = None,
+        progress_every: int = 20,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        if not models:
+            raise ValueError("Need at least one model")
+        self.quotas = {q.key: q for q in quotas}
+        self.limiters = {}
+        for name, limits in models.items():
+            if limits is None:
+                limits = ModelLimits()
+            elif isinstance(limits, dict):
+                limits = ModelLimits(limits.get('requests_per_minute'), limits.get('tokens_per_minute'),
+                                     limits.get('max_concurrency', 4))
+            self.limiters[name] = ModelLimiter(name, limits, clock=clock)
+        for quota in self.quotas.values():
+            unknown = set(quota.models or ()) - set(self.limiters)
+            if unknown:
+                raise ValueError(f"Cell {quota.key!r} allows unknown models: {sorted(unknown)}")
+
+        self.generate_fn = generate_fn
+        self.batch_size = batch_size
+        self.tokens_per_item = tokens_per_item
+        self.prompt_tokens = prompt_tokens
+        self.max_workers = max_workers or sum(l.limits.max_concurrency for l in self.limiters.values())
+        self.max_failures = max_failures
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.on_batch = on_batch
+        self.progress_every = progress_every
+        self.clock = clock
+
+        self.results: Dict[Hashable, List[Any]] = {key: [] for key in self.quotas}
+        self.batches = 0
+
+    @classmethod
+    def from_plan(
+        cls,
+        plan: Dict[Hashable, Any],
+        models: Dict[str, Any],
+        generate_fn: Callable[[str, Hashable, int], Any],
+        progress: Optional[Dict[Hashable, Any]] = None,
+        weights: Optional[Dict[Hashable, float]] = None,
+        cell_models: Optional[Dict[Hashable, Sequence[str]]] = None,
+        **kwargs
+    ) -> 'QuotaScheduler':
+        """
+        Build from a (possibly nested) plan such as `GenerationSession.generation_plan`.
+
+        Args:
+            progress: Items already done per cell, same shape as the plan
+                (e.g. `session.domain_progress` when resuming)
+            weights: Priority multiplier per cell key
+            cell_models: Models allowed per cell key (default: all)
+        """
+        done = flatten_plan(progress) if progress else {}
+        quotas = [Quota(key, target, done=done.get(key, 0), weight=(weights or {}).get(key, 1.0),
+                        models=tuple((cell_models or {})[key]) if key in (cell_models or {}) else None)
+                  for key, target in flatten_plan(plan).items()]
+        return cls(quotas, models, generate_fn, **kwargs)
+
+    @property
+    def remaining(self) -> int:
+        return sum(q.deficit for q in self.quotas.values())
+
+    def estimate_tokens(self, n: int) -> float:
+        return self.prompt_tokens + n * self.tokens_per_item
+
+    def _candidates(self, now: float) -> List[Quota]:
+        """Cells that may take a batch now, highest priority first."""
+        ready = [q for q in self.quotas.values()
+                 if q.open_deficit > 0 and not q.exhausted and q.cooldown_until <= now]
+        return sorted(ready, key=lambda q: (q.priority, q.open_deficit), reverse=True)
+
+    def next_assignment(self) -> Optional[Tuple[Quota, str, int]]:
+        """The next (cell, model, batch size) that can start right now, or None."""
+        now = self.clock()
+        for quota in self._candidates(now):
+            n = min(self.batch_size, quota.open_deficit)
+            tokens = self.estimate_tokens(n)
+            ready = [name for name in (quota.models or self.limiters)
+                     if self.limiters[name].wait_time(tokens, now) == 0]
+            if ready:
+                return quota, min(ready, key=lambda name: self.limiters[name].load(now)), n
+        return None
+
+    def next_wakeup(self) -> Optional[float]:
+        """Seconds until some waiting cell could start (None if nothing can without a running batch)."""
+        now = self.clock()
+        delays = []
+        for quota in self.quotas.values():
+            if quota.open_deficit == 0 or quota.exhausted:
+                continue
+            tokens = self.estimate_tokens(min(self.batch_size, quota.open_deficit))
+            model_delay = min(self.limiters[name].wait_time(tokens, now) for name in (quota.models or self.limiters))
+            delays.append(max(quota.cooldown_until - now, model_delay))
+        finite = [d for d in delays if d != math.inf]
+        return max(0.0, min(finite)) if finite else None
+
+    def _start(self, pool: ThreadPoolExecutor, quota: Quota, model: str, n: int):
+        entry = self.limiters[model].acquire(self.estimate_tokens(n))
+        quota.in_flight += n
+        quota.calls += 1
+        job = _Job(quota, model, n, entry)
+        return pool.submit(self.generate_fn, model, quota.key, n), job
+
+    def _finish(self, job: _Job, result: Any = None, error: Optional[BaseException] = None):
+        quota, limiter = job.quota, self.limiters[job.model]
+        quota.in_flight -= job.n
+        self.batches += 1
+
+        tokens, items = None, []
+        if error is None:
+            if isinstance(result, tuple) and len(result) == 2:
+                result, tokens = result
+            items = list(result or [])
+            if self.on_batch is not None:
+                kept = self.on_batch(quota.key, job.model, items)
+                items = items if kept is None else list(kept)
+        limiter.release(job.entry, tokens, len(items), error)
+
+        if error is not None and is_rate_limit_error(error):
+            return  # The model backs off; the cell simply goes to the next free model
+        if items:
+            quota.done += len(items)
+            quota.consecutive_failures = 0
+            self.results[quota.key].extend(items)
+            return
+
+        quota.failures += 1
+        quota.consecutive_failures += 1
+        if quota.exhausted:
+            return
+        if quota.consecutive_failures >= self.max_failures:
+            quota.exhausted = True
+            logger.warning(f"Giving up on {quota.key!r} after {quota.consecutive_failures} failed batches "
+                           f"({quota.done:,}/{quota.target:,} done)" + (f": {error}" if error else ""))
+        else:
+            delay = min(self.max_retry_delay, self.retry_delay * 2 ** (quota.consecutive_failures - 1))
+            quota.cooldown_until = self.clock() + delay
+            logger.info(f"Batch for {quota.key!r} on {job.model} " + (f"failed: {error}" if error else "returned nothing")
+                        + f"; retrying the cell in {delay:.1f}s")
+
+    def run(self, max_seconds: Optional[float] = None) -> Dict[Hashable, List[Any]]:
+        """
+        Dispatch batches until every cell is filled or given up (or time runs out).
+
+        Returns:
+            Items kept per cell key from this run
+        """
+        start = self.clock()
+        pending = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                out_of_time = max_seconds is not None and self.clock() - start >= max_seconds
+                while not out_of_time and len(pending) < self.max_workers:
+                    assignment = self.next_assignment()
+                    if assignment is None:
+                        break
+                    future, job = self._start(pool, *assignment)
+                    pending[future] = job
+
+                if not pending:
+                    wakeup = None if out_of_time else self.next_wakeup()
+                    if wakeup is None:
+                        break
+                    time.sleep(wakeup)
+                    continue
+
+                # With free workers, also wake up when a cooling-down cell or model becomes ready
+                wakeup = self.next_wakeup() if len(pending) < self.max_workers and not out_of_time else None
+                finished, _ = wait(list(pending), timeout=wakeup or None, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    job = pending.pop(future)
+                    error = future.exception()
+                    self._finish(job, None if error else future.result(), error)
+                    if self.progress_every and self.batches % self.progress_every == 0:
+                        done = sum(q.done for q in self.quotas.values())
+                        target = sum(q.target for q in self.quotas.values())
+                        logger.info(f"{self.batches} batches: {done:,}/{target:,} items, {len(pending)} running")
+
+        logger.info(f"Scheduler stopped after {self.batches} batches ({self.clock() - start:.0f}s): "
+                    f"{self.remaining:,} items outstanding, {sum(q.exhausted for q in self.quotas.values())} cells given up")
+        return self.results
+
+    def quota_frame(self) -> pd.DataFrame:
+        """One row per cell: target, done, deficit, calls and failures."""
+        return pd.DataFrame([{
+            'cell': q.key, 'target': q.target, 'done': q.done, 'deficit': q.deficit,
+            'calls': q.calls, 'failures': q.failures, 'exhausted': q.exhausted,
+        } for q in self.quotas.values()])
+
+    def model_frame(self) -> pd.DataFrame:
+        """One row per model: calls, items, tokens, failures, rate limits and mean latency."""
+        rows = []
+        for name, limiter in self.limiters.items():
+            stats = limiter.stats
+            rows.append({'model': name, **stats,
+                         'mean_seconds': stats['seconds'] / stats['calls'] if stats['calls'] else None,
+                         'requests_per_minute': limiter.limits.requests_per_minute,
+                         'tokens_per_minute': limiter.limits.tokens_per_minute})
+        return pd.DataFrame(rows)
+
+    def summary(self) -> Dict[str, Any]:
+        """Totals per cell and per model, JSON-serializable."""
+        return {
+            'batches': self.batches,
+            'remaining': self.remaining,
+            'cells': {str(q.key): {'target': q.target, 'done': q.done, 'exhausted': q.exhausted}
+                      for q in self.quotas.values()},
+            'models': {name: dict(limiter.stats) for name, limiter in self.limiters.items()},
+        }
@@ -0,0 +1,628 @@
+"""
+Vectorized template synthesizer for offline headline pre-screening.
+
+`MockHeadlineGenerator` and its refinements fill one template at a time with
+`random.choice` and then edit the string (`apply_stylistic_modifications`),
+which is fine for a demo but far too slow to pre-screen candidates in bulk.
+Here templates are compiled once into literal pieces and slot vocabularies,
+and a whole batch is drawn as NumPy index arrays: template, slot fillers
+(optionally learned n-grams from `comprehensive_ngram_analysis_*.csv`,
+weighted by their fake-headline counts) and stylistic modifiers (caps,
+quotes, question / exclamation endings, urgency prefixes, speculation
+words). Headline features are summed from precomputed per-piece counts
+(caps words from per-piece word edges, since a word can span a slot and the
+literal next to it), so feature-range checks and rejection sampling against the feature
+distribution of reference headlines run before any string is built; only
+accepted candidates are rendered.
+
+This module provides:
+- DEFAULT_TEMPLATES / DEFAULT_SLOTS / DEFAULT_MODIFIERS: the refined mock generator's templates and rates
+- load_ngram_fillers / latest_ngram_analysis: slot fillers from the n-gram analysis CSVs
+- headline_features: the notebooks' count features for plain strings
+- TemplateSynthesizer: bulk sampling, rejection sampling and rendering
+"""
+
+import os
+import re
+import glob
+import time
+import logging
+import unicodedata
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ['char_count', 'word_count', 'exclamation_count', 'question_count', 'quote_count', 'caps_word_count']
+_CHARS, _SPACES, _EXCLAIM, _QUESTION, _QUOTES, _CAPS = range(6)
+
+# Word edges of a piece: whether it contains a space, the fragment before its first space (glued
+# to the preceding piece's last word), the caps words strictly inside it and the fragment after
+# its last space (glued to the next piece). A piece without spaces is all leading fragment.
+_HAS_SPACE, _LEAD_LEN, _LEAD_LOWER, _LEAD_UPPER, _INNER_CAPS, _TAIL_LEN, _TAIL_LOWER, _TAIL_UPPER = range(8)
+
+# Final character of a piece: anything else, '?', '!' or '.'
+_END_OTHER, _END_QUESTION, _END_EXCLAIM, _END_PERIOD = range(4)
+_END_CODES = {'?': _END_QUESTION, '!': _END_EXCLAIM, '.': _END_PERIOD}
+
+DEFAULT_TEMPLATES = {
+    'celebrity': [
+        "{celebrity} and {celebrity2} relationship update: couple {relationship_action} according to close sources",
+        "New photos show {celebrity} {dramatic_action} at recent public event in {location}",
+        "Sources reveal {celebrity} planning to {action} following recent career developments",
+        "{celebrity} addresses rumors about {action} in exclusive interview with entertainment magazine",
+        "Entertainment industry insiders confirm {celebrity} {speculation_word} {dramatic_action} next year",
+        "{celebrity} spotted with {celebrity2} leading to speculation about potential {relationship_action}",
+        "Did {celebrity} and {celebrity2} secretly {relationship_action} in private ceremony?",
+    ],
+    'political': [
+        "{politician} announces plans for {policy_event} in response to recent legislative developments",
+        "Congressional sources indicate {politician} {speculation_word} preparing to {political_action} before upcoming session",
+        "Political analysts discuss implications of {politician} recent {policy_event} proposal for voters",
+        "{political_figure} responds to criticism over controversial {policy_event} during press conference",
+        "Sources close to {politician} reveal ongoing discussions about {policy_event} implementation",
+        "Did {politician} really {controversial_action} during recent congressional session?",
+    ],
+    'general': [
+        "Local {subject} announces plans to {action} following community meetings",
+        "Business update: {subject} {speculation_word} planning to {action} despite economic challenges",
+        "Community leaders discuss impact of {subject} decision to {action} on local residents",
+        "Industry sources confirm {subject} {dramatic_action} in response to market conditions",
+        "Economic news: {subject} reveals plans to {action} following successful {event}",
+        "Did {subject} really {action} without proper permits and authorization?",
+    ],
+}
+
+DEFAULT_SLOTS = {
+    'celebrity': ['Taylor Swift', 'Brad Pitt', 'Jennifer Lawrence', 'Ryan Gosling', 'Emma Stone'],
+    'politician': ['Senator Johnson', 'Mayor Smith', 'Governor Davis', 'President Wilson'],
+    'political_figure': ['Congressional leader', 'Cabinet member', 'Party official'],
+    'speculation_word': ['allegedly', 'reportedly', 'supposedly'],
+    'location': ['Hollywood', 'New York', 'Los Angeles', 'London', 'Paris'],
+    'subject': ['technology company', 'local business', 'healthcare provider', 'educational institution', 'manufacturing firm'],
+    'action': ['expand operations', 'launch new initiative', 'restructure organization', 'form partnership', 'relocate headquarters'],
+    'dramatic_action': ['makes major announcement', 'addresses recent developments', 'responds to industry changes'],
+    'relationship_action': ['confirm relationship', 'attend event together', 'collaborate on project', 'make joint appearance'],
+    'political_action': ['propose new legislation', 'address budget concerns', 'meet with constituents'],
+    'controversial_action': ['change their position', 'make that statement'],
+    'policy_event': ['healthcare reform', 'infrastructure bill', 'education funding', 'environmental policy'],
+    'event': ['major announcement', 'surprising revelation', 'unexpected change'],
+}
+
+# Share of candidates receiving each modifier (close to the fake-headline targets in the notebooks)
+DEFAULT_MODIFIERS = {'quotes': 0.3, 'caps': 0.2, 'question': 0.13, 'exclamation': 0.02, 'urgency': 0.05, 'speculation': 0.05}
+
+URGENCY_WORDS = ['Breaking:', 'BREAKING:', 'Exclusive:', 'EXCLUSIVE:', 'Urgent:', 'Just In:']
+SPECULATION_WORDS = ['allegedly', 'reportedly', 'supposedly', 'sources claim']
+
+_SLOT = re.compile(r'\{([^}]+)\}')
+
+
+def latest_ngram_analysis(directory: str = '.') -> Optional[str]:
+    """Newest comprehensive_ngram_analysis_*.csv in `directory` (None if there is none)."""
+    paths = sorted(glob.glob(os.path.join(directory, 'comprehensive_ngram_analysis_*.csv')))
+    return paths[-1] if paths else None
+
+
+def load_ngram_fillers(
+    path: str,
+    preference: str = 'fake',
+    significant_only: bool = False,
+    min_count: int = 3,
+    max_per_length: Optional[int] = 500,
+    titlecase: bool = True
+) -> Dict[str, Tuple[List[str], np.ndarray]]:
+    """
+    Slot vocabularies from an n-gram analysis CSV.
+
+    Returns {'ngram1': (ngrams, weights), 'ngram2': ...}: n-grams whose
+    `preference` matches, weighted by their count in that class, for use as
+    `{ngram1}` / `{ngram2}` template slots.
+
+    Args:
+        path: comprehensive_ngram_analysis_*.csv
+        preference: 'fake', 'real' or 'neutral'
+        significant_only: Keep only chi2_significant rows
+        min_count: Minimum class count
+        max_per_length: Keep at most this many of the most frequent n-grams per length
+        titlecase: Title-case the (lower-cased) n-grams so names read naturally
+    """
+    frame = pd.read_csv(path)
+    count_column = f'{preference}_count' if preference in ('fake', 'real') else 'fake_count'
+    frame = frame[(frame['preference'] == preference) & (frame[count_column] >= min_count)]
+    if significant_only:
+        frame = frame[frame['chi2_significant'].astype(bool)]
+
+    fillers = {}
+    for length, group in frame.groupby('ngram_length'):
+        group = group.sort_values(count_column, ascending=False)
+        if max_per_length:
+            group = group.head(max_per_length)
+        ngrams = [str(g).title() if titlecase else str(g) for g in group['ngram']]
+        fillers[f'ngram{length}'] = (ngrams, group[count_column].to_numpy(dtype=float))
+    logger.info(f"Loaded {sum(len(v[0]) for v in fillers.values()):,} {preference} n-gram fillers from {path}")
+    return fillers
+
+
+def _piece_features(pieces: Sequence[str]) -> np.ndarray:
+    """
+    Additive counts (chars, spaces, '!', '?', quotes) for each piece.
+
+    The caps-word column stays 0: a caps word can span pieces ("{celebrity}'s"),
+    so it is counted on rendered word boundaries from `_word_edges`.
+    """
+    rows = np.zeros((len(pieces), 6), dtype=np.int32)
+    for i, piece in enumerate(pieces):
+        rows[i, :_CAPS] = (len(piece), piece.count(' '), piece.count('!'), piece.count('?'),
+                           piece.count('"') + piece.count("'"))
+    return rows
+
+
+def _fragment(word: str) -> Tuple[int, int, int]:
+    """(length, has a lowercase/titlecase char, has an uppercase char), the inputs of str.isupper."""
+    lower = any(ch.islower() or unicodedata.category(ch) == 'Lt' for ch in word)
+    return len(word), int(lower), int(any(ch.isupper() for ch in word))
+
+
+def _word_edges(pieces: Sequence[str]) -> np.ndarray:
+    """Word-edge layout (see _HAS_SPACE ...) of each piece, for joining pieces into words."""
+    rows = np.zeros((len(pieces), 8), dtype=np.int32)
+    for i, piece in enumerate(pieces):
+        words = piece.split(' ')
+        if len(words) == 1:
+            rows[i, _LEAD_LEN:_LEAD_UPPER + 1] = _fragment(piece)
+            continue
+        rows[i, _HAS_SPACE] = 1
+        rows[i, _LEAD_LEN:_LEAD_UPPER + 1] = _fragment(words[0])
+        rows[i, _INNER_CAPS] = sum(1 for w in words[1:-1] if w.isupper() and len(w) > 1)
+        rows[i, _TAIL_LEN:_TAIL_UPPER + 1] = _fragment(words[-1])
+    return rows
+
+
+class _CapsWords:
+    """Caps-word counts of rows whose pieces are appended left to right."""
+
+    def __init__(self, n: int):
+        self.caps = np.zeros(n, dtype=np.int32)
+        self.length = np.zeros(n, dtype=np.int32)
+        self.lower = np.zeros(n, dtype=np.int32)
+        self.upper = np.zeros(n, dtype=np.int32)
+
+    def _close(self, rows: np.ndarray, length: np.ndarray, lower: np.ndarray, upper: np.ndarray):
+        self.caps[rows] += (length > 1) & (lower == 0) & (upper > 0)
+
+    def append(self, rows: np.ndarray, edges: np.ndarray):
+        """Append one piece per row (`edges` aligned with `rows`)."""
+        length = self.length[rows] + edges[:, _LEAD_LEN]
+        lower = self.lower[rows] | edges[:, _LEAD_LOWER]
+        upper = self.upper[rows] | edges[:, _LEAD_UPPER]
+        spaced = edges[:, _HAS_SPACE] == 1
+        self._close(rows[spaced], length[spaced], lower[spaced], upper[spaced])
+        self.caps[rows] += edges[:, _INNER_CAPS]
+        self.length[rows] = np.where(spaced, edges[:, _TAIL_LEN], length)
+        self.lower[rows] = np.where(spaced, edges[:, _TAIL_LOWER], lower)
+        self.upper[rows] = np.where(spaced, edges[:, _TAIL_UPPER], upper)
+
+    def finish(self, appended: np.ndarray) -> np.ndarray:
+        """Close the last word, `appended` marking rows that get one more (uncased) end mark."""
+        self._close(np.arange(len(self.caps)), self.length + appended, self.lower, self.upper)
+        return self.caps
+
+
+def _end_code(piece: str) -> int:
+    return _END_CODES.get(piece[-1], _END_OTHER) if piece else _END_OTHER
+
+
+def headline_features(texts: Sequence[str]) -> pd.DataFrame:
+    """The notebooks' HeadlineFeatureExtractor count features for plain strings."""
+    rows = []
+    for text in texts:
+        text = str(text)
+        words = text.split()
+        rows.append((len(text), len(words), text.count('!'), text.count('?'),
+                     text.count('"') + text.count("'"),
+                     sum(1 for w in words if w.isupper() and len(w) > 1)))
+    frame = pd.DataFrame(rows, columns=FEATURES)
+    frame['is_question_headline'] = [int(str(t).strip().endswith('?')) for t in texts]
+    frame['has_quotes'] = [int('"' in str(t) or "'" in str(t)) for t in texts]
+    return frame
+
+
+class _Vocabulary:
+    """One slot: values, sampling probabilities and per-value piece features."""
+
+    def __init__(self, values: Sequence[str], weights: Optional[Sequence[float]] = None):
+        values = [' '.join(str(v).split()) for v in values]
+        keep = [i for i, v in enumerate(values) if v]
+        if not keep:
+            raise ValueError("Slot vocabulary is empty")
+        self.values = np.array([values[i] for i in keep], dtype=object)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+        weights = weights[keep]
+        self.probabilities = weights / weights.sum()
+        self.features = _piece_features(self.values)
+        # Word edges when the value is [plain, upper-cased, quoted, upper-cased and quoted]
+        self.edges = np.stack([
+            _word_edges(self.values),
+            _word_edges([v.upper() for v in self.values]),
+            _word_edges(['"' + v + '"' for v in self.values]),
+            _word_edges(['"' + v.upper() + '"' for v in self.values]),
+        ])
+        self.end = np.array([_end_code(v) for v in self.values], dtype=np.int8)
+
+    def sample(self, rng: np.random.Generator, n: int) -> np.ndarray:
+        if len(self.values) == 1:
+            return np.zeros(n, dtype=np.int32)
+        return rng.choice(len(self.values), size=n, p=self.probabilities).astype(np.int32)
+
+
+class _Template:
+    """A template split into literal pieces and slot names."""
+
+    def __init__(self, template: str, vocabularies: Dict[str, _Vocabulary]):
+        parts = _SLOT.split(' '.join(template.split()))
+        self.template = template
+        self.literals = parts[0::2]
+        self.slots = []
+        for name in parts[1::2]:
+            base = name if name in vocabularies else re.sub(r'\d+$', '', name)  # {celebrity2} -> celebrity
+            if base not in vocabularies:
+                raise ValueError(f"Template slot {{{name}}} has no vocabulary: {template}")
+            self.slots.append(base)
+        self.literal_features = _piece_features(self.literals).sum(axis=0)
+        self.literal_edges = _word_edges(self.literals)
+        self.end = _end_code(self.literals[-1]) if self.literals[-1] else None  # None: ends with its last slot
+
+
+class TemplateSynthesizer:
+    """
+    Draw, screen and render template headlines in bulk.
+
+    Args:
+        templates: {domain: [template, ...]} with {slot} placeholders; a
+            trailing digit reuses a slot ({celebrity2} draws from celebrity)
+        slots: {slot: values} or {slot: (values, weights)}
+        fillers: Extra weighted slots, e.g. from `load_ngram_fillers`
+        modifiers: {modifier: share of candidates} for quotes, caps, question,
+            exclamation, urgency and speculation
+        feature_ranges: {feature: (min, max)} hard limits per candidate
+        min_target_share: Share of feature_ranges that must hold
+        reference_texts: Headlines whose joint feature distribution accepted
+            candidates should follow (e.g. the real fake headlines)
+        match_features: Features used for the reference distribution
+        feature_caps: Values above the cap share one bin when matching
+        pilot_size: Draws per domain used to estimate the proposal distribution
+        min_support: Pilot draws a bin needs before it may set the acceptance bound
+        random_state: Seed for the NumPy generator
+    """
+
+    def __init__(
+        self,
+        templates: Optional[Dict[str, Sequence[str]]] = None,
+        slots: Optional[Dict[str, Any]] = None,
+        fillers: Optional[Dict[str, Tuple[Sequence[str], Sequence[float]]]] = None,
+        modifiers: Optional[Dict[str, float]] = None,
+        feature_ranges: Optional[Dict[str, Tuple[float, float]]] = None,
+        min_target_share: float = 1.0,
+        reference_texts: Optional[Sequence[str]] = None,
+        match_features: Sequence[str] = ('word_count', 'question_count', 'quote_count', 'caps_word_count', 'exclamation_count'),
+        feature_caps: Optional[Dict[str, int]] = None,
+        pilot_size: int = 200_000,
+        min_support: int = 20,
+        random_state: int = 42
+    ):
+        slots = dict(DEFAULT_SLOTS if slots is None else slots)
+        slots.update(fillers or {})
+        self.vocabularies = {}
+        for name, values in slots.items():
+            if isinstance(values, tuple) and len(values) == 2 and not isinstance(values[0], str):
+                self.vocabularies[name] = _Vocabulary(*values)
+            else:
+                self.vocabularies[name] = _Vocabulary(values)
+        self.templates = {domain: [_Template(t, self.vocabularies) for t in domain_templates]
+                          for domain, domain_templates in (templates or DEFAULT_TEMPLATES).items()}
+        self.urgency = _Vocabulary(URGENCY_WORDS)
+        self.speculation = _Vocabulary(SPECULATION_WORDS)
+        # Urgency prefixes are followed by a space, speculation words preceded by one
+        self._urgency_edges = _word_edges([v + ' ' for v in self.urgency.values])
+        self._speculation_edges = _word_edges([' ' + v for v in self.speculation.values])
+
+        self.modifiers = {**{name: 0.0 for name in DEFAULT_MODIFIERS}, **(DEFAULT_MODIFIERS if modifiers is None else modifiers)}
+        unknown = set(self.modifiers) - set(DEFAULT_MODIFIERS)
+        if unknown:
+            raise ValueError(f"Unknown modifiers: {sorted(unknown)}")
+        self.feature_ranges = feature_ranges or {}
+        self.min_target_share = min_target_share
+        self.match_features = list(match_features)
+        self.feature_caps = {'word_count': 30, 'char_count': 200, **(feature_caps or {})}
+        self.pilot_size = pilot_size
+        self.min_support = min_support
+        self.rng = np.random.default_rng(random_state)
+
+        self.reference_histogram = None
+        if reference_texts is not None:
+            self.set_reference(reference_texts)
+        self._acceptance: Dict[str, np.ndarray] = {}
+        self.last_run: Dict[str, Any] = {}
+
+    @classmethod
+    def from_generator(cls, generator: Any, **kwargs) -> 'TemplateSynthesizer':
+        """Reuse `templates` / `word_lists` of a notebook mock generator (MockHeadlineGenerator and subclasses)."""
+        return cls(templates=generator.templates, slots=generator.word_lists, **kwargs)
+
+    # ------------------------------------------------------------------ sampling
+
+    def sample(self, n: int, domain: str = 'general') -> Dict[str, np.ndarray]:
+        """
+        Draw `n` candidates as index arrays plus their features; no strings are built.
+
+        Returns:
+            Batch dict: template, slots (n x max slots, -1 padded), quote_slot /
+            caps_slot (-1: none), urgency / speculation (-1: none), question /
+            exclamation masks, end code and one array per feature
+        """
+        if domain not in self.templates:
+            raise ValueError(f"No templates for domain {domain!r}; have {sorted(self.templates)}")
+        templates = self.templates[domain]
+        rng = self.rng
+        width = max(len(t.slots) for t in templates)
+
+        template = rng.integers(len(templates), size=n).astype(np.int32)
+        slots = np.full((n, max(width, 1)), -1, dtype=np.int32)
+        features = np.zeros((n, 6), dtype=np.int32)
+        end = np.full(n, _END_OTHER, dtype=np.int8)
+        quote_slot = np.full(n, -1, dtype=np.int32)
+        caps_slot = np.full(n, -1, dtype=np.int32)
+        speculation = np.full(n, -1, dtype=np.int32)
+
+        wants_quotes = rng.random(n) < self.modifiers['quotes']
+        wants_caps = rng.random(n) < self.modifiers['caps']
+        wants_speculation = rng.random(n) < self.modifiers['speculation']
+
+        for t, spec in enumerate(templates):
+            rows = np.flatnonzero(template == t)
+            if not len(rows):
+                continue
+            features[rows] += spec.literal_features
+            k = len(spec.slots)
+            if spec.end is not None:
+                end[rows] = spec.end
+            if k == 0:
+                continue
+            picked_quote = (rng.random(len(rows)) * k).astype(np.int32)
+            picked_caps = (rng.random(len(rows)) * k).astype(np.int32)
+            for j, name in enumerate(spec.slots):
+                vocabulary = self.vocabularies[name]
+                index = vocabulary.sample(rng, len(rows))
+                slots[rows, j] = index
+                features[rows] += vocabulary.features[index]
+                if spec.end is None and j == k - 1:
+                    end[rows] = vocabulary.end[index]
+            quote_slot[rows[wants_quotes[rows]]] = picked_quote[wants_quotes[rows]]
+            caps_slot[rows[wants_caps[rows]]] = picked_caps[wants_caps[rows]]
+            speculation[rows[wants_speculation[rows]]] = 0
+
+            # A quoted final slot ends the headline with a quote mark
+            quoted_last = (spec.end is None) & (quote_slot[rows] == k - 1)
+            end[rows[quoted_last]] = _END_OTHER
+
+        quoted = quote_slot >= 0
+        features[quoted, _CHARS] += 2
+        features[quoted, _QUOTES] += 2
+
+        has_speculation = speculation >= 0
+        speculation[has_speculation] = self.speculation.sample(rng, int(has_speculation.sum()))
+        features[has_speculation] += self.speculation.features[speculation[has_speculation]]
+        features[has_speculation, _CHARS] += 1
+        features[has_speculation, _SPACES] += 1
+
+        urgency = np.where(rng.random(n) < self.modifiers['urgency'], 0, -1).astype(np.int32)
+        has_urgency = urgency >= 0
+        urgency[has_urgency] = self.urgency.sample(rng, int(has_urgency.sum()))
+        features[has_urgency] += self.urgency.features[urgency[has_urgency]]
+        features[has_urgency, _CHARS] += 1
+        features[has_urgency, _SPACES] += 1
+
+        # Endings: a question replaces a final '.' / '!' or is appended; an exclamation likewise
+        question = (rng.random(n) < self.modifiers['question']) & (end != _END_QUESTION)
+        features[question & (end == _END_EXCLAIM), _EXCLAIM] -= 1
+        features[question & (end == _END_OTHER), _CHARS] += 1
+        features[question, _QUESTION] += 1
+        exclamation = (rng.random(n) < self.modifiers['exclamation']) & ~question & (end != _END_QUESTION) & (end != _END_EXCLAIM)
+        features[exclamation & (end == _END_OTHER), _CHARS] += 1
+        features[exclamation, _EXCLAIM] += 1
+        appended = ((question | exclamation) & (end == _END_OTHER)).astype(np.int32)
+        features[:, _CAPS] = self._caps_word_count(templates, template, slots, quote_slot, caps_slot,
+                                                   speculation, urgency, appended)
+        end = np.where(question, _END_QUESTION, np.where(exclamation, _END_EXCLAIM, end)).astype(np.int8)
+
+        batch = {
+            'template': template, 'slots': slots, 'quote_slot': quote_slot, 'caps_slot': caps_slot,
+            'speculation': speculation, 'urgency': urgency, 'question': question, 'exclamation': exclamation,
+            'end': end,
+        }
+        batch['char_count'] = features[:, _CHARS]
+        batch['word_count'] = features[:, _SPACES] + 1
+        batch['exclamation_count'] = features[:, _EXCLAIM]
+        batch['question_count'] = features[:, _QUESTION]
+        batch['quote_count'] = features[:, _QUOTES]
+        batch['caps_word_count'] = features[:, _CAPS]
+        batch['is_question_headline'] = (end == _END_QUESTION).astype(np.int32)
+        batch['has_quotes'] = (features[:, _QUOTES] > 0).astype(np.int32)
+        return batch
+
+    def _caps_word_count(
+        self,
+        templates: List[_Template],
+        template: np.ndarray,
+        slots: np.ndarray,
+        quote_slot: np.ndarray,
+        caps_slot: np.ndarray,
+        speculation: np.ndarray,
+        urgency: np.ndarray,
+        appended: np.ndarray
+    ) -> np.ndarray:
+        """Caps words of the rendered headlines, joining pieces in the order `render` does."""
+        words = _CapsWords(len(template))
+        urgent = np.flatnonzero(urgency >= 0)
+        words.append(urgent, self._urgency_edges[urgency[urgent]])
+        for t, spec in enumerate(templates):
+            rows = np.flatnonzero(template == t)
+            if not len(rows):
+                continue
+            words.append(rows, np.broadcast_to(spec.literal_edges[0], (len(rows), 8)))
+            for j, name in enumerate(spec.slots):
+                variant = 2 * (quote_slot[rows] == j) + (caps_slot[rows] == j)
+                words.append(rows, self.vocabularies[name].edges[variant, slots[rows, j]])
+                if j == 0:
+                    speculating = rows[speculation[rows] >= 0]
+                    words.append(speculating, self._speculation_edges[speculation[speculating]])
+                words.append(rows, np.broadcast_to(spec.literal_edges[j + 1], (len(rows), 8)))
+        return words.finish(appended)
+
+    def render(self, batch: Dict[str, np.ndarray], rows: Optional[np.ndarray] = None, domain: str = 'general') -> List[str]:
+        """Build the strings for `rows` of a sampled batch (all rows by default)."""
+        templates = self.templates[domain]
+        rows = np.arange(len(batch['template'])) if rows is None else np.asarray(rows)
+        texts = np.empty(len(rows), dtype=object)
+        upper = np.frompyfunc(str.upper, 1, 1)
+
+        for t, spec in enumerate(templates):
+            local = np.flatnonzero(batch['template'][rows] == t)
+            if not len(local):
+                continue
+            selected = rows[local]
+            out = np.full(len(local), spec.literals[0], dtype=object)
+            for j, name in enumerate(spec.slots):
+                values = self.vocabularies[name].values[batch['slots'][selected, j]]
+                capped = batch['caps_slot'][selected] == j
+                if capped.any():
+                    values[capped] = upper(values[capped])
+                quoted = batch['quote_slot'][selected] == j
+                if quoted.any():
+                    values[quoted] = '"' + values[quoted] + '"'
+                if j == 0:
+                    speculating = batch['speculation'][selected] >= 0
+                    if speculating.any():
+                        values[speculating] = values[speculating] + ' ' + self.speculation.values[batch['speculation'][selected[speculating]]]
+                out = out + values + spec.literals[j + 1]
+            texts[local] = out
+
+        urgent = batch['urgency'][rows] >= 0
+        if urgent.any():
+            texts[urgent] = self.urgency.values[batch['urgency'][rows[urgent]]] + ' ' + texts[urgent]
+        for mask, mark in ((batch['question'][rows], '?'), (batch['exclamation'][rows], '!')):
+            for i in np.flatnonzero(mask):
+                text = texts[i]
+                texts[i] = (text[:-1] if text[-1] in '.!' else text) + mark
+        return texts.tolist()
+
+    # ------------------------------------------------------------------ screening
+
+    def _bin_codes(self, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        dims = [self.feature_caps.get(f, 3) + 1 for f in self.match_features]
+        clipped = [np.clip(np.asarray(columns[f]), 0, dim - 1) for f, dim in zip(self.match_features, dims)]
+        return np.ravel_multi_index(clipped, dims)
+
+    def set_reference(self, reference_texts: Sequence[str]):
+        """Target joint distribution of `match_features` from reference headlines."""
+        frame = headline_features(reference_texts)
+        codes = self._bin_codes({f: frame[f].to_numpy() for f in self.match_features})
+        size = int(np.prod([self.feature_caps.get(f, 3) + 1 for f in self.match_features]))
+        self.reference_histogram = np.bincount(codes, minlength=size) / len(codes)
+        self._acceptance = {}
+
+    def acceptance_table(self, domain: str) -> np.ndarray:
+        """Per-bin acceptance probability p_reference / (M * p_proposal), estimated from a pilot draw."""
+        if domain not in self._acceptance:
+            pilot = self._bin_codes(self.sample(self.pilot_size, domain))
+            counts = np.bincount(pilot, minlength=len(self.reference_histogram))
+            proposal = counts / counts.sum()
+            ratio = np.divide(self.reference_histogram, proposal, out=np.zeros_like(proposal), where=counts > 0)
+            supported = counts >= self.min_support
+            bound = ratio[supported].max() if supported.any() else ratio.max()
+            table = np.minimum(ratio / bound, 1.0) if bound > 0 else ratio
+            self._acceptance[domain] = table
+            coverage = self.reference_histogram[counts > 0].sum()
+            logger.info(f"{domain}: templates reach {coverage:.1%} of the reference feature mass; "
+                        f"expected acceptance {float((proposal * table).sum()):.1%}")
+        return self._acceptance[domain]
+
+    def accept(self, batch: Dict[str, np.ndarray], domain: str = 'general') -> np.ndarray:
+        """Mask of candidates passing the feature ranges and the reference rejection step."""
+        n = len(batch['template'])
+        keep = np.ones(n, dtype=bool)
+        if self.feature_ranges:
+            checks = [(batch[f] >= lo) & (batch[f] <= hi) for f, (lo, hi) in self.feature_ranges.items()]
+            keep &= np.mean(checks, axis=0) >= self.min_target_share
+        if self.reference_histogram is not None:
+            keep &= self.rng.random(n) < self.acceptance_table(domain)[self._bin_codes(batch)]
+        return keep
+
+    def generate(
+        self,
+        n: int,
+        domain: str = 'general',
+        batch_size: int = 200_000,
+        unique: bool = True,
+        exclude: Optional[Sequence[str]] = None,
+        max_draws: Optional[int] = None
+    ) -> List[str]:
+        """
+        `n` accepted headlines for one domain.
+
+        Args:
+            batch_size: Candidates drawn per round
+            unique: Drop exact duplicates (within the run and against `exclude`)
+            exclude: Existing headlines never to return
+            max_draws: Stop after this many draws (default: 1000 per requested headline)
+        """
+        start = time.perf_counter()
+        max_draws = max_draws or 1000 * max(n, 1)
+        seen = set(exclude or ()) if unique else set()
+        accepted: List[str] = []
+        drawn = passed = duplicates = 0
+        while len(accepted) < n and drawn < max_draws:
+            size = min(batch_size, max_draws - drawn)
+            batch = self.sample(size, domain)
+            rows = np.flatnonzero(self.accept(batch, domain))
+            drawn += size
+            passed += len(rows)
+            # Render only what can still be used, with headroom for duplicates
+            needed = n - len(accepted)
+            for text in self.render(batch, rows[:max(needed * 2, 64)], domain):
+                if unique:
+                    if text in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(text)
+                accepted.append(text)
+                if len(accepted) == n:
+                    break
+        seconds = time.perf_counter() - start
+        if len(accepted) < n:
+            logger.warning(f"{domain}: only {len(accepted):,}/{n:,} headlines after {drawn:,} draws")
+        self.last_run = {
+            'domain': domain, 'requested': n, 'returned': len(accepted), 'drawn': drawn,
+            'acceptance_rate': passed / drawn if drawn else 0.0, 'duplicates': duplicates,
+            'seconds': seconds, 'candidates_per_second': drawn / seconds if seconds else 0.0,
+        }
+        return accepted
+
+    def generate_plan(self, plan: Dict[str, int], **kwargs) -> Dict[str, List[str]]:
+        """`generate` for every domain of a generation plan such as {'celebrity': 1200, ...}."""
+        results, runs = {}, []
+        for domain, count in plan.items():
+            results[domain] = self.generate(int(count), domain, **kwargs) if count > 0 else []
+            runs.append(self.last_run)
+        self.last_run = {'domains': runs, 'seconds': sum(r.get('seconds', 0.0) for r in runs)}
+        return results
+
+    def throughput(self, n: int = 1_000_000, domain: str = 'general') -> Dict[str, float]:
+        """Candidates drawn and screened per minute, rendering excluded."""
+        start = time.perf_counter()
+        mask = self.accept(self.sample(n, domain), domain)
+        seconds = time.perf_counter() - start
+        return {'candidates_per_minute': n / seconds * 60, 'acceptance_rate': float(mask.mean()), 'seconds': seconds}
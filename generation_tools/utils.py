@@ -5,6 +5,7 @@ Adapted from proven synthetic_data_creation pipeline.
 This module provides:
 - Factory functions for creating generators
 - Batch processing utilities
+- Streaming (iterator / async iterator) batch processing with a bounded in-flight window
 - Progress tracking and saving
 - Quality assessment tools
 """
@@ -13,8 +14,11 @@ import os
 import json
 import time
 import yaml
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Optional, Union, Iterable, Iterator, AsyncIterator
 from dataclasses import dataclass
 
 @dataclass
@@ -27,6 +31,7 @@ class ProcessingProgress:
     start_time: datetime
     current_batch: int
     estimated_completion: Optional[datetime] = None
+    rejected_items: int = 0  # Near-duplicates dropped by a dedup gate
 
 @dataclass
 class QualityMetrics:
@@ -91,11 +96,16 @@ def batch_process(
     batch_size: int = 10,
     save_progress: bool = True,
     output_dir: str = "results",
-    progress_callback: Optional[callable] = None
+    progress_callback: Optional[callable] = None,
+    dedup_gate=None,
+    checkpoint_store=None
 ) -> List[Dict]:
     """
     Process multiple texts in batches with progress tracking.
     
+    Collects every result in memory; use iter_batch_process / aiter_batch_process
+    to consume results as they complete instead.
+    
     Args:
         generator: OpenAI or DeepMind generator instance
         texts: List of texts to process
@@ -105,6 +115,10 @@ def batch_process(
         save_progress: Whether to save intermediate progress
         output_dir: Directory for saving results
         progress_callback: Optional callback for progress updates
+        dedup_gate: Optional DedupGate; synthetic texts that near-duplicate an
+            earlier output are recorded as rejected instead of kept
+        checkpoint_store: Optional CheckpointStore; progress saves append only
+            the results since the previous save instead of rewriting the file
         
     Returns:
         List of processing results
@@ -125,44 +139,15 @@ def batch_process(
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     progress_file = os.path.join(output_dir, f"batch_progress_{timestamp}.json")
     
-    for i, text in enumerate(texts):
-        try:
-            # Process single item
-            result = generator.generate_complete(
-                text=text,
-                max_facts=max_facts,
-                domain=domain,
-                include_metadata=True
-            )
-            
-            # Convert to serializable format
-            result_dict = {
-                "index": i,
-                "original_text": result.original_text,
-                "extracted_facts": result.extracted_facts,
-                "modified_facts": result.modified_facts,
-                "synthetic_text": result.synthetic_text,
-                "metadata": result.metadata,
-                "timestamp": datetime.now().isoformat()
-            }
-            
-            results.append(result_dict)
-            progress.successful_items += 1
-            
-        except Exception as e:
-            print(f"Error processing item {i}: {e}")
-            results.append({
-                "index": i,
-                "error": str(e),
-                "timestamp": datetime.now().isoformat()
-            })
-            progress.failed_items += 1
-        
-        progress.processed_items += 1
+    for result_dict in iter_batch_process(
+        generator, texts, max_facts=max_facts, domain=domain,
+        max_in_flight=1, ordered=True, dedup_gate=dedup_gate, progress=progress
+    ):
+        results.append(result_dict)
         
         # Save progress periodically
         if save_progress and (progress.processed_items % batch_size == 0 or progress.processed_items == len(texts)):
-            save_batch_progress(results, progress, progress_file)
+            save_batch_progress(results, progress, progress_file, checkpoint_store)
         
         # Update progress callback
         if progress_callback:
@@ -185,15 +170,209 @@ def batch_process(
                     "total_items": progress.total_items,
                     "successful_items": progress.successful_items,
                     "failed_items": progress.failed_items,
+                    "rejected_items": progress.rejected_items,
                     "success_rate": progress.successful_items / progress.total_items,
                     "processing_time": str(datetime.now() - progress.start_time)
-                }
+                },
+                "dedup_gate": dedup_gate.summary() if dedup_gate is not None else None
             }, f, indent=2)
     
     return results
 
-def save_batch_progress(results: List[Dict], progress: ProcessingProgress, filename: str):
-    """Save current batch progress to file."""
+def _process_item(generator, index: int, text: str, max_facts: int, domain: str) -> Dict:
+    """Generate one item and convert it to the serializable result dict."""
+    try:
+        result = generator.generate_complete(
+            text=text,
+            max_facts=max_facts,
+            domain=domain,
+            include_metadata=True
+        )
+        return {
+            "index": index,
+            "original_text": result.original_text,
+            "extracted_facts": result.extracted_facts,
+            "modified_facts": result.modified_facts,
+            "synthetic_text": result.synthetic_text,
+            "metadata": result.metadata,
+            "timestamp": datetime.now().isoformat()
+        }
+    except Exception as e:
+        print(f"Error processing item {index}: {e}")
+        return {
+            "index": index,
+            "error": str(e),
+            "timestamp": datetime.now().isoformat()
+        }
+
+def _record_result(result_dict: Dict, domain: str, dedup_gate, progress: Optional[ProcessingProgress]) -> Dict:
+    """Apply the dedup gate and update progress counters for a finished item."""
+    if "error" not in result_dict and dedup_gate is not None:
+        try:
+            admitted = dedup_gate.admit(result_dict["synthetic_text"], domain)
+        except Exception as e:
+            # A failing gate fails the item, as a failing generation does
+            print(f"Error processing item {result_dict['index']}: {e}")
+            result_dict = {
+                "index": result_dict["index"],
+                "error": str(e),
+                "timestamp": datetime.now().isoformat()
+            }
+        else:
+            if not admitted:
+                result_dict["rejected"] = "near_duplicate"
+    
+    if "error" in result_dict:
+        if progress is not None:
+            progress.failed_items += 1
+    elif "rejected" in result_dict:
+        if progress is not None:
+            progress.rejected_items += 1
+    elif progress is not None:
+        progress.successful_items += 1
+    if progress is not None:
+        progress.processed_items += 1
+    return result_dict
+
+def iter_batch_process(
+    generator,
+    texts: Iterable[str],
+    max_facts: int = 3,
+    domain: str = "general",
+    max_in_flight: int = 4,
+    ordered: bool = False,
+    dedup_gate=None,
+    progress: Optional[ProcessingProgress] = None
+) -> Iterator[Dict]:
+    """
+    Yield batch results one at a time as they complete.
+    
+    At most `max_in_flight` items are being generated at once, and a new item
+    is only started when the consumer has taken a finished one, so a slow
+    consumer (dedup, feature scoring, a file sink) throttles generation
+    instead of letting results pile up in memory. `texts` may itself be a
+    lazy iterator.
+    
+    Args:
+        generator: OpenAI or DeepMind generator instance
+        texts: Texts to process (any iterable)
+        max_facts: Maximum facts per item
+        domain: Domain for fact schema
+        max_in_flight: Concurrent generate_complete calls (1 = sequential)
+        ordered: Yield in input order instead of completion order
+        dedup_gate: Optional DedupGate applied as results are yielded
+        progress: Optional ProcessingProgress updated per yielded result
+        
+    Yields:
+        Result dicts in the same format as batch_process
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+    
+    items = enumerate(texts)
+    
+    if max_in_flight == 1:
+        for i, text in items:
+            yield _record_result(_process_item(generator, i, text, max_facts, domain), domain, dedup_gate, progress)
+        return
+    
+    executor = ThreadPoolExecutor(max_workers=max_in_flight)
+    pending = deque()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    i, text = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append(executor.submit(_process_item, generator, i, text, max_facts, domain))
+            if not pending:
+                break
+            
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(f for f in pending if f in done)
+                pending.remove(future)
+            yield _record_result(future.result(), domain, dedup_gate, progress)
+    finally:
+        # Consumer stopped early (or failed): drop work that has not started
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+async def aiter_batch_process(
+    generator,
+    texts: Iterable[str],
+    max_facts: int = 3,
+    domain: str = "general",
+    max_in_flight: int = 4,
+    ordered: bool = False,
+    dedup_gate=None,
+    progress: Optional[ProcessingProgress] = None
+) -> AsyncIterator[Dict]:
+    """
+    Async-iterator version of iter_batch_process.
+    
+    The generators' blocking generate_complete calls run in worker threads
+    (at most `max_in_flight` at a time) so an event loop can consume results
+    with `async for` while other coroutines keep running. Arguments and
+    result dicts are the same as iter_batch_process.
+    """
+    if max_in_flight < 1:
+        raise ValueError("max_in_flight must be at least 1")
+    
+    items = enumerate(texts)
+    pending = deque()
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                try:
+                    i, text = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending.append(asyncio.ensure_future(
+                    asyncio.to_thread(_process_item, generator, i, text, max_facts, domain)
+                ))
+            if not pending:
+                break
+            
+            if ordered:
+                task = pending.popleft()
+                await asyncio.wait([task])
+            else:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                task = next(t for t in pending if t in done)
+                pending.remove(task)
+            yield _record_result(task.result(), domain, dedup_gate, progress)
+    finally:
+        for task in pending:
+            task.cancel()
+
+def stream_to_jsonl(results: Iterable[Dict], filename: str, flush_every: int = 1) -> Iterator[Dict]:
+    """
+    Append each result to a JSON Lines file and pass it on.
+    
+    Chains after iter_batch_process so results reach disk as they complete
+    instead of in one dump at the end of the job:
+    
+        for r in stream_to_jsonl(iter_batch_process(gen, texts), "results.jsonl"):
+            ...
+    """
+    with open(filename, 'a', encoding='utf-8') as f:
+        for count, result in enumerate(results, 1):
+            f.write(json.dumps(result, default=str, ensure_ascii=False) + "\n")
+            if count % flush_every == 0:
+                f.flush()
+            yield result
+
+def save_batch_progress(results: List[Dict], progress: ProcessingProgress, filename: str, checkpoint_store=None):
+    """Save current batch progress to file, or as a delta to `checkpoint_store` when given."""
     progress_data = {
         "timestamp": datetime.now().isoformat(),
         "progress": {
@@ -201,6 +380,7 @@ def save_batch_progress(results: List[Dict], progress: ProcessingProgress, filen
             "processed_items": progress.processed_items,
             "successful_items": progress.successful_items,
             "failed_items": progress.failed_items,
+            "rejected_items": progress.rejected_items,
             "current_batch": progress.current_batch,
             "start_time": progress.start_time.isoformat(),
             "estimated_completion": progress.estimated_completion
@@ -208,6 +388,10 @@ def save_batch_progress(results: List[Dict], progress: ProcessingProgress, filen
         "results": results
     }
     
+    if checkpoint_store is not None:
+        checkpoint_store.save(progress_data)
+        return
+    
     with open(filename, 'w') as f:
         json.dump(progress_data, f, indent=2)
 
@@ -221,7 +405,7 @@ def assess_quality(results: List[Dict]) -> QualityMetrics:
     Returns:
         Quality metrics
     """
-    successful_results = [r for r in results if "error" not in r]
+    successful_results = [r for r in results if "error" not in r and "rejected" not in r]
     
     if not successful_results:
         return QualityMetrics(0, 0, 0, 0)
@@ -0,0 +1,35 @@
+"""Tests for generation_tools/checkpoint_store.py."""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'generation_tools'))
+
+from checkpoint_store import CheckpointStore
+
+
+def test_appends_log_only_the_new_tail(tmp_path):
+    store = CheckpointStore(str(tmp_path / 'session'))
+    store.save({'headlines': ['a', 'b'], 'batch_count': 1})
+    assert store.diff({'headlines': ['a', 'b', 'c'], 'batch_count': 2}) == \
+        ({'batch_count': 2}, {'headlines': ['c']}, {}, [])
+
+
+def test_item_edited_in_place_survives_reload(tmp_path):
+    directory = str(tmp_path / 'session')
+    store = CheckpointStore(directory)
+    headlines = ['first', 'second', 'third']
+    store.save({'headlines': headlines})
+    headlines[0] = 'first (edited)'
+    headlines[1] = 'second (edited)'
+    headlines.append('fourth')
+    store.save({'headlines': headlines})
+    store.close()
+
+    assert CheckpointStore(directory).load()['headlines'] == headlines
+
+
+def test_tuples_still_count_as_appends(tmp_path):
+    store = CheckpointStore(str(tmp_path / 'session'))
+    store.save({'pairs': [(1, 'a')]})
+    assert store.diff({'pairs': [(1, 'a'), (2, 'b')]})[1] == {'pairs': [[2, 'b']]}
@@ -0,0 +1,56 @@
+"""Round-trip tests for data_tools/dataset_store.py."""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'data_tools'))
+pytest.importorskip('pyarrow')
+
+from dataset_store import DatasetStore
+
+
+def _two_runs(store):
+    first = pd.DataFrame({'label': [0, 1, 1], 'count': [1, 2, 3]})
+    second = pd.DataFrame({'label': [1, 0], 'count': [300_000, 5], 'score': [0.5, 0.25], 'note': ['a', 'b']})
+    store.write(first, 'features', subject='News', run_id='1')
+    store.write(second, 'features', subject='News', run_id='2')
+    store.write(second, 'features', subject='politics', run_id='1')
+
+
+def test_runs_with_different_integer_ranges_and_columns(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    _two_runs(store)
+
+    everything = store.read('features', run=None).sort_values(['subject', 'run', 'count'])
+    assert len(everything) == 7
+    assert everything['count'].max() == 300_000
+    assert {'score', 'note'} <= set(everything.columns)
+    first_run = everything[(everything['subject'] == 'News') & (everything['run'] == '1')]
+    assert first_run['score'].isna().all()
+
+    latest = store.read('features')
+    assert sorted(latest['count'].tolist()) == [5, 5, 300_000, 300_000]
+
+
+def test_numeric_run_ids_and_filters(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    _two_runs(store)
+
+    run_one = store.read('features', run='1')
+    assert len(run_one) == 5
+    assert set(run_one['run']) == {'1'}
+
+    fake_news = store.read('features', subject='News', run=None, filters={'label': 1})
+    assert sorted(fake_news['count'].tolist()) == [2, 3, 300_000]
+
+
+def test_nested_and_scalar_values_across_runs(tmp_path):
+    store = DatasetStore(str(tmp_path))
+    store.write(pd.DataFrame({'value': [1, 2]}), 'summary', subject='a', run_id='1')
+    store.write(pd.DataFrame({'value': [['x', 'y'], ['z']]}), 'summary', subject='b', run_id='1')
+
+    table = store.read('summary', run=None).sort_values('subject')
+    assert table['value'].tolist() == ['1', '2', '["x", "y"]', '["z"]']
@@ -0,0 +1,31 @@
+"""Tests for generation_tools/near_duplicate_index.py."""
+
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'generation_tools'))
+
+from near_duplicate_index import NearDuplicateIndex, deduplicate
+
+
+def test_deduplicate_twice_on_the_same_index():
+    index = NearDuplicateIndex(threshold=0.9)
+    first = ['Senate passes the new budget bill', 'Storm closes schools across the county',
+             'Senate passes the new budget bill']
+    kept, duplicates = deduplicate(first, index=index)
+    assert kept == [0, 1]
+    assert [(d['index'], d['duplicate_of']) for d in duplicates] == [(2, 0)]
+
+    second = ['Local team wins the championship', 'Storm closes schools across the county',
+              'Local team wins the championship']
+    kept, duplicates = deduplicate(second, index=index)
+    assert kept == [0]
+    # An earlier call's row is reported by its stored key, a row of this call by its index
+    assert [(d['index'], d['duplicate_of']) for d in duplicates] == [(1, ('corpus', 0, 1)), (2, 0)]
+    assert len(index) == 3
+
+
+def test_empty_index_is_reused():
+    index = NearDuplicateIndex()
+    deduplicate(['Senate passes the new budget bill', 'Local team wins the championship'], index=index)
+    assert len(index) == 2
@@ -0,0 +1,47 @@
+"""Tests for generation_tools/template_synthesizer.py."""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'generation_tools'))
+
+from template_synthesizer import DEFAULT_TEMPLATES, FEATURES, TemplateSynthesizer, headline_features
+
+TEMPLATES = {
+    **DEFAULT_TEMPLATES,
+    'glued': [
+        "{celebrity}'s new look stuns fans in {location}.",
+        "Is {celebrity}'s {subject}-backed deal with {celebrity2} over!",
+        '{politician}/{political_figure} "talks" on {policy_event}:{event}',
+        "{speculation_word}{location}",
+        "A {speculation_word} I",
+    ],
+}
+SLOTS = {
+    'celebrity': ['Taylor Swift', 'EMMA STONE', 'Brad', 'X', 'j'],
+    'location': ['Hollywood', 'NYC', 'Los Angeles', 'L.A.'],
+    'subject': ['technology company', 'IBM', 'Acme'],
+    'politician': ['Senator Johnson', 'Mayor Smith'],
+    'political_figure': ['Party official', 'GOP'],
+    'policy_event': ['healthcare reform', 'NATO'],
+    'event': ['major announcement', 'Q'],
+    'speculation_word': ['allegedly', 'reportedly'],
+    'relationship_action': ['confirm relationship'],
+    'dramatic_action': ['makes major announcement'],
+    'action': ['expand operations'],
+    'speculation': ['allegedly'],
+    'political_action': ['propose new legislation'],
+    'controversial_action': ['change their position'],
+}
+MODIFIERS = {'quotes': 0.4, 'caps': 0.5, 'question': 0.3, 'exclamation': 0.2, 'urgency': 0.3, 'speculation': 0.3}
+
+
+def test_sampled_features_match_rendered_headlines():
+    synthesizer = TemplateSynthesizer(templates=TEMPLATES, slots=SLOTS, modifiers=MODIFIERS, random_state=0)
+    for domain in TEMPLATES:
+        batch = synthesizer.sample(5000, domain)
+        rendered = headline_features(synthesizer.render(batch, domain=domain))
+        for feature in FEATURES + ['is_question_headline', 'has_quotes']:
+            np.testing.assert_array_equal(batch[feature], rendered[feature].to_numpy(), err_msg=f"{domain}: {feature}")